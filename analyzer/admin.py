@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import AnalysisSession
+from django.db.models import F, Sum
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import AnalysisSession, AiPage, SiteTokenStats, RequestProfile, CrawlHit, CrawlRollup, TrackedSite
+from .refresh import simhash
 
 
 @admin.register(AnalysisSession)
@@ -15,7 +21,7 @@ class AnalysisSessionAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'website_url')
         }),
         ('Data', {
-            'fields': ('features', 'ai_pages', 'findability_report'),
+            'fields': ('features', 'findability_report'),
             'classes': ('wide',)
         }),
         ('Statistics', {
@@ -36,3 +42,121 @@ class AnalysisSessionAdmin(admin.ModelAdmin):
         return 'Yes' if obj.has_findability_report else 'No'
     has_findability_report.short_description = 'Has Report'
     has_findability_report.boolean = True
+
+
+@admin.register(AiPage)
+class AiPageAdmin(admin.ModelAdmin):
+    """Admin interface for generated AI pages."""
+    list_display = ('slug', 'title', 'session', 'position', 'size')
+    list_select_related = ('session',)
+    search_fields = ('slug', 'title')
+    raw_id_fields = ('session',)
+    exclude = ('content_deflate',)
+    readonly_fields = ('size', 'content_crc32', 'content')
+
+
+@admin.register(SiteTokenStats)
+class SiteTokenStatsAdmin(admin.ModelAdmin):
+    """Admin interface for per-site token statistics."""
+    list_display = ('host', 'tokens_per_page', 'truncation_rate', 'batches', 'truncated_batches', 'pages_generated', 'cache_hit_rate', 'updated_at')
+    search_fields = ('host',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Admin interface for profiled requests; folded stacks can be downloaded for flame graphs."""
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'sql_count', 'sql_ms', 'mode', 'samples')
+    list_filter = ('mode', 'method', 'status_code')
+    search_fields = ('path',)
+    readonly_fields = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'mode', 'samples',
+                       'flame_graph', 'sql_count', 'sql_ms', 'slowest_queries', 'folded_stacks', 'cprofile_stats')
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/folded/', self.admin_site.admin_view(self.folded_view),
+                 name='analyzer_requestprofile_folded'),
+        ]
+        return urls + super().get_urls()
+
+    def folded_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(profile.folded_stacks, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile-{pk}.folded"'
+        return response
+
+    def flame_graph(self, obj):
+        if not obj.folded_stacks:
+            return '-'
+        url = reverse('admin:analyzer_requestprofile_folded', args=[obj.pk])
+        return format_html('<a href="{}">Download folded stacks</a> (open in speedscope or flamegraph.pl)', url)
+    flame_graph.short_description = 'Flame graph'
+
+
+@admin.register(CrawlRollup)
+class CrawlRollupAdmin(admin.ModelAdmin):
+    """Crawl dashboard: daily crawler hits per AI page, with totals for the current filters."""
+    list_display = ('day', 'crawler', 'category', 'slug', 'session', 'hits', 'bytes_sent', 'last_seen')
+    list_filter = ('category', 'crawler', 'day')
+    list_select_related = ('session',)
+    search_fields = ('slug', 'crawler')
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        if not hasattr(response, 'context_data') or 'cl' not in response.context_data:
+            return response
+        queryset = response.context_data['cl'].queryset
+
+        def totals(field, limit=10):
+            return (queryset.values(name=F(field)).annotate(hits=Sum('hits'), bytes_sent=Sum('bytes_sent'))
+                    .order_by('-hits')[:limit])
+        response.context_data['crawl_summaries'] = [
+            ('By category', totals('category'), 'Category'),
+            ('Top crawlers', totals('crawler'), 'Crawler'),
+            ('Most crawled pages', totals('slug'), 'Page'),
+        ]
+        return response
+
+
+@admin.register(CrawlHit)
+class CrawlHitAdmin(admin.ModelAdmin):
+    """Admin interface for raw crawler hits (kept for CRAWL_HIT_RETENTION_DAYS)."""
+    list_display = ('created_at', 'crawler', 'category', 'slug', 'session', 'bytes_sent')
+    list_filter = ('category', 'crawler')
+    list_select_related = ('session',)
+    search_fields = ('slug', 'crawler')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TrackedSite)
+class TrackedSiteAdmin(admin.ModelAdmin):
+    """Admin interface for websites refreshed by manage.py refresh_sites."""
+    list_display = ('session', 'enabled', 'interval_hours', 'next_check_at', 'last_checked_at', 'last_status',
+                    'last_distance', 'last_changed_at')
+    list_filter = ('enabled', 'last_status')
+    list_select_related = ('session',)
+    search_fields = ('session__website_url',)
+    raw_id_fields = ('session',)
+    readonly_fields = ('etag', 'last_modified', 'fingerprint', 'last_checked_at', 'last_changed_at', 'last_status',
+                       'last_distance', 'last_error', 'consecutive_errors')
+
+    def save_model(self, request, obj, form, change):
+        # Fingerprint of the text the session's analysis is based on, so the first check can skip an unchanged site
+        if not change and not obj.fingerprint and obj.session.website_text:
+            obj.fingerprint = f"{simhash(obj.session.website_text):016x}"
+        super().save_model(request, obj, form, change)
@@ -0,0 +1,344 @@
+"""
+Offline batch generation of AI pages from a JSONL job file.
+
+Each input line is a job: {"url": ..., "features": [...], "pages": 50} with an
+optional "id". Jobs without features get them extracted from the website first.
+Finished jobs are written in bulk (one transaction per flush, bulk_create for
+sessions and pages) and recorded in a checkpoint file, so an interrupted run
+can be resumed and only the unfinished jobs are redone. The checkpoint is
+written inside the transaction, and on resume a job only counts as done if
+its session exists, so a crash at any point neither loses nor duplicates a job.
+
+Two modes:
+- sync: jobs run concurrently through generate_ai_pages_with_openai
+- batch API: every page generation call of every job is submitted as one
+  OpenAI Batch (Files + Batches API), which is slower to return but has
+  higher throughput limits and lower cost. The batch id is checkpointed, so
+  a resumed run collects the already-submitted batch instead of resubmitting.
+"""
+import io
+import os
+import json
+import time
+import logging
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.db import connections, transaction
+from .models import AnalysisSession, AiPage
+from .batch_planner import BatchPlanner, site_key
+from .page_collector import PageCollector, parse_json_content
+from .prompts import page_generation_messages
+from .model_routing import route_models
+from .views import fetch_website_text, extract_features_with_openai, generate_ai_pages_with_openai, openai_client
+
+logger = logging.getLogger(__name__)
+
+MIN_PAGES = 10
+MAX_PAGES = 300
+BATCH_DONE_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+class JobError(Exception):
+    """Raised for invalid job files."""
+
+
+def load_jobs(path):
+    """Read jobs from a JSONL file. Returns a list of {"key", "url", "features", "pages"}."""
+    jobs = []
+    keys = set()
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise JobError(f"Line {line_number}: invalid JSON ({e})")
+            if not isinstance(data, dict) or not isinstance(data.get('url'), str):
+                raise JobError(f"Line {line_number}: each job needs a \"url\"")
+            key = str(data.get('id') or f"line-{line_number}")
+            if key in keys:
+                raise JobError(f"Line {line_number}: duplicate job id {key}")
+            keys.add(key)
+            features = data.get('features') or []
+            try:
+                pages = int(data.get('pages', data.get('pages_count', 50)))
+            except (TypeError, ValueError):
+                raise JobError(f"Line {line_number}: \"pages\" must be a number")
+            jobs.append({
+                'key': key,
+                'url': data['url'].strip(),
+                'features': [f.strip() for f in features if isinstance(f, str) and f.strip()],
+                'pages': max(MIN_PAGES, min(MAX_PAGES, pages)),
+            })
+    return jobs
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished jobs and submitted batches."""
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        # Session saved for each done job
+        self.sessions = {}
+        self.pending_batch = None
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash can leave a partial last line
+                        continue
+                    if entry.get('batch_id'):
+                        self.pending_batch = entry
+                    elif entry.get('batch_collected'):
+                        self.pending_batch = None
+                    elif entry.get('ok'):
+                        self.done.add(entry['job'])
+                        self.sessions[entry['job']] = entry.get('session_id')
+
+    def drop_unsaved(self):
+        """Forget done jobs whose session isn't in the database (checkpointed, then the save was rolled back)."""
+        saved = set(AnalysisSession.objects.filter(id__in=self.sessions.values()).values_list('id', flat=True))
+        unsaved = {job for job, session_id in self.sessions.items() if session_id not in saved}
+        self.done -= unsaved
+        for job in unsaved:
+            del self.sessions[job]
+        return unsaved
+
+    def record(self, entries):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in entries:
+            if entry.get('ok'):
+                self.done.add(entry['job'])
+                self.sessions[entry['job']] = entry.get('session_id')
+
+
+def save_results(results, checkpoint):
+    """
+    Write successful results and checkpoint every result in one transaction: the checkpoint is
+    written before the commit, so a job saved to the database is always recorded as done.
+    """
+    succeeded = [r for r in results if r['ok']]
+    with transaction.atomic():
+        sessions = AnalysisSession.objects.bulk_create([
+            AnalysisSession(website_url=r['url'], website_text=r.get('website_text', ''), features=r['features'])
+            for r in succeeded
+        ])
+        AiPage.objects.bulk_create([
+            AiPage.from_dict(session, position, page)
+            for session, result in zip(sessions, succeeded)
+            for position, page in enumerate(result['pages'])
+        ], batch_size=500)
+        for session, result in zip(sessions, succeeded):
+            result['session_id'] = session.id
+        checkpoint.record([
+            {'job': r['key'], 'ok': r['ok'], 'session_id': r.get('session_id'), 'pages': len(r.get('pages', [])),
+             'error': r.get('error')}
+            for r in results
+        ])
+
+
+def prepare_features(job):
+    """Fill in the job's features (and website text) from the website when none were given."""
+    result = {'key': job['key'], 'url': job['url'], 'features': job['features'],
+              'pages_requested': job['pages'], 'ok': True}
+    if not job['features']:
+        success, text = fetch_website_text(job['url'])
+        if not success:
+            return dict(result, ok=False, error=text)
+        success, features = extract_features_with_openai(job['url'], text)
+        if not success:
+            return dict(result, ok=False, error=features)
+        result.update(features=features, website_text=text)
+    return result
+
+
+def run_sync_job(job):
+    try:
+        result = prepare_features(job)
+        if result['ok']:
+            success, pages = generate_ai_pages_with_openai(job['url'], result['features'], job['pages'])
+            if success:
+                result['pages'] = pages
+            else:
+                result.update(ok=False, error=pages)
+        return result
+    except Exception as e:
+        logger.exception(f"Job {job['key']} failed")
+        return {'key': job['key'], 'url': job['url'], 'ok': False, 'error': str(e)}
+
+
+def run_sync_job_in_thread(job):
+    try:
+        return run_sync_job(job)
+    finally:
+        # Worker threads open their own DB connections (token statistics)
+        connections.close_all()
+
+
+def run_sync(jobs, checkpoint, workers=4, flush_every=10, report=print):
+    """Run jobs concurrently, saving and checkpointing every flush_every finished jobs."""
+    buffer = []
+
+    def finished(result):
+        nonlocal buffer
+        report_result(result, report)
+        buffer.append(result)
+        if len(buffer) >= flush_every:
+            save_results(buffer, checkpoint)
+            buffer = []
+
+    if workers <= 1:
+        for job in jobs:
+            finished(run_sync_job(job))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-generation') as pool:
+            futures = [pool.submit(run_sync_job_in_thread, job) for job in jobs]
+            for future in as_completed(futures):
+                finished(future.result())
+    if buffer:
+        save_results(buffer, checkpoint)
+
+
+def report_result(result, report):
+    if result['ok']:
+        report(f"{result['key']}: {len(result['pages'])} pages for {result['url']}")
+    else:
+        report(f"{result['key']}: FAILED for {result['url']}: {result['error']}")
+
+
+def usage_namespace(usage):
+    """Turn a usage dict from a batch output line into the attribute form of SDK responses."""
+    if not usage:
+        return None
+    details = usage.get('prompt_tokens_details') or {}
+    return SimpleNamespace(**dict(usage, prompt_tokens_details=SimpleNamespace(**details)))
+
+
+def build_batch_requests(prepared, planners, model=None):
+    """
+    Plan every page generation call of every job. Returns the batch input lines.
+    Batch output can't be escalated, so the last (largest) model of the generate_pages route is used.
+    """
+    model = model or route_models('generate_pages')[-1]
+    lines = []
+    for job in prepared:
+        planner = planners.setdefault(site_key(job['url']), BatchPlanner.for_site(job['url']))
+        # There is no second round in batch mode, so ask for ~10% extra to make up
+        # for truncated responses and dropped near-duplicates
+        remaining = job['pages_requested'] + max(1, job['pages_requested'] // 10)
+        batches = planner.estimate_batches(remaining)
+        batch_num = 0
+        while remaining > 0:
+            pages_in_batch, max_tokens = planner.plan_batch(remaining)
+            batch_num += 1
+            lines.append(json.dumps({
+                'custom_id': f"{job['key']}::{batch_num}::{pages_in_batch}",
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {
+                    'model': model,
+                    'messages': page_generation_messages(job['url'], job['features'], pages_in_batch,
+                                                         batch_num=batch_num, batches=batches),
+                    'temperature': 0.7,
+                    'max_tokens': max_tokens,
+                },
+            }))
+            remaining -= pages_in_batch
+    return lines
+
+
+def collect_batch_output(prepared, output_text, planners):
+    """Assemble each job's pages from the batch output lines."""
+    responses = {}
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        key, batch_num, pages_requested = item['custom_id'].rsplit('::', 2)
+        responses.setdefault(key, []).append((int(batch_num), int(pages_requested), item))
+
+    results = []
+    for job in prepared:
+        planner = planners.setdefault(site_key(job['url']), BatchPlanner.for_site(job['url']))
+        collector = PageCollector()
+        for _, pages_requested, item in sorted(responses.get(job['key'], []), key=lambda r: r[0]):
+            response = item.get('response') or {}
+            body = response.get('body') or {}
+            if response.get('status_code') != 200 or not body.get('choices'):
+                continue
+            choice = body['choices'][0]
+            usage = usage_namespace(body.get('usage'))
+            completion_tokens = getattr(usage, 'completion_tokens', 0) if usage else 0
+            if choice.get('finish_reason') == 'length':
+                planner.record_batch(pages_requested, 0, completion_tokens, truncated=True, usage=usage)
+                continue
+            try:
+                batch_pages = parse_json_content(choice['message']['content'])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(batch_pages, list):
+                planner.record_batch(pages_requested, len(batch_pages), completion_tokens, truncated=False, usage=usage)
+                collector.add_batch(batch_pages)
+        pages = collector.pages[:job['pages_requested']]
+        result = dict(job, ok=bool(pages), pages=pages)
+        if not pages:
+            result['error'] = "No valid pages were generated"
+        results.append(result)
+    for planner in planners.values():
+        planner.save()
+    return results
+
+
+def run_batch_api(jobs, checkpoint, workers=4, poll_interval=30.0, report=print):
+    """Extract missing features, submit all page generation calls as one batch and collect the results."""
+    client = openai_client(os.getenv('OPENAI_API_KEY', ''), timeout=120.0)
+    planners = {}
+    pending = checkpoint.pending_batch
+    if pending:
+        report(f"Resuming batch {pending['batch_id']}")
+        prepared = pending['jobs']
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-features') as pool:
+            prepared = list(pool.map(prepare_features, jobs))
+        failed = [job for job in prepared if not job['ok']]
+        for job in failed:
+            report_result(job, report)
+        if failed:
+            checkpoint.record([{'job': j['key'], 'ok': False, 'error': j['error']} for j in failed])
+        prepared = [job for job in prepared if job['ok']]
+        if not prepared:
+            return
+
+        lines = build_batch_requests(prepared, planners)
+        input_file = client.files.create(file=('pages.jsonl', io.BytesIO(('\n'.join(lines) + '\n').encode('utf-8'))),
+                                         purpose='batch')
+        batch = client.batches.create(input_file_id=input_file.id, endpoint='/v1/chat/completions',
+                                      completion_window='24h')
+        checkpoint.record([{'batch_id': batch.id, 'jobs': prepared}])
+        report(f"Submitted batch {batch.id}: {len(lines)} requests for {len(prepared)} job(s)")
+        pending = {'batch_id': batch.id}
+
+    batch = client.batches.retrieve(pending['batch_id'])
+    while batch.status not in BATCH_DONE_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(pending['batch_id'])
+    if batch.status != 'completed' or not batch.output_file_id:
+        checkpoint.record([{'batch_collected': batch.id, 'status': batch.status}])
+        report(f"Batch {batch.id} ended with status {batch.status}")
+        return
+
+    output_text = client.files.content(batch.output_file_id).text
+    # Jobs saved by an earlier run that stopped before recording the batch as collected
+    prepared = [job for job in prepared if job['key'] not in checkpoint.done]
+    results = collect_batch_output(prepared, output_text, planners)
+    for result in results:
+        report_result(result, report)
+    save_results(results, checkpoint)
+    checkpoint.record([{'batch_collected': batch.id, 'status': batch.status}])
@@ -0,0 +1,155 @@
+"""
+Adaptive batch planning for AI page generation.
+
+Tracks how many completion tokens a page actually costs for each website host
+(from `response.usage`) and sizes batches and `max_tokens` so that responses fit
+the model's output limit without reserving far more budget than needed.
+"""
+import math
+import logging
+from urllib.parse import urlparse
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F
+from .models import SiteTokenStats
+from .prompts import cached_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+# Model output limit for a single completion
+MAX_OUTPUT_TOKENS = 16000
+# Starting estimate before any usage has been observed for a host
+DEFAULT_TOKENS_PER_PAGE = 1000.0
+# Tokens reserved for the JSON array wrapper and stray text around the pages
+RESPONSE_OVERHEAD_TOKENS = 200
+MIN_MAX_TOKENS = 1000
+MAX_BATCH_SIZE = 30
+# Weight of the newest observation in the moving averages
+EMA_ALPHA = 0.3
+BASE_HEADROOM = 1.15
+MAX_HEADROOM = 2.0
+
+
+def site_key(website_url):
+    """Return the host used to group token statistics for a website URL."""
+    hostname = urlparse(website_url or '').hostname or ''
+    return hostname.lower()[:255]
+
+
+def record_prompt_usage(website_url, usage):
+    """Add prompt and cached prompt tokens from a response's usage to the site's statistics."""
+    if not usage:
+        return
+    host = site_key(website_url)
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    cached_tokens = cached_prompt_tokens(usage)
+    SiteTokenStats.objects.get_or_create(host=host)
+    SiteTokenStats.objects.filter(host=host).update(
+        prompt_tokens=F('prompt_tokens') + prompt_tokens,
+        cached_prompt_tokens=F('cached_prompt_tokens') + cached_tokens,
+    )
+    logger.info(f"Prompt usage for {host or 'unknown host'}: {prompt_tokens} tokens, {cached_tokens} cached")
+
+
+class BatchPlanner:
+    """
+    Plans page generation batches from per-site token statistics.
+
+    The planner keeps a moving average of completion tokens per page and of the
+    fraction of batches that were cut off by `max_tokens`. When truncation rises
+    above the target rate, the per-page headroom grows so batches get smaller
+    and budgets larger; when it stays below, batches grow back towards the limit.
+    """
+    def __init__(self, stats, target_truncation_rate=None):
+        self.stats = stats
+        if target_truncation_rate is None:
+            target_truncation_rate = getattr(settings, 'AI_PAGES_TARGET_TRUNCATION_RATE', 0.05)
+        self.target_truncation_rate = target_truncation_rate
+
+    @classmethod
+    def for_site(cls, website_url, **kwargs):
+        """Load (or start) the statistics for the website's host."""
+        host = site_key(website_url)
+        # get_or_create so concurrent generations for a new host share one row
+        stats, _ = SiteTokenStats.objects.get_or_create(host=host, defaults={'tokens_per_page': DEFAULT_TOKENS_PER_PAGE})
+        return cls(stats, **kwargs)
+
+    @property
+    def headroom(self):
+        """Multiplier applied to the tokens-per-page estimate."""
+        excess = max(0.0, self.stats.truncation_rate - self.target_truncation_rate)
+        return min(MAX_HEADROOM, BASE_HEADROOM * (1 + 2 * excess))
+
+    @property
+    def tokens_per_page_budget(self):
+        return max(1.0, self.stats.tokens_per_page) * self.headroom
+
+    def batch_size(self):
+        """Largest number of pages whose budgeted tokens fit in one response."""
+        usable = MAX_OUTPUT_TOKENS - RESPONSE_OVERHEAD_TOKENS
+        return max(1, min(MAX_BATCH_SIZE, int(usable // self.tokens_per_page_budget)))
+
+    def estimate_batches(self, num_pages):
+        """Number of calls expected to produce num_pages pages."""
+        return max(1, math.ceil(num_pages / self.batch_size()))
+
+    def plan_batch(self, pages_remaining):
+        """
+        Plan the next call.
+        Returns (pages_in_batch: int, max_tokens: int)
+        """
+        pages_in_batch = max(1, min(self.batch_size(), pages_remaining))
+        budget = math.ceil(pages_in_batch * self.tokens_per_page_budget) + RESPONSE_OVERHEAD_TOKENS
+        max_tokens = max(MIN_MAX_TOKENS, min(MAX_OUTPUT_TOKENS, budget))
+        return pages_in_batch, max_tokens
+
+    def record_batch(self, pages_requested, pages_returned, completion_tokens, truncated, usage=None):
+        """Update statistics from one completed call."""
+        stats = self.stats
+        completion_tokens = completion_tokens or 0
+
+        if usage is not None:
+            stats.prompt_tokens += getattr(usage, 'prompt_tokens', 0) or 0
+            stats.cached_prompt_tokens += cached_prompt_tokens(usage)
+
+        stats.batches += 1
+        stats.completion_tokens += completion_tokens
+        stats.pages_generated += pages_returned
+        if truncated:
+            stats.truncated_batches += 1
+
+        first_sample = stats.batches == 1
+        stats.truncation_rate = self._ema(stats.truncation_rate, 1.0 if truncated else 0.0, first_sample)
+
+        if truncated:
+            # The requested pages needed more than the whole budget, so the
+            # budget per requested page is a lower bound on the real cost
+            if pages_requested > 0 and completion_tokens:
+                lower_bound = completion_tokens / pages_requested
+                if lower_bound > stats.tokens_per_page:
+                    stats.tokens_per_page = self._ema(stats.tokens_per_page, lower_bound * BASE_HEADROOM, first_sample)
+        elif pages_returned > 0 and completion_tokens:
+            observed = (completion_tokens - RESPONSE_OVERHEAD_TOKENS / 2) / pages_returned
+            stats.tokens_per_page = self._ema(stats.tokens_per_page, max(1.0, observed), first_sample)
+
+        logger.info(
+            f"Token stats for {stats.host or 'unknown host'}: {stats.tokens_per_page:.0f} tokens/page, "
+            f"truncation rate {stats.truncation_rate:.2f}, prompt cache hit rate {stats.cache_hit_rate:.2f}, "
+            f"next batch size {self.batch_size()}"
+        )
+
+    def save(self):
+        """Persist the statistics (skipped if nothing was recorded). Never raises."""
+        if not self.stats.batches:
+            return
+        try:
+            self.stats.save()
+        except DatabaseError:
+            # Statistics are advisory; losing one update must not fail the generation
+            logger.exception(f"Could not save token stats for {self.stats.host or 'unknown host'}")
+
+    @staticmethod
+    def _ema(current, observed, first_sample):
+        if first_sample:
+            return observed
+        return (1 - EMA_ALPHA) * current + EMA_ALPHA * observed
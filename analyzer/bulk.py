@@ -0,0 +1,104 @@
+"""
+Bulk website analysis.
+
+Runs fetch + feature extraction for many URLs on a bounded thread pool and
+yields one result per URL as soon as it finishes, for the bulk analysis API
+(streamed as NDJSON) and the `bulk_analyze` management command.
+
+- Duplicate URLs in one run are analyzed once.
+- Results are cached (Django cache, BULK_CACHE_SECONDS) so re-running a list
+  only analyzes the URLs that failed or expired.
+- OpenAI calls go through the shared rate limiter (see rate_limit).
+"""
+import csv
+import io
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.core.cache import cache
+from .models import AnalysisSession
+from .views import validate_url, fetch_website_text, extract_features_with_openai
+
+logger = logging.getLogger(__name__)
+
+URL_COLUMNS = ('url', 'website_url', 'website', 'site')
+
+
+def parse_urls(text):
+    """
+    Parse URLs from a newline-separated list or a CSV file.
+    For CSV with a header, the url/website_url/website/site column is used,
+    otherwise the first column. Blank lines and lines starting with # are skipped.
+    """
+    rows = [row for row in csv.reader(io.StringIO(text)) if row and row[0].strip() and not row[0].startswith('#')]
+    if not rows:
+        return []
+    column = 0
+    header = [cell.strip().lower() for cell in rows[0]]
+    for name in URL_COLUMNS:
+        if name in header:
+            column = header.index(name)
+            rows = rows[1:]
+            break
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+def cache_key(url):
+    return 'bulk-analysis:' + hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def analyze_url(url):
+    """Fetch a website and extract its features. Returns a result dict (never raises)."""
+    start = time.perf_counter()
+    result = {'url': url, 'ok': False}
+    is_valid, error = validate_url(url)
+    if not is_valid:
+        result['error'] = error
+    else:
+        cached = cache.get(cache_key(url))
+        if cached:
+            result.update(cached, cached_result=True)
+        else:
+            success, text = fetch_website_text(url)
+            if not success:
+                result['error'] = text
+            else:
+                success, features = extract_features_with_openai(url, text)
+                if not success:
+                    result['error'] = features
+                else:
+                    result.update(ok=True, features=features, website_text=text)
+                    cache.set(cache_key(url), {'ok': True, 'features': features, 'website_text': text},
+                              getattr(settings, 'BULK_CACHE_SECONDS', 3600))
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def iter_bulk_analysis(urls, max_workers=None, save=True):
+    """
+    Analyze urls concurrently, yielding result dicts in completion order.
+    With save=True each successful result is stored as an AnalysisSession and
+    its id included as session_id. Website text is never included in results.
+    """
+    max_workers = max_workers or getattr(settings, 'BULK_MAX_WORKERS', 8)
+    unique_urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+    logger.info(f"Bulk analysis of {len(unique_urls)} URL(s) with {max_workers} worker(s)")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bulk-analysis') as pool:
+        futures = [pool.submit(analyze_url, url) for url in unique_urls]
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                website_text = result.pop('website_text', '')
+                if save and result['ok']:
+                    # Saved from the consuming thread so workers never hold DB connections
+                    session = AnalysisSession.objects.create(
+                        website_url=result['url'], website_text=website_text, features=result['features'])
+                    result['session_id'] = session.id
+                yield result
+        finally:
+            # Stop queued work if the consumer goes away (client disconnects)
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,83 @@
+"""
+Compressed storage for generated page HTML.
+
+Page bodies are stored as raw DEFLATE data ending in a sync flush, together
+with their CRC-32 and length. Because the data is byte-aligned and
+self-contained, it can be placed unchanged between other DEFLATE blocks:
+ai_page renders its template around a marker, compresses the parts before and
+after the page body, and splices the stored bytes in between to produce a
+complete gzip response without ever decompressing the body.
+"""
+import re
+import zlib
+import struct
+
+COMPRESSION_LEVEL = 9
+# Raw DEFLATE, no zlib or gzip header
+DEFLATE_WBITS = -15
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+REFUSED_RE = re.compile(r'\s*q\s*=\s*0(\.0*)?\s*')
+
+
+def accepts_encoding(request, coding):
+    """
+    Check whether the client's Accept-Encoding allows coding (lowercase), by name or
+    through '*', and doesn't refuse it with q=0. A listed coding takes precedence over '*'.
+    """
+    wildcard = False
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if name == coding:
+            return not REFUSED_RE.fullmatch(params)
+        if name == '*':
+            wildcard = not REFUSED_RE.fullmatch(params)
+    return wildcard
+
+
+def deflate_block(data, level=COMPRESSION_LEVEL, final=False):
+    """Compress data to raw DEFLATE, ending with a sync flush (or the final block)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, DEFLATE_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def compress_content(text):
+    """Compress page HTML. Returns (deflate_bytes, crc32, length_in_bytes)."""
+    data = text.encode('utf-8')
+    return deflate_block(data), zlib.crc32(data), len(data)
+
+
+def decompress_content(deflated):
+    """Return the page HTML stored by compress_content."""
+    if not deflated:
+        return ''
+    # decompressobj accepts a stream without a final block, unlike zlib.decompress
+    return zlib.decompressobj(DEFLATE_WBITS).decompress(bytes(deflated)).decode('utf-8')
+
+
+def crc32_combine(crc1, crc2, length2):
+    """
+    CRC-32 of A + B given crc32(A), crc32(B) and len(B), without reading A or B.
+    CRC-32 is affine in its starting value, so the effect of crc1 on the result
+    is isolated by running both crc1 and 0 over len(B) zero bytes.
+    """
+    if length2 <= 0:
+        return crc1
+    zeros = bytes(length2)
+    return zlib.crc32(zeros, crc1) ^ zlib.crc32(zeros) ^ crc2
+
+
+def gzip_splice(prefix, deflated, crc, length, suffix):
+    """
+    Build a gzip stream of prefix + stored body + suffix (prefix and suffix as bytes),
+    reusing the stored DEFLATE body as is.
+    """
+    total_crc = crc32_combine(crc32_combine(zlib.crc32(prefix), crc, length), zlib.crc32(suffix), len(suffix))
+    total_length = (len(prefix) + length + len(suffix)) & 0xFFFFFFFF
+    return b''.join([
+        GZIP_HEADER,
+        deflate_block(prefix),
+        bytes(deflated),
+        deflate_block(suffix, final=True),
+        struct.pack('<II', total_crc, total_length),
+    ])
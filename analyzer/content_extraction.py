@@ -0,0 +1,190 @@
+"""
+Main-content extraction for prompts.
+
+TextExtractor keeps nearly every piece of text on a page, so prompts are padded
+with menus, link lists, calls to action and repeated snippets. This extractor
+splits the page into blocks (paragraphs, headings, list items, table cells...)
+and keeps only the blocks that look like content:
+
+- text blocks need enough words (fewer inside <main>/<article>) and a low
+  link density (share of the block's text inside links)
+- headings and list items are kept when they are short but not mostly links,
+  since they often name features
+- navigation, headers, footers, forms, cookie banners and similar elements are
+  skipped entirely
+- a line that was already seen earlier on the page is dropped
+
+The result keeps one block per line, with list items marked by "- ".
+"""
+import re
+from html.parser import HTMLParser
+
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'head', 'nav', 'footer', 'aside', 'form',
+             'iframe', 'button', 'select', 'dialog'}
+# <header> is skipped as site chrome unless it is the header of an article or main section
+CONTENT_CONTAINERS = {'main', 'article'}
+SKIP_PATTERN = re.compile(
+    r'(?:^|[\s_-])(cookies?|consent|banner|popup|modal|nav|navbar|navigation|menu|sidebar|breadcrumbs?|'
+    r'newsletter|share|social|advert|ads)(?:$|[\s_-])')
+# Never skipped by class or id, since they wrap the whole page
+NEVER_SKIPPED = {'html', 'body', 'main', 'article'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+ITEM_TAGS = {'li', 'dt', 'dd'}
+BLOCK_TAGS = HEADING_TAGS | ITEM_TAGS | {
+    'p', 'div', 'section', 'article', 'main', 'header', 'td', 'th', 'tr', 'table', 'ul', 'ol', 'dl',
+    'blockquote', 'pre', 'figcaption', 'caption', 'br', 'hr', 'cite',
+}
+# Elements whose end tag is often omitted; a new one closes the previous one
+IMPLICITLY_CLOSED = {'p', 'li', 'dt', 'dd', 'tr', 'td', 'th'}
+
+MAX_LINK_DENSITY = 0.33
+MAX_HEADING_LINK_DENSITY = 0.5
+MIN_WORDS_IN_MAIN = 4
+MIN_WORDS_ELSEWHERE = 10
+MIN_ITEM_WORDS_IN_MAIN = 2
+MIN_ITEM_WORDS_ELSEWHERE = 4
+# Below this much main content the page is treated as unusual and None is returned
+MIN_CONTENT_CHARS = 200
+
+
+class Block:
+    __slots__ = ('kind', 'level', 'in_main', 'parts', 'link_chars')
+
+    def __init__(self, kind, level, in_main):
+        self.kind = kind
+        self.level = level
+        self.in_main = in_main
+        self.parts = []
+        self.link_chars = 0
+
+    @property
+    def text(self):
+        return ' '.join(' '.join(self.parts).split())
+
+
+class MainContentParser(HTMLParser):
+    """Split HTML into text blocks, skipping page chrome."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.skip_depth = None
+        self.blocks = []
+        self.block = None
+
+    def skip_element(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            return True
+        if tag == 'header':
+            return not any(open_tag in CONTENT_CONTAINERS for open_tag in self.stack)
+        if tag in NEVER_SKIPPED:
+            return False
+        names = ' '.join(value for name, value in attrs if name in ('class', 'id') and value)
+        return bool(names) and SKIP_PATTERN.search(names.lower()) is not None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS and self.skip_depth is None:
+            self.end_block()
+        if tag in VOID_TAGS:
+            return
+        if tag in IMPLICITLY_CLOSED and self.stack and self.stack[-1] == tag:
+            self.pop_to(len(self.stack) - 1)
+        self.stack.append(tag)
+        if self.skip_depth is None and self.skip_element(tag, attrs):
+            self.skip_depth = len(self.stack)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or tag not in self.stack:
+            return
+        if tag in BLOCK_TAGS and self.skip_depth is None:
+            self.end_block()
+        index = len(self.stack) - 1 - self.stack[::-1].index(tag)
+        self.pop_to(index)
+
+    def pop_to(self, index):
+        del self.stack[index:]
+        if self.skip_depth is not None and len(self.stack) < self.skip_depth:
+            self.skip_depth = None
+
+    def handle_data(self, data):
+        if self.skip_depth is not None or not data.strip():
+            return
+        if self.block is None:
+            kind, level = self.current_kind()
+            self.block = Block(kind, level, any(tag in CONTENT_CONTAINERS for tag in self.stack))
+        self.block.parts.append(data)
+        if 'a' in self.stack:
+            self.block.link_chars += len(data.strip())
+
+    def current_kind(self):
+        for tag in reversed(self.stack):
+            if tag in HEADING_TAGS:
+                return 'heading', int(tag[1])
+            if tag in ITEM_TAGS:
+                return 'item', 0
+            if tag in BLOCK_TAGS:
+                break
+        return 'text', 0
+
+    def end_block(self):
+        if self.block is not None:
+            self.blocks.append(self.block)
+            self.block = None
+
+    def close(self):
+        super().close()
+        self.end_block()
+
+
+def keep_block(block, text):
+    words = len(text.split())
+    link_density = block.link_chars / max(1, len(text))
+    if block.kind == 'heading':
+        return link_density <= MAX_HEADING_LINK_DENSITY
+    if link_density > MAX_LINK_DENSITY:
+        return False
+    if block.kind == 'item':
+        return words >= (MIN_ITEM_WORDS_IN_MAIN if block.in_main else MIN_ITEM_WORDS_ELSEWHERE)
+    return words >= (MIN_WORDS_IN_MAIN if block.in_main else MIN_WORDS_ELSEWHERE)
+
+
+def extract_main_content(html, max_length=10000):
+    """
+    Return the main content of html as text (one block per line), or None if the page
+    has too little recognizable content (callers then fall back to TextExtractor).
+    """
+    parser = MainContentParser()
+    parser.feed(html)
+    parser.close()
+
+    seen = set()
+    kept = []
+    length = 0
+    for block in parser.blocks:
+        text = block.text
+        if not text or not keep_block(block, text):
+            continue
+        key = text.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append((block, text))
+        length += len(text) + 3
+        if length > max_length:
+            break
+
+    lines = []
+    for index, (block, text) in enumerate(kept):
+        if block.kind == 'heading':
+            # Drop headings with no content under them ("You may also like", ...)
+            following = kept[index + 1][0] if index + 1 < len(kept) else None
+            if following is None or (following.kind == 'heading' and following.level <= block.level):
+                continue
+        lines.append(f"- {text}" if block.kind == 'item' else text)
+
+    content = '\n'.join(lines)
+    if len(content) < MIN_CONTENT_CHARS:
+        return None
+    if len(content) > max_length:
+        content = content[:max_length] + '...'
+    return content
@@ -0,0 +1,157 @@
+"""
+Crawler-hit analytics for AI pages.
+
+ai_page only appends a tuple to an in-process ring buffer (a bounded deque),
+so recording a hit costs no database work on the request path. A background
+thread drains the buffer every CRAWL_ANALYTICS_FLUSH_INTERVAL seconds (or
+sooner once CRAWL_ANALYTICS_FLUSH_SIZE hits are waiting) and writes them in one
+transaction: raw CrawlHit rows with bulk_create, and the daily CrawlRollup
+totals shown in the admin. If the database falls behind, the oldest buffered
+hits are dropped rather than slowing requests down.
+"""
+import atexit
+import logging
+import threading
+from collections import deque, defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import AnalysisSession, CrawlHit, CrawlRollup
+
+logger = logging.getLogger(__name__)
+
+# Raw hits older than CRAWL_HIT_RETENTION_DAYS are pruned at most this often
+PRUNE_INTERVAL = timedelta(hours=1)
+
+
+class CrawlRecorder:
+    """Buffer crawler hits in memory and write them to the database in batches."""
+    def __init__(self, buffer_size=10000, flush_size=500, flush_interval=5.0, background=True):
+        self.buffer = deque(maxlen=buffer_size)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self.dropped = 0
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+        self.last_prune = None
+
+    def record(self, session_id, slug, crawler, bytes_sent):
+        """Buffer one hit by a Crawler (see crawlers) on an AI page."""
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append((timezone.now(), session_id, slug, crawler.name, crawler.category, bytes_sent))
+        if self.background:
+            if self.thread is None:
+                self.start()
+            if len(self.buffer) >= self.flush_size:
+                self.wakeup.set()
+
+    def start(self):
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='crawl-analytics', daemon=True)
+                self.thread.start()
+                atexit.register(self.safe_flush)
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            close_old_connections()
+            self.safe_flush()
+
+    def safe_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to write crawl analytics")
+
+    def drain(self):
+        hits = []
+        while self.buffer and len(hits) < self.flush_size:
+            hits.append(self.buffer.popleft())
+        return hits
+
+    def flush(self):
+        """Write all buffered hits. Returns the number written."""
+        written = 0
+        with self.flush_lock:
+            if self.dropped:
+                logger.warning(f"Crawl analytics buffer full, dropped {self.dropped} hit(s)")
+                self.dropped = 0
+            while self.buffer:
+                hits = self.drain()
+                write_hits(hits)
+                written += len(hits)
+            self.prune()
+        return written
+
+    def prune(self):
+        now = timezone.now()
+        if self.last_prune and now - self.last_prune < PRUNE_INTERVAL:
+            return
+        self.last_prune = now
+        retention = getattr(settings, 'CRAWL_HIT_RETENTION_DAYS', 30)
+        deleted, _ = CrawlHit.objects.filter(created_at__lt=now - timedelta(days=retention)).delete()
+        if deleted:
+            logger.info(f"Pruned {deleted} crawl hit(s) older than {retention} days")
+
+
+def write_hits(hits):
+    """Insert raw hits and add them to the daily rollups, in one transaction."""
+    # Sessions deleted since the hit was recorded would fail the whole batch
+    session_ids = set(AnalysisSession.objects.filter(id__in={hit[1] for hit in hits}).values_list('id', flat=True))
+    hits = [hit for hit in hits if hit[1] in session_ids]
+    totals = defaultdict(lambda: [0, 0, None])
+    for created_at, session_id, slug, crawler, category, bytes_sent in hits:
+        total = totals[(timezone.localdate(created_at), session_id, slug, crawler, category)]
+        total[0] += 1
+        total[1] += bytes_sent
+        total[2] = max(total[2], created_at) if total[2] else created_at
+
+    with transaction.atomic():
+        CrawlHit.objects.bulk_create([
+            CrawlHit(created_at=created_at, session_id=session_id, slug=slug, crawler=crawler,
+                     category=category, bytes_sent=bytes_sent)
+            for created_at, session_id, slug, crawler, category, bytes_sent in hits
+        ])
+        for (day, session_id, slug, crawler, category), (count, bytes_sent, last_seen) in totals.items():
+            add_to_rollup(day, session_id, slug, crawler, category, count, bytes_sent, last_seen)
+
+
+def add_to_rollup(day, session_id, slug, crawler, category, count, bytes_sent, last_seen):
+    rollups = CrawlRollup.objects.filter(day=day, session_id=session_id, slug=slug, crawler=crawler)
+    increment = {'hits': F('hits') + count, 'bytes_sent': F('bytes_sent') + bytes_sent, 'last_seen': Greatest(F('last_seen'), last_seen)}
+    if rollups.update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            CrawlRollup.objects.create(day=day, session_id=session_id, slug=slug, crawler=crawler,
+                                       category=category, hits=count, bytes_sent=bytes_sent, last_seen=last_seen)
+    except IntegrityError:
+        # Another process created the row in the meantime
+        rollups.update(**increment)
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def crawl_recorder():
+    """Return the process-wide recorder, or None if CRAWL_ANALYTICS_ENABLED is off."""
+    global _recorder
+    if _recorder is None and getattr(settings, 'CRAWL_ANALYTICS_ENABLED', True):
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = CrawlRecorder(
+                    buffer_size=getattr(settings, 'CRAWL_ANALYTICS_BUFFER_SIZE', 10000),
+                    flush_size=getattr(settings, 'CRAWL_ANALYTICS_FLUSH_SIZE', 500),
+                    flush_interval=getattr(settings, 'CRAWL_ANALYTICS_FLUSH_INTERVAL', 5.0),
+                )
+    return _recorder
@@ -0,0 +1,140 @@
+"""
+User-agent classification for crawlers and bots.
+
+Known crawlers are matched by a signature (a case-insensitive token found in
+the User-Agent) and grouped by category. All signatures are compiled into one
+regular expression, tried longest first so "ChatGPT-User" wins over "ChatGPT"
+and "Applebot-Extended" over "Applebot"; generic tokens (bot, crawler,
+spider) are only tried when no named signature matches. Results for recent
+User-Agent strings are kept in an LRU cache, since a handful of crawlers make
+up most of the traffic.
+
+Extra signatures can be configured with CRAWLER_EXTRA_SIGNATURES
+("token:category,...").
+"""
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from django.conf import settings
+
+AI_TRAINER = 'ai_trainer'
+AI_ASSISTANT = 'ai_assistant'
+SEARCH_ENGINE = 'search_engine'
+SOCIAL_PREVIEW = 'social_preview'
+OTHER_BOT = 'other_bot'
+CATEGORIES = (AI_TRAINER, AI_ASSISTANT, SEARCH_ENGINE, SOCIAL_PREVIEW, OTHER_BOT)
+
+DEFAULT_SIGNATURES = {
+    # Collect content for model training
+    'gptbot': AI_TRAINER,
+    'claudebot': AI_TRAINER,
+    'anthropic-ai': AI_TRAINER,
+    'ccbot': AI_TRAINER,
+    'google-extended': AI_TRAINER,
+    'applebot-extended': AI_TRAINER,
+    'bytespider': AI_TRAINER,
+    'meta-externalagent': AI_TRAINER,
+    'diffbot': AI_TRAINER,
+    'omgilibot': AI_TRAINER,
+    # Fetch pages on behalf of a user or for AI search answers
+    'chatgpt-user': AI_ASSISTANT,
+    'chatgpt': AI_ASSISTANT,
+    'oai-searchbot': AI_ASSISTANT,
+    'claude-user': AI_ASSISTANT,
+    'claude-searchbot': AI_ASSISTANT,
+    'claude-web': AI_ASSISTANT,
+    'claude': AI_ASSISTANT,
+    'perplexitybot': AI_ASSISTANT,
+    'perplexity-user': AI_ASSISTANT,
+    'google-ai': AI_ASSISTANT,
+    'cohere-ai': AI_ASSISTANT,
+    'mistralai-user': AI_ASSISTANT,
+    'duckassistbot': AI_ASSISTANT,
+    'youbot': AI_ASSISTANT,
+    # Search engine indexers (may also feed their AI features)
+    'googlebot': SEARCH_ENGINE,
+    'bingbot': SEARCH_ENGINE,
+    'applebot': SEARCH_ENGINE,
+    'duckduckbot': SEARCH_ENGINE,
+    'yandexbot': SEARCH_ENGINE,
+    'baiduspider': SEARCH_ENGINE,
+    'amazonbot': SEARCH_ENGINE,
+    'slurp': SEARCH_ENGINE,
+    # Link previews
+    'facebookexternalhit': SOCIAL_PREVIEW,
+    'linkedinbot': SOCIAL_PREVIEW,
+    'twitterbot': SOCIAL_PREVIEW,
+    'slackbot': SOCIAL_PREVIEW,
+    'whatsapp': SOCIAL_PREVIEW,
+    'telegrambot': SOCIAL_PREVIEW,
+    'discordbot': SOCIAL_PREVIEW,
+    'pinterestbot': SOCIAL_PREVIEW,
+    'redditbot': SOCIAL_PREVIEW,
+}
+GENERIC_SIGNATURES = ('crawler', 'spider', 'bot')
+
+# Longer User-Agents are classified by their first MAX_USER_AGENT_LENGTH characters
+MAX_USER_AGENT_LENGTH = 512
+
+Crawler = namedtuple('Crawler', ['name', 'category'])
+
+
+def compile_signatures(tokens):
+    alternatives = sorted(tokens, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(token) for token in alternatives), re.IGNORECASE)
+
+
+class CrawlerClassifier:
+    """Classify User-Agent strings against a signature database ({token: category})."""
+    def __init__(self, signatures=None, cache_size=4096):
+        self.signatures = {token.lower(): category for token, category in (signatures or DEFAULT_SIGNATURES).items()}
+        self.pattern = compile_signatures(self.signatures)
+        self.generic_pattern = compile_signatures(GENERIC_SIGNATURES)
+        self.cached_classify = lru_cache(maxsize=cache_size)(self.match)
+
+    def match(self, user_agent):
+        found = self.pattern.search(user_agent)
+        if found:
+            name = found.group(0).lower()
+            return Crawler(name, self.signatures[name])
+        found = self.generic_pattern.search(user_agent)
+        if found:
+            return Crawler(found.group(0).lower(), OTHER_BOT)
+        return None
+
+    def classify(self, user_agent):
+        """Return the Crawler (name, category) a User-Agent belongs to, or None for browsers."""
+        if not user_agent:
+            return None
+        return self.cached_classify(user_agent[:MAX_USER_AGENT_LENGTH])
+
+
+def parse_signatures(value):
+    """Parse "token:category,..." into a dict, ignoring entries with unknown categories."""
+    signatures = {}
+    for item in value.split(','):
+        token, _, category = item.strip().partition(':')
+        if token.strip() and category.strip() in CATEGORIES:
+            signatures[token.strip().lower()] = category.strip()
+    return signatures
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def crawler_classifier():
+    """Return the shared classifier (default signatures plus CRAWLER_EXTRA_SIGNATURES)."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                signatures = dict(DEFAULT_SIGNATURES, **parse_signatures(getattr(settings, 'CRAWLER_EXTRA_SIGNATURES', '')))
+                _classifier = CrawlerClassifier(signatures, getattr(settings, 'CRAWLER_CACHE_SIZE', 4096))
+    return _classifier
+
+
+def classify_user_agent(user_agent):
+    """Classify a User-Agent with the shared classifier. Returns a Crawler or None."""
+    return crawler_classifier().classify(user_agent)
@@ -0,0 +1,109 @@
+"""
+Compact per-page digests of generated AI pages.
+
+A digest (headings plus the opening sentence of the page) is computed once when
+a page is generated and stored with it. Findability analysis then sends a
+token-budgeted list of digests covering every page instead of a few raw snippets.
+"""
+import re
+import math
+from html.parser import HTMLParser
+
+DIGEST_MAX_CHARS = 240
+# Rough average for English text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+
+class DigestExtractor(HTMLParser):
+    """Collect headings and paragraph text from generated page HTML."""
+    def __init__(self):
+        super().__init__()
+        self.headings = []
+        self.paragraphs = []
+        self.current = None
+        self.buffer = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in {'h1', 'h2', 'h3', 'p', 'li'}:
+            self.current = tag
+            self.buffer = []
+
+    def handle_endtag(self, tag):
+        if tag != self.current:
+            return
+        text = ' '.join(''.join(self.buffer).split())
+        if text:
+            if tag in {'h1', 'h2', 'h3'}:
+                self.headings.append(text)
+            else:
+                self.paragraphs.append(text)
+        self.current = None
+
+    def handle_data(self, data):
+        if self.current:
+            self.buffer.append(data)
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def page_digest(page, max_chars=DIGEST_MAX_CHARS):
+    """Return a short digest of a page: its section headings and first sentence."""
+    extractor = DigestExtractor()
+    extractor.feed(str(page.get('content', '')))
+    extractor.close()
+
+    title = str(page.get('title', '')).strip()
+    headings = [h for h in extractor.headings if h.lower() != title.lower()]
+    parts = []
+    if extractor.paragraphs:
+        parts.append(SENTENCE_END_RE.split(extractor.paragraphs[0], maxsplit=1)[0])
+    if headings:
+        parts.append('Sections: ' + '; '.join(headings))
+    digest = ' '.join(parts)
+    if len(digest) > max_chars:
+        digest = digest[:max_chars - 3].rstrip() + '...'
+    return digest
+
+
+def budgeted_digest(pages, token_budget):
+    """
+    Summarize all pages within roughly token_budget tokens.
+    Each page gets an equal share of the budget; digests are shortened to fit,
+    and if even titles alone do not fit, the remaining pages are counted instead.
+    """
+    entries = []
+    for page in pages:
+        if isinstance(page, dict):
+            title = str(page.get('title') or page.get('slug') or 'Untitled').strip()
+            digest = page.get('digest')
+            if not digest:
+                # Pages migrated from before digests were stored have an empty one
+                digest = page_digest(page)
+            entries.append((title, digest))
+    if not entries:
+        return ''
+
+    header = f"AI-Generated Pages Available ({len(entries)}):"
+    budget_chars = token_budget * CHARS_PER_TOKEN - len(header)
+    share = budget_chars // len(entries)
+
+    lines = []
+    used = 0
+    for i, (title, digest) in enumerate(entries):
+        line = f"- {title}"
+        # Leave room for ": " and the newline
+        room = share - len(line) - 3
+        if digest and room >= 20:
+            if len(digest) > room:
+                digest = digest[:room - 3].rstrip() + '...'
+            line += f": {digest}"
+        if used + len(line) + 1 > budget_chars:
+            lines.append(f"- ... and {len(entries) - i} more pages")
+            break
+        lines.append(line)
+        used += len(line) + 1
+    return '\n'.join([header] + lines)
@@ -0,0 +1,85 @@
+"""
+Streaming export of a session's AI pages.
+
+Pages are read from the database in chunks and each one is rendered, added
+to the output and handed to the response before the next is loaded, so an
+export uses the same memory for 10 pages as for 300 and the download starts
+with the first page:
+
+- zip: one standalone HTML file per page (<slug>.html, rendered with the
+  page template) and a sitemap.xml listing them
+- ndjson: one JSON object (slug, title, content, size) per line
+
+The ZIP is written by zipfile to a buffer that can't seek, so every entry is
+followed by a data descriptor and nothing is rewritten afterwards.
+"""
+import json
+import zipfile
+from xml.sax.saxutils import escape
+from django.template.loader import render_to_string
+
+# Pages loaded from the database at a time
+CHUNK_SIZE = 50
+SITEMAP_HEAD = b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+SITEMAP_TAIL = b'</urlset>\n'
+
+
+class StreamBuffer:
+    """Write-only file object that keeps what was written until pop()."""
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_pages(session):
+    return session.pages.only('slug', 'title', 'content_deflate', 'size').iterator(chunk_size=CHUNK_SIZE)
+
+
+def file_name(slug):
+    return f"{slug}.html"
+
+
+def render_page(page, session):
+    """Render page as a standalone HTML file."""
+    context = {'page': page, 'session': session, 'is_ai_crawler': True, 'exported': True}
+    return render_to_string('analyzer/ai_page.html', context)
+
+
+def zip_chunks(session, page_url):
+    """
+    Yield the bytes of a ZIP of the session's pages and a sitemap.xml.
+    page_url(slug) returns the URL listed in the sitemap for a page.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for page in iter_pages(session):
+            archive.writestr(file_name(page.slug), render_page(page, session))
+            yield buffer.pop()
+        with archive.open('sitemap.xml', 'w') as sitemap:
+            sitemap.write(SITEMAP_HEAD)
+            for slug in session.pages.values_list('slug', flat=True).iterator(chunk_size=CHUNK_SIZE * 10):
+                sitemap.write(f"  <url><loc>{escape(page_url(slug))}</loc></url>\n".encode('utf-8'))
+            sitemap.write(SITEMAP_TAIL)
+    yield buffer.pop()
+
+
+def ndjson_lines(session):
+    """Yield one JSON line per page of the session."""
+    for page in iter_pages(session):
+        yield json.dumps({'slug': page.slug, 'title': page.title, 'content': page.content, 'size': page.size}) + '\n'
@@ -0,0 +1,211 @@
+"""
+Local, deterministic findability scoring.
+
+Builds a BM25 index over the website text (split into passages) and the
+session's AI pages, runs simulated user queries derived from the features
+against it, and scores per-feature coverage with NumPy. The same inputs always
+give the same score, and no API call is made.
+
+The AI pages are generated from the same feature list, so queries that repeat
+a feature's wording find them almost by construction. Each feature therefore
+also gets a paraphrased query, with its words swapped for the ones a user
+would more likely type (PARAPHRASES); content that only repeats the feature
+names scores lower on it. The score still measures wording, not whether a
+real searcher would be satisfied.
+"""
+import re
+import math
+import numpy as np
+from .similarity import strip_tags
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from',
+    'how', 'i', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to',
+    'what', 'with', 'you', 'your',
+}
+# Query templates applied to every feature: the feature itself, and the
+# how-to and example questions users ask once they know it exists
+QUERY_TEMPLATES = (
+    '{feature}',
+    'how to use {feature}',
+    '{feature} example',
+)
+# Feature words and the words users more often search with instead
+PARAPHRASES = {
+    'search': 'find', 'find': 'search', 'fast': 'quick', 'quick': 'fast',
+    'export': 'download', 'import': 'upload', 'sync': 'synchronize',
+    'integration': 'connect', 'integrations': 'connect', 'api': 'developer',
+    'analytics': 'insights', 'reports': 'dashboard', 'reporting': 'dashboard', 'dashboard': 'reports',
+    'authentication': 'login', 'sso': 'login',
+    'collaboration': 'teamwork', 'collaborative': 'shared', 'sharing': 'share',
+    'automation': 'automatic', 'automated': 'automatic', 'workflow': 'process', 'workflows': 'process',
+    'notifications': 'alerts', 'notification': 'alert', 'alerts': 'notifications',
+    'customizable': 'configurable', 'custom': 'personalized', 'templates': 'presets',
+    'secure': 'safe', 'security': 'protection', 'encryption': 'encrypted', 'backup': 'restore',
+    'mobile': 'phone', 'offline': 'without internet', 'support': 'help', 'pricing': 'cost',
+    'scheduling': 'calendar', 'payments': 'billing', 'invoicing': 'invoices', 'storage': 'space',
+    'users': 'people', 'team': 'colleagues', 'chat': 'messaging',
+}
+PASSAGE_WORDS = 120
+MAX_FEATURES = 30
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """Lowercase text into word tokens, dropping stopwords and plural endings."""
+    tokens = []
+    for token in TOKEN_RE.findall(str(text).lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_passages(text, words_per_passage=PASSAGE_WORDS):
+    """Split text into passages of roughly equal word count."""
+    words = str(text).split()
+    return [' '.join(words[i:i + words_per_passage]) for i in range(0, len(words), words_per_passage)]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a small document collection.
+
+    Postings are stored per term as (document ids, term frequencies) arrays so
+    a batch of queries can be scored as one matrix product.
+    """
+    def __init__(self, documents, k1=BM25_K1, b=BM25_B):
+        self.k1 = k1
+        self.b = b
+        tokenized = [tokenize(doc) for doc in documents]
+        self.num_docs = len(tokenized)
+        self.doc_lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if self.num_docs and self.doc_lengths.sum() else 1.0
+
+        postings = {}
+        for doc_id, tokens in enumerate(tokenized):
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(doc_id)
+                postings[token][1].append(count)
+        self.postings = {
+            token: (np.array(doc_ids, dtype=np.int32), np.array(freqs, dtype=np.float32))
+            for token, (doc_ids, freqs) in postings.items()
+        }
+
+    def idf(self, term):
+        doc_freq = len(self.postings[term][0]) if term in self.postings else 0
+        return math.log(1 + (self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def term_weights(self, terms):
+        """Return a (len(terms), num_docs) matrix of BM25 term weights."""
+        weights = np.zeros((len(terms), self.num_docs), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avg_length)
+        for row, term in enumerate(terms):
+            if term not in self.postings:
+                continue
+            doc_ids, freqs = self.postings[term]
+            weights[row, doc_ids] = self.idf(term) * freqs * (self.k1 + 1) / (freqs + norm[doc_ids])
+        return weights
+
+    def score_queries(self, queries):
+        """
+        Score tokenized queries against every document.
+        Returns (scores: (num_queries, num_docs) array, ideal: (num_queries,) array)
+        where ideal is the score of an average-length document containing each
+        query term once, used to normalize scores to coverage.
+        """
+        terms = sorted({term for query in queries for term in query})
+        term_ids = {term: i for i, term in enumerate(terms)}
+        incidence = np.zeros((len(queries), len(terms)), dtype=np.float32)
+        for row, query in enumerate(queries):
+            for term in query:
+                incidence[row, term_ids[term]] += 1
+        idf = np.array([self.idf(term) for term in terms], dtype=np.float32)
+        ideal = incidence @ idf
+        if not self.num_docs or not terms:
+            return np.zeros((len(queries), self.num_docs), dtype=np.float32), ideal
+        return incidence @ self.term_weights(terms), ideal
+
+
+def paraphrase(feature):
+    """Return feature with its words replaced by PARAPHRASES, or None if none has a paraphrase."""
+    words = TOKEN_RE.findall(feature.lower())
+    replaced = [PARAPHRASES.get(word, word) for word in words]
+    return ' '.join(replaced) if replaced != words else None
+
+
+def simulated_queries(feature):
+    """Return the simulated user queries for one feature, including a paraphrase if there is one."""
+    queries = [template.format(feature=feature) for template in QUERY_TEMPLATES]
+    paraphrased = paraphrase(feature)
+    if paraphrased:
+        queries.append(paraphrased)
+    return queries
+
+
+def score_findability(website_text, features_list, ai_pages_list=None):
+    """
+    Score how well the site text and AI pages cover each feature.
+    Returns a dict with overall_score (0-100), simulated_queries and
+    feature_coverage ([{"feature", "coverage", "best_match"}]).
+    """
+    documents = []
+    labels = []
+    for passage in split_passages(website_text or ''):
+        documents.append(passage)
+        labels.append('Website content')
+    for page in ai_pages_list or []:
+        if isinstance(page, dict):
+            documents.append(f"{page.get('title', '')} {strip_tags(page.get('content', ''))}")
+            labels.append(page.get('title') or page.get('slug') or 'AI page')
+
+    features = [f for f in features_list[:MAX_FEATURES] if isinstance(f, str) and f.strip()]
+    queries = []
+    query_features = []
+    for feature_id, feature in enumerate(features):
+        for query in simulated_queries(feature):
+            queries.append(query)
+            query_features.append(feature_id)
+
+    index = BM25Index(documents)
+    scores, ideal = index.score_queries([tokenize(q) for q in queries])
+
+    if scores.shape[1]:
+        best = scores.max(axis=1)
+        best_doc = scores.argmax(axis=1)
+    else:
+        best = np.zeros(len(queries), dtype=np.float32)
+        best_doc = np.zeros(len(queries), dtype=np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        query_coverage = np.where(ideal > 0, np.minimum(1.0, best / ideal), 0.0)
+
+    # Average query coverage per feature in one pass
+    query_features = np.array(query_features, dtype=np.int64)
+    totals = np.bincount(query_features, weights=query_coverage, minlength=len(features))
+    counts = np.bincount(query_features, minlength=len(features))
+    feature_coverage = np.divide(totals, counts, out=np.zeros(len(features)), where=counts > 0)
+
+    coverage_notes = []
+    for feature_id, feature in enumerate(features):
+        rows = np.flatnonzero(query_features == feature_id)
+        top = rows[np.argmax(best[rows])] if len(rows) else None
+        coverage_notes.append({
+            'feature': feature,
+            'coverage': int(round(100 * feature_coverage[feature_id])),
+            'best_match': labels[best_doc[top]] if top is not None and best[top] > 0 else None,
+        })
+
+    overall = int(round(100 * feature_coverage.mean())) if len(features) else 0
+    return {
+        'overall_score': max(0, min(100, overall)),
+        'simulated_queries': queries,
+        'feature_coverage': coverage_notes,
+    }
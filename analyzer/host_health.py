@@ -0,0 +1,189 @@
+"""
+Per-host health tracking for website fetches.
+
+Each host (name and port) gets a circuit breaker and a latency history:
+
+- after FETCH_BREAKER_FAILURES consecutive failures (timeouts, connection
+  errors, 5xx responses) the circuit opens and fetches of that host fail
+  immediately for FETCH_BREAKER_OPEN_SECONDS
+- then the circuit is half-open: one probe fetch is let through, and closes
+  the circuit again if it succeeds or re-opens it if it fails; a probe that
+  ends without either (deadline, refused address) lets the next fetch probe
+- connect and read timeouts follow the host's observed p95 connect time and
+  time to first byte (times FETCH_TIMEOUT_MULTIPLIER), within
+  FETCH_MIN_TIMEOUT and FETCH_CONNECT_TIMEOUT / FETCH_READ_TIMEOUT, so a slow
+  host gets its full allowance while a fast one that suddenly hangs is given
+  up on early
+
+State is kept per process, like the rate limiter. Deadline is the time budget
+of a whole analysis (ANALYSIS_DEADLINE_SECONDS), which caps these timeouts and
+the OpenAI call that follows the fetch.
+"""
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Latency samples kept per host, and needed before timeouts adapt
+SAMPLE_WINDOW = 50
+MIN_SAMPLES = 5
+
+
+def host_key(hostname, port):
+    return f"{hostname.lower().rstrip('.')}:{port}"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class HostHealth:
+    """Circuit state and recent latencies of one host."""
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.connect_times = deque(maxlen=SAMPLE_WINDOW)
+        self.first_byte_times = deque(maxlen=SAMPLE_WINDOW)
+
+
+class HostHealthTracker:
+    """Circuit breakers and adaptive timeouts for up to max_hosts hosts."""
+    def __init__(self, failure_threshold=3, open_seconds=60.0, connect_timeout=5.0, read_timeout=10.0,
+                 min_timeout=1.0, multiplier=3.0, max_hosts=2048):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.min_timeout = min_timeout
+        self.multiplier = multiplier
+        self.max_hosts = max_hosts
+        self.hosts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def health(self, host):
+        health = self.hosts.get(host)
+        if health is None:
+            health = self.hosts[host] = HostHealth()
+            while len(self.hosts) > self.max_hosts:
+                self.hosts.popitem(last=False)
+        self.hosts.move_to_end(host)
+        return health
+
+    def allow(self, host):
+        """
+        Return (True, 0) if host may be fetched now, or (False, seconds until it
+        may be retried) while its circuit is open or a probe is in flight.
+        """
+        now = time.monotonic()
+        with self.lock:
+            health = self.health(host)
+            if health.state == CLOSED:
+                return True, 0
+            if health.state == OPEN:
+                retry_in = health.opened_at + self.open_seconds - now
+                if retry_in > 0:
+                    return False, retry_in
+                health.state = HALF_OPEN
+                health.probe_started = None
+            # Half-open: one probe at a time; a probe that never reported back is replaced
+            if health.probe_started is None or now - health.probe_started > self.open_seconds:
+                health.probe_started = now
+                return True, 0
+            return False, self.open_seconds - (now - health.probe_started)
+
+    def timeouts(self, host):
+        """Return (connect, read) timeouts for host."""
+        with self.lock:
+            health = self.health(host)
+            return (self.adaptive(health.connect_times, self.connect_timeout),
+                    self.adaptive(health.first_byte_times, self.read_timeout))
+
+    def adaptive(self, samples, maximum):
+        if len(samples) < MIN_SAMPLES:
+            return maximum
+        return max(self.min_timeout, min(maximum, percentile(samples, 0.95) * self.multiplier))
+
+    def record_connect(self, host, seconds):
+        with self.lock:
+            self.health(host).connect_times.append(seconds)
+
+    def record_success(self, host, first_byte_seconds=None):
+        with self.lock:
+            health = self.health(host)
+            if health.state != CLOSED:
+                logger.info(f"Circuit for {host} closed after a successful probe")
+            health.state = CLOSED
+            health.failures = 0
+            health.probe_started = None
+            if first_byte_seconds is not None:
+                health.first_byte_times.append(first_byte_seconds)
+
+    def record_failure(self, host):
+        with self.lock:
+            health = self.health(host)
+            health.failures += 1
+            if health.state == HALF_OPEN or health.failures >= self.failure_threshold:
+                if health.state != OPEN:
+                    logger.warning(f"Circuit for {host} opened after {health.failures} consecutive failure(s)")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+                health.probe_started = None
+
+    def release(self, host):
+        """Free a half-open host's probe when the fetch ended without telling anything about the host."""
+        with self.lock:
+            health = self.health(host)
+            if health.state == HALF_OPEN:
+                health.probe_started = None
+
+    def state(self, host):
+        with self.lock:
+            return self.health(host).state
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def host_health():
+    """Return the process-wide tracker, configured from the FETCH_* settings."""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = HostHealthTracker(
+                    failure_threshold=getattr(settings, 'FETCH_BREAKER_FAILURES', 3),
+                    open_seconds=getattr(settings, 'FETCH_BREAKER_OPEN_SECONDS', 60.0),
+                    connect_timeout=getattr(settings, 'FETCH_CONNECT_TIMEOUT', 5.0),
+                    read_timeout=getattr(settings, 'FETCH_READ_TIMEOUT', 10.0),
+                    min_timeout=getattr(settings, 'FETCH_MIN_TIMEOUT', 1.0),
+                    multiplier=getattr(settings, 'FETCH_TIMEOUT_MULTIPLIER', 3.0),
+                )
+    return _tracker
+
+
+class Deadline:
+    """A time budget shared by the steps of one request."""
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cap(self, timeout):
+        """Return timeout, shortened to what is left of the budget."""
+        return min(timeout, self.remaining())
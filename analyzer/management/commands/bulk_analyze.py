@@ -0,0 +1,41 @@
+import sys
+import json
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from analyzer.bulk import parse_urls, iter_bulk_analysis
+
+
+class Command(BaseCommand):
+    help = "Analyze many websites (fetch + feature extraction) and write one NDJSON result per URL as they finish."
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File with one URL per line, or a CSV with a url column ('-' for stdin)")
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent analyses (default: BULK_MAX_WORKERS)")
+        parser.add_argument('--output', help="Write NDJSON results to this file instead of stdout")
+        parser.add_argument('--no-save', action='store_true', help="Do not store results as analysis sessions")
+
+    def handle(self, *args, **options):
+        try:
+            if options['input'] == '-':
+                text = sys.stdin.read()
+            else:
+                with open(options['input'], encoding='utf-8') as f:
+                    text = f.read()
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['input']}: {e}")
+
+        urls = parse_urls(text)
+        if not urls:
+            raise CommandError("No URLs found in input")
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else self.stdout
+        succeeded = 0
+        try:
+            for result in iter_bulk_analysis(urls, options['workers'], save=not options['no_save']):
+                succeeded += result['ok']
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+        finally:
+            if options['output']:
+                out.close()
+        self.stderr.write(f"Analyzed {len(set(urls))} URL(s): {succeeded} succeeded")
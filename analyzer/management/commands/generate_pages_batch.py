@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from analyzer.batch_jobs import JobError, Checkpoint, load_jobs, run_sync, run_batch_api
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate AI pages for the jobs in a JSONL file ({\"url\", \"features\", \"pages\"} per line). "
+        "Progress is checkpointed; re-running the same command resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('jobs', help="JSONL job file")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <jobs>.checkpoint)")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent jobs (sync mode) or feature extractions")
+        parser.add_argument('--flush-every', type=int, default=10, help="Finished jobs written per transaction")
+        parser.add_argument('--batch-api', action='store_true',
+                            help="Submit page generation through the OpenAI Batch API instead of synchronous calls")
+        parser.add_argument('--poll-interval', type=float, default=30.0, help="Seconds between batch status checks")
+
+    def handle(self, *args, **options):
+        try:
+            jobs = load_jobs(options['jobs'])
+        except (OSError, JobError) as e:
+            raise CommandError(str(e))
+
+        checkpoint = Checkpoint(options['checkpoint'] or f"{options['jobs']}.checkpoint")
+        unsaved = checkpoint.drop_unsaved()
+        if unsaved:
+            self.stdout.write(f"{len(unsaved)} checkpointed job(s) were not saved and will run again")
+        remaining = [job for job in jobs if job['key'] not in checkpoint.done]
+        self.stdout.write(f"{len(jobs)} job(s), {len(jobs) - len(remaining)} already done")
+        if not remaining and not checkpoint.pending_batch:
+            return
+
+        done_before = len(checkpoint.done)
+        start = time.monotonic()
+        if options['batch_api']:
+            run_batch_api(remaining, checkpoint, workers=options['workers'],
+                          poll_interval=options['poll_interval'], report=self.stdout.write)
+        else:
+            run_sync(remaining, checkpoint, workers=options['workers'],
+                     flush_every=max(1, options['flush_every']), report=self.stdout.write)
+
+        elapsed = time.monotonic() - start
+        finished = len(checkpoint.done) - done_before
+        rate = finished * 3600 / elapsed if elapsed else 0
+        self.stdout.write(f"Finished {finished} job(s) in {elapsed:.1f}s ({rate:.0f} jobs/hour)")
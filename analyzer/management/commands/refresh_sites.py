@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from analyzer.models import AnalysisSession
+from analyzer.refresh import track_site, refresh_due_sites, seconds_until_next_due
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-check tracked websites that are due and refresh their analysis (features, AI pages) "
+        "only when their content changed. Run it from cron, or keep it running with --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--track', type=int, metavar='SESSION_ID', help="Start tracking the website of this session and exit")
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Hours between checks of the tracked site (default: REFRESH_INTERVAL_HOURS)")
+        parser.add_argument('--no-regenerate', action='store_true', help="With --track: refresh features only, not AI pages")
+        parser.add_argument('--limit', type=int, default=None, help="Check at most this many due sites per run")
+        parser.add_argument('--loop', action='store_true', help="Keep running, checking sites as they come due")
+        parser.add_argument('--max-sleep', type=float, default=300.0, help="With --loop: longest sleep between runs, in seconds")
+
+    def handle(self, *args, **options):
+        if options['track'] is not None:
+            session = AnalysisSession.objects.filter(pk=options['track']).first()
+            if session is None or not session.website_url:
+                raise CommandError(f"Session {options['track']} doesn't exist or has no analyzed website")
+            site = track_site(session, options['interval'], regenerate_pages=not options['no_regenerate'])
+            self.stdout.write(f"Tracking {session.website_url} every {site.interval_hours:g}h, first check at {site.next_check_at:%Y-%m-%d %H:%M}")
+            return
+
+        while True:
+            counts = refresh_due_sites(options['limit'])
+            if counts:
+                self.stdout.write(', '.join(f"{count} {status}" for status, count in sorted(counts.items())))
+            if not options['loop']:
+                return
+            close_old_connections()
+            wait = seconds_until_next_due()
+            time.sleep(options['max_sleep'] if wait is None else min(max(wait, 1.0), options['max_sleep']))
@@ -0,0 +1,198 @@
+"""
+In-process metrics for the analysis hot path.
+
+Timing spans for each stage (fetch, HTML parsing, OpenAI calls, DB saves),
+bytes fetched and OpenAI token usage are collected in a small registry and
+exported in the Prometheus text format by the /metrics view. Every span is
+also logged as a single key=value line so slow analyses can be traced in the
+logs without a metrics server.
+
+Metrics are kept per process: with several gunicorn workers each worker
+reports its own counters, and Prometheus sums them across scrape targets.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from .prompts import cached_prompt_tokens
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers sub-millisecond parsing up to slow multi-batch OpenAI calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labelnames, values, extra=None):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for a named metric with a fixed set of label names."""
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self.label_values(labels), 0.0)
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        with self.lock:
+            counts, _ = self.values.get(self.label_values(labels), ([0], 0.0))
+            return sum(counts)
+
+    def render(self):
+        lines = self.header()
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = f'le="{format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'analyzer_stage_duration_seconds', 'Time spent in each analysis stage.', ['stage']))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    'analyzer_stage_errors_total', 'Analysis stages that raised an exception.', ['stage']))
+FETCH_BYTES = REGISTRY.register(Counter(
+    'analyzer_fetch_bytes_total', 'Bytes of HTML read from analyzed websites.'))
+FETCH_SHORT_CIRCUITS = REGISTRY.register(Counter(
+    'analyzer_fetch_short_circuits_total', 'Fetches refused because the host\'s circuit breaker was open.'))
+MODEL_CALL_SECONDS = REGISTRY.register(Histogram(
+    'analyzer_model_call_duration_seconds', 'OpenAI call latency per routed task and model.', ['task', 'model']))
+MODEL_CALLS = REGISTRY.register(Counter(
+    'analyzer_model_calls_total', 'OpenAI calls per routed task, model and outcome (accepted, rejected, truncated, error).',
+    ['task', 'model', 'outcome']))
+MODEL_ESCALATIONS = REGISTRY.register(Counter(
+    'analyzer_model_escalations_total', 'Calls whose output made a task escalate to the next model.', ['task', 'model']))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    'analyzer_openai_tokens_total', 'OpenAI tokens used, from response.usage.', ['call', 'kind']))
+
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Time a stage, record it in STAGE_SECONDS and log it as one key=value line.
+    Yields a dict; anything added to it (bytes, tokens, counts) is included in the log line.
+    """
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield fields
+    except Exception:
+        status = 'error'
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        details = ''.join(f" {key}={value}" for key, value in fields.items())
+        logger.info(f"stage={stage} status={status} duration_ms={elapsed * 1000:.1f}{details}")
+
+
+def record_openai_usage(call, usage, fields=None):
+    """Add prompt, completion and cached prompt tokens from usage to OPENAI_TOKENS (and to span fields)."""
+    if not usage:
+        return
+    tokens = {
+        'prompt': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached_prompt': cached_prompt_tokens(usage),
+    }
+    for kind, amount in tokens.items():
+        OPENAI_TOKENS.inc(amount, call=call, kind=kind)
+    if fields is not None:
+        fields.update({f"{kind}_tokens": amount for kind, amount in tokens.items()})
+
+
+def render_metrics():
+    """Return all metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
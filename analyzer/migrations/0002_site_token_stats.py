@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteTokenStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, unique=True)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('truncated_batches', models.PositiveIntegerField(default=0)),
+                ('pages_generated', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveBigIntegerField(default=0)),
+                ('tokens_per_page', models.FloatField(default=1000.0)),
+                ('truncation_rate', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Site token stats',
+            },
+        ),
+    ]
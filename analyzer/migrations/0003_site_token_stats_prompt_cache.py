@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_site_token_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitetokenstats',
+            name='cached_prompt_tokens',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sitetokenstats',
+            name='prompt_tokens',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_site_token_stats_prompt_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysissession',
+            name='website_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
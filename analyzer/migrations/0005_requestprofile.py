@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_analysissession_website_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('mode', models.CharField(max_length=10)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('folded_stacks', models.TextField(blank=True, default='')),
+                ('cprofile_stats', models.TextField(blank=True, default='')),
+                ('sql_count', models.PositiveIntegerField(default=0)),
+                ('sql_ms', models.FloatField(default=0.0)),
+                ('slowest_queries', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_pages_to_rows(apps, schema_editor):
+    """Move pages from the AnalysisSession.ai_pages JSON list into AiPage rows."""
+    AnalysisSession = apps.get_model('analyzer', 'AnalysisSession')
+    AiPage = apps.get_model('analyzer', 'AiPage')
+    for session in AnalysisSession.objects.iterator():
+        if not isinstance(session.ai_pages, list):
+            continue
+        rows = []
+        seen = set()
+        for page in session.ai_pages:
+            if not isinstance(page, dict) or not page.get('slug') or page['slug'] in seen:
+                continue
+            seen.add(page['slug'])
+            content = str(page.get('content', ''))
+            rows.append(AiPage(
+                session=session,
+                position=len(rows),
+                slug=str(page['slug'])[:255],
+                title=str(page.get('title', ''))[:500],
+                content=content,
+                digest=page.get('digest') or '',
+                size=len(content.encode('utf-8')),
+            ))
+        AiPage.objects.bulk_create(rows)
+
+
+def copy_pages_to_json(apps, schema_editor):
+    AnalysisSession = apps.get_model('analyzer', 'AnalysisSession')
+    for session in AnalysisSession.objects.filter(pages__isnull=False).distinct().iterator():
+        session.ai_pages = list(session.pages.order_by('position').values('slug', 'title', 'content', 'digest'))
+        session.save(update_fields=['ai_pages'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_requestprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AiPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('slug', models.CharField(max_length=255)),
+                ('title', models.CharField(max_length=500)),
+                ('content', models.TextField()),
+                ('digest', models.TextField(blank=True, default='')),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='analyzer.analysissession')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('session', 'slug'), name='unique_ai_page_slug'), models.UniqueConstraint(fields=('session', 'position'), name='unique_ai_page_position')],
+            },
+        ),
+        migrations.RunPython(copy_pages_to_rows, copy_pages_to_json),
+        migrations.RemoveField(
+            model_name='analysissession',
+            name='ai_pages',
+        ),
+    ]
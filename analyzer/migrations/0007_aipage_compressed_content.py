@@ -0,0 +1,54 @@
+# Generated by Django 5.2.10 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+def compress_pages(apps, schema_editor):
+    """Move AiPage.content into the compressed content_deflate/content_crc32 columns."""
+    from analyzer.compression import compress_content
+    AiPage = apps.get_model('analyzer', 'AiPage')
+    pages = []
+    for page in AiPage.objects.only('id', 'content').iterator():
+        page.content_deflate, page.content_crc32, page.size = compress_content(page.content)
+        pages.append(page)
+    AiPage.objects.bulk_update(pages, ['content_deflate', 'content_crc32', 'size'], batch_size=500)
+
+
+def decompress_pages(apps, schema_editor):
+    from analyzer.compression import decompress_content
+    AiPage = apps.get_model('analyzer', 'AiPage')
+    pages = []
+    for page in AiPage.objects.only('id', 'content_deflate').iterator():
+        page.content = decompress_content(page.content_deflate)
+        pages.append(page)
+    AiPage.objects.bulk_update(pages, ['content'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_aipage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aipage',
+            name='content_deflate',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='aipage',
+            name='content_crc32',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='aipage',
+            name='content',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(compress_pages, decompress_pages),
+        migrations.RemoveField(
+            model_name='aipage',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.10 on 2026-10-19 02:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0008_singleflightentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlHit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('slug', models.CharField(max_length=255)),
+                ('crawler', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=20)),
+                ('bytes_sent', models.PositiveIntegerField(default=0)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crawl_hits', to='analyzer.analysissession')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CrawlRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('slug', models.CharField(max_length=255)),
+                ('crawler', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=20)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('bytes_sent', models.PositiveBigIntegerField(default=0)),
+                ('last_seen', models.DateTimeField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crawl_rollups', to='analyzer.analysissession')),
+            ],
+            options={
+                'ordering': ['-day', '-hits'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'session', 'slug', 'crawler'), name='unique_crawl_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.10 on 2026-10-19 03:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0009_crawl_analytics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackedSite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enabled', models.BooleanField(default=True)),
+                ('interval_hours', models.FloatField(default=24)),
+                ('regenerate_pages', models.BooleanField(default=True)),
+                ('next_check_at', models.DateTimeField(db_index=True)),
+                ('etag', models.CharField(blank=True, default='', max_length=255)),
+                ('last_modified', models.CharField(blank=True, default='', max_length=64)),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=16)),
+                ('last_checked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_changed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(choices=[('new', 'Not checked yet'), ('not_modified', 'Not modified (304)'), ('unchanged', 'Changed less than the threshold'), ('changed', 'Changed, analysis refreshed'), ('error', 'Error')], default='new', max_length=20)),
+                ('last_distance', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('consecutive_errors', models.PositiveIntegerField(default=0)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tracked_site', to='analyzer.analysissession')),
+            ],
+            options={
+                'ordering': ['next_check_at'],
+            },
+        ),
+    ]
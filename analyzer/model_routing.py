@@ -0,0 +1,171 @@
+"""
+Tiered model routing for OpenAI calls.
+
+Each task (extract_features, generate_pages, findability) has a route: the
+models to try in order, fastest and cheapest first (MODEL_ROUTES). The
+response of each model is checked by a task-specific validator:
+
+- output that can't be used (not JSON, wrong shape) is discarded and the next
+  model is called; so is a failed call
+- usable but weak output (too few features, thin pages, missing report
+  sections) is kept as a fallback, and the next model is asked to do better;
+  if none does, the fallback is used rather than failing the request
+- output cut off by max_tokens (TRUNCATED) is returned as is, without
+  escalating: the caller asked for too much, a larger model wouldn't help
+
+Latency, outcome and escalations are recorded per task and model in the
+analyzer_model_* metrics, so escalation rates show whether a route's first
+model is good enough for the task.
+"""
+import time
+import logging
+from django.conf import settings
+from .metrics import record_openai_usage, MODEL_CALL_SECONDS, MODEL_CALLS, MODEL_ESCALATIONS
+from .page_collector import parse_json_content
+from .rate_limit import openai_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTE = ['gpt-4o']
+
+# Feature extraction: fewer features, or mostly sentence-long ones, are escalated
+MIN_FEATURES = 3
+MAX_FEATURE_WORDS = 15
+MAX_LONG_FEATURES_SHARE = 0.25
+# Page generation: pages shorter than this are thin; a batch needs at least half its pages usable
+MIN_PAGE_CONTENT_CHARS = 200
+MIN_USABLE_PAGES_SHARE = 0.5
+
+# Problem reported by validators for output cut off by max_tokens
+TRUNCATED = 'truncated by max_tokens'
+
+
+class RoutingError(Exception):
+    """No model on a task's route returned usable output."""
+
+
+def route_models(task):
+    """Return the models configured for task, in the order they are tried."""
+    models = [model.strip() for model in getattr(settings, 'MODEL_ROUTES', {}).get(task, []) if model.strip()]
+    return models or DEFAULT_ROUTE
+
+
+def route_completion(task, client, validate, deadline=None, fields=None, **request):
+    """
+    Run a chat completion for task, escalating along its route until validate accepts the output.
+    validate(response) returns (result, problem): problem is None when result is good, otherwise
+    a reason; result is None when the output can't be used at all. A TRUNCATED problem
+    returns the response right away, for the caller to replan.
+    Returns (response, result, model). Raises RoutingError if no model returned usable output
+    (or the deadline ran out first), or the last model's API error.
+    """
+    models = route_models(task)
+    fallback = None
+    problem = None
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        if deadline is not None:
+            if not openai_rate_limiter().acquire(timeout=deadline.remaining()) or deadline.expired:
+                if fallback is not None:
+                    break
+                raise RoutingError("The analysis took too long. Please try again.")
+            request['timeout'] = deadline.cap(60.0)
+        else:
+            openai_rate_limiter().acquire()
+
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(model=model, **request)
+        except Exception as e:
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - start, task=task, model=model)
+            MODEL_CALLS.inc(task=task, model=model, outcome='error')
+            if last and fallback is None:
+                raise
+            problem = f"{type(e).__name__}: {str(e)[:100]}"
+        else:
+            MODEL_CALL_SECONDS.observe(time.perf_counter() - start, task=task, model=model)
+            record_openai_usage(task, response.usage, fields)
+            result, problem = validate(response)
+            if problem == TRUNCATED:
+                MODEL_CALLS.inc(task=task, model=model, outcome='truncated')
+                if fields is not None:
+                    fields.update(model=model, escalations=index)
+                return response, result, model
+            MODEL_CALLS.inc(task=task, model=model, outcome='accepted' if problem is None else 'rejected')
+            if problem is None:
+                if fields is not None:
+                    fields.update(model=model, escalations=index)
+                return response, result, model
+            if result is not None:
+                fallback = (response, result, model)
+
+        if not last:
+            MODEL_ESCALATIONS.inc(task=task, model=model)
+            logger.info(f"Escalating {task} from {model} to {models[index + 1]}: {problem}")
+
+    if fallback is None:
+        raise RoutingError(problem)
+    logger.warning(f"No model on the {task} route passed validation ({problem}), using output of {fallback[2]}")
+    if fields is not None:
+        fields.update(model=fallback[2], escalations=len(models) - 1)
+    return fallback
+
+
+def parse_response(response):
+    """Return the parsed JSON content of response, or None if it isn't JSON."""
+    try:
+        return parse_json_content(response.choices[0].message.content)
+    except ValueError:
+        return None
+
+
+def validate_features(response):
+    """Validator for feature extraction; the result is the list of feature strings."""
+    features = parse_response(response)
+    if features is None:
+        return None, "Failed to parse OpenAI response as JSON"
+    if not isinstance(features, list):
+        return None, "OpenAI returned invalid format (expected a list)"
+    cleaned = [feature.strip() for feature in features if isinstance(feature, str) and feature.strip()]
+    if not cleaned:
+        return None, "No valid features were extracted"
+    if len(cleaned) < MIN_FEATURES:
+        return cleaned, f"only {len(cleaned)} feature(s)"
+    long_features = sum(1 for feature in cleaned if len(feature.split()) > MAX_FEATURE_WORDS)
+    if long_features > MAX_LONG_FEATURES_SHARE * len(cleaned):
+        return cleaned, f"{long_features} of {len(cleaned)} features are sentences"
+    return cleaned, None
+
+
+def pages_validator(pages_requested):
+    """Validator for one page generation batch; the result is the parsed list of pages."""
+    def validate(response):
+        if response.choices[0].finish_reason == 'length':
+            # A planning problem the batch planner handles, not the model's
+            return None, TRUNCATED
+        pages = parse_response(response)
+        if not isinstance(pages, list):
+            return None, "invalid format (expected a list)"
+        usable = [
+            page for page in pages
+            if isinstance(page, dict) and page.get('slug') and page.get('title')
+            and len(str(page.get('content', ''))) >= MIN_PAGE_CONTENT_CHARS
+        ]
+        if len(usable) < MIN_USABLE_PAGES_SHARE * pages_requested:
+            return (pages or None), f"{len(usable)} of {pages_requested} pages usable"
+        return pages, None
+    return validate
+
+
+def validate_findability(response):
+    """Validator for findability notes; the result is the report dict."""
+    report = parse_response(response)
+    if report is None:
+        return None, "Failed to parse OpenAI response as JSON"
+    if not isinstance(report, dict):
+        return None, "OpenAI returned invalid format (expected a dictionary)"
+    missing = [key for key in ('per_feature_notes', 'content_gaps', 'recommendations')
+               if not report.get(key)]
+    if missing:
+        return report, f"missing {', '.join(missing)}"
+    return report, None
@@ -1,13 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 import json
+from .compression import compress_content, decompress_content
 
 
 class AnalysisSession(models.Model):
     """Stores analysis session data for a website."""
     created_at = models.DateTimeField(auto_now_add=True)
     website_url = models.URLField(blank=True, null=True)
+    website_text = models.TextField(blank=True, default='')
     features = models.JSONField(default=list, blank=True)
-    ai_pages = models.JSONField(default=list, blank=True)
     findability_report = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
@@ -21,9 +22,215 @@ class AnalysisSession(models.Model):
     @property
     def ai_pages_count(self):
         """Return the count of AI pages."""
-        return len(self.ai_pages) if isinstance(self.ai_pages, list) else 0
+        return self.pages.count() if self.pk else 0
 
     @property
     def has_findability_report(self):
         """Check if findability report exists."""
         return bool(self.findability_report and isinstance(self.findability_report, dict))
+
+    def ai_pages_list(self):
+        """Return the AI pages as dicts (slug, title, content, digest), in generation order."""
+        return [
+            {'slug': page.slug, 'title': page.title, 'content': page.content, 'digest': page.digest}
+            for page in self.pages.all()
+        ]
+
+    def replace_ai_pages(self, pages):
+        """Replace all AI pages of this session with pages (dicts with slug, title, content and digest)."""
+        with transaction.atomic():
+            self.pages.all().delete()
+            AiPage.objects.bulk_create([AiPage.from_dict(self, position, page) for position, page in enumerate(pages)])
+
+
+class AiPage(models.Model):
+    """An AI-oriented page generated for an analysis session."""
+    session = models.ForeignKey(AnalysisSession, on_delete=models.CASCADE, related_name='pages')
+    position = models.PositiveIntegerField()
+    slug = models.CharField(max_length=255)
+    title = models.CharField(max_length=500)
+    # Page HTML as raw DEFLATE (see compression); read through the content property
+    content_deflate = models.BinaryField(default=b'')
+    content_crc32 = models.PositiveBigIntegerField(default=0)
+    digest = models.TextField(blank=True, default='')
+    # Uncompressed size of content in bytes, so listings never need to load it
+    size = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'slug'], name='unique_ai_page_slug'),
+            models.UniqueConstraint(fields=['session', 'position'], name='unique_ai_page_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.slug} (session {self.session_id})"
+
+    @property
+    def content(self):
+        """Page HTML, decompressed on first access."""
+        if not hasattr(self, '_content'):
+            self._content = decompress_content(self.content_deflate)
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+        self.content_deflate, self.content_crc32, self.size = compress_content(value)
+
+    @classmethod
+    def from_dict(cls, session, position, page):
+        ai_page = cls(
+            session=session,
+            position=position,
+            slug=str(page['slug'])[:255],
+            title=str(page.get('title', ''))[:500],
+            digest=page.get('digest') or '',
+        )
+        ai_page.content = str(page.get('content', ''))
+        return ai_page
+
+
+class SiteTokenStats(models.Model):
+    """Stores observed token usage per website host, used to plan AI page batches."""
+    host = models.CharField(max_length=255, unique=True)
+    batches = models.PositiveIntegerField(default=0)
+    truncated_batches = models.PositiveIntegerField(default=0)
+    pages_generated = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    tokens_per_page = models.FloatField(default=1000.0)
+    truncation_rate = models.FloatField(default=0.0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    cached_prompt_tokens = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Site token stats'
+
+    def __str__(self):
+        return f"{self.host} - {self.tokens_per_page:.0f} tokens/page"
+
+    @property
+    def cache_hit_rate(self):
+        """Return the fraction of prompt tokens served from the provider's prompt cache."""
+        return self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+class RequestProfile(models.Model):
+    """A profiled request captured by config.profiling_middleware."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    mode = models.CharField(max_length=10)
+    samples = models.PositiveIntegerField(default=0)
+    folded_stacks = models.TextField(blank=True, default='')
+    cprofile_stats = models.TextField(blank=True, default='')
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0.0)
+    slowest_queries = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} - {self.duration_ms:.0f}ms"
+
+
+class SingleFlightEntry(models.Model):
+    """A computation in flight (or just finished) shared by identical concurrent requests, see single_flight."""
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_CHOICES = [(STATUS_RUNNING, 'Running'), (STATUS_DONE, 'Done')]
+
+    key = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    owner = models.CharField(max_length=200, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Running: when the owner is presumed dead. Done: until when the result is reused
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = 'Single-flight entries'
+
+    def __str__(self):
+        return f"{self.key[:12]} - {self.status}"
+
+
+class CrawlHit(models.Model):
+    """A crawler fetch of an AI page, written in batches by crawl_analytics."""
+    created_at = models.DateTimeField(db_index=True)
+    session = models.ForeignKey(AnalysisSession, on_delete=models.CASCADE, related_name='crawl_hits')
+    slug = models.CharField(max_length=255)
+    crawler = models.CharField(max_length=100)
+    category = models.CharField(max_length=20)
+    bytes_sent = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.crawler} - {self.slug}"
+
+
+class CrawlRollup(models.Model):
+    """Daily crawl totals per page and crawler."""
+    day = models.DateField()
+    session = models.ForeignKey(AnalysisSession, on_delete=models.CASCADE, related_name='crawl_rollups')
+    slug = models.CharField(max_length=255)
+    crawler = models.CharField(max_length=100)
+    category = models.CharField(max_length=20)
+    hits = models.PositiveIntegerField(default=0)
+    bytes_sent = models.PositiveBigIntegerField(default=0)
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-day', '-hits']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'session', 'slug', 'crawler'], name='unique_crawl_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.crawler} - {self.slug} ({self.hits})"
+
+
+class TrackedSite(models.Model):
+    """A session's website, re-fetched on a schedule to refresh its analysis when the site changes."""
+    STATUS_NEW = 'new'
+    STATUS_NOT_MODIFIED = 'not_modified'
+    STATUS_UNCHANGED = 'unchanged'
+    STATUS_CHANGED = 'changed'
+    STATUS_ERROR = 'error'
+    STATUS_CHOICES = [
+        (STATUS_NEW, 'Not checked yet'),
+        (STATUS_NOT_MODIFIED, 'Not modified (304)'),
+        (STATUS_UNCHANGED, 'Changed less than the threshold'),
+        (STATUS_CHANGED, 'Changed, analysis refreshed'),
+        (STATUS_ERROR, 'Error'),
+    ]
+
+    session = models.OneToOneField(AnalysisSession, on_delete=models.CASCADE, related_name='tracked_site')
+    enabled = models.BooleanField(default=True)
+    interval_hours = models.FloatField(default=24)
+    # Regenerate the session's AI pages (same number of pages) when the site changed
+    regenerate_pages = models.BooleanField(default=True)
+    next_check_at = models.DateTimeField(db_index=True)
+    # Validators from the last fetch, sent back as If-None-Match / If-Modified-Since
+    etag = models.CharField(max_length=255, blank=True, default='')
+    last_modified = models.CharField(max_length=64, blank=True, default='')
+    # 64-bit SimHash of the extracted text the current analysis is based on, as hex
+    fingerprint = models.CharField(max_length=16, blank=True, default='')
+    last_checked_at = models.DateTimeField(null=True, blank=True)
+    last_changed_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_NEW)
+    last_distance = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    consecutive_errors = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['next_check_at']
+
+    def __str__(self):
+        return f"{self.session.website_url or 'No URL'} (session {self.session_id})"
@@ -0,0 +1,63 @@
+"""
+Accumulates generated pages across batches.
+
+Shared by the synchronous generator in views and the offline batch command:
+each batch of pages returned by the model is validated, near-duplicates of
+pages already accepted are dropped, slugs are made unique and a digest is
+stored with every page.
+"""
+import re
+import json
+from django.conf import settings
+from .digests import page_digest
+from .similarity import VectorIndex, page_text
+from .slugs import SlugAllocator
+
+
+def parse_json_content(content):
+    """Parse a model response as JSON, removing markdown code fences if present."""
+    content = (content or '').strip()
+    content = re.sub(r'^```json\s*', '', content)
+    content = re.sub(r'^```\s*', '', content)
+    content = re.sub(r'```\s*$', '', content)
+    return json.loads(content.strip())
+
+
+class PageCollector:
+    """Collect unique, cleaned pages from successive generation batches."""
+    def __init__(self, dedup_threshold=None):
+        self.pages = []
+        self.index = VectorIndex()
+        self.slugs = SlugAllocator()
+        self.threshold = dedup_threshold if dedup_threshold is not None else getattr(settings, 'AI_PAGE_DEDUP_THRESHOLD', 0.9)
+        self.duplicates_skipped = 0
+
+    def __len__(self):
+        return len(self.pages)
+
+    def add_batch(self, batch_pages):
+        """Add the valid, non-duplicate pages of one batch. Returns the number of pages added."""
+        before = len(self.pages)
+        valid_pages = [
+            page for page in batch_pages
+            if isinstance(page, dict) and 'slug' in page and 'title' in page and 'content' in page
+        ]
+        vectors = self.index.embed([page_text(page) for page in valid_pages])
+        for page, vector in zip(valid_pages, vectors):
+            # Skip pages that repeat one already accepted from this or an earlier batch
+            if self.index.max_similarity(vector)[0] >= self.threshold:
+                self.duplicates_skipped += 1
+                continue
+
+            slug = self.slugs.allocate(page['slug'])
+            if slug:
+                clean_page = {
+                    'slug': slug,
+                    'title': str(page['title']).strip(),
+                    'content': str(page['content']).strip()
+                }
+                # Stored with the page so findability never has to re-read the full content
+                clean_page['digest'] = page_digest(clean_page)
+                self.pages.append(clean_page)
+                self.index.add_vectors(vector)
+        return len(self.pages) - before
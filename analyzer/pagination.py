@@ -0,0 +1,75 @@
+"""
+Cursor pagination for the features and AI pages listings.
+
+Cursors are opaque strings encoding the position of the last item returned, so
+a page costs the same however deep into the list it is, and AI page listings
+only ever read metadata (slug, title, size), never page content.
+"""
+import base64
+import binascii
+from django.urls import reverse
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(str(position).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return the position encoded in cursor, -1 for no cursor.
+    Raises ValueError for malformed cursors.
+    """
+    if not cursor:
+        return -1
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = int(base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if position < 0:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE."""
+    try:
+        return max(1, min(MAX_PAGE_SIZE, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def features_page(features, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one page of a features list: {"results", "next_cursor", "total"}."""
+    features = features if isinstance(features, list) else []
+    start = decode_cursor(cursor) + 1
+    results = [{'index': i, 'feature': f} for i, f in enumerate(features[start:start + limit], start)]
+    end = start + len(results)
+    return {
+        'results': results,
+        'next_cursor': encode_cursor(end - 1) if end < len(features) else None,
+        'total': len(features),
+    }
+
+
+def ai_pages_page(session, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one page of a session's AI page metadata: {"results", "next_cursor", "total"}."""
+    after = decode_cursor(cursor)
+    rows = list(
+        session.pages.filter(position__gt=after)
+        .order_by('position')
+        .values('position', 'slug', 'title', 'size')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'results': [
+            {'slug': row['slug'], 'title': row['title'], 'size': row['size'], 'url': reverse('ai_page', args=[session.id, row['slug']])}
+            for row in rows
+        ],
+        'next_cursor': encode_cursor(rows[-1]['position']) if has_more else None,
+        'total': session.ai_pages_count,
+    }
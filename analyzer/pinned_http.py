@@ -0,0 +1,77 @@
+"""
+A requests session whose connections go only to validated addresses.
+
+The connection classes resolve their host through analyzer.resolver (cached,
+every address checked) and connect to those addresses directly, instead of
+letting the socket layer resolve the name again. The Host header, TLS SNI and
+certificate checks still use the host name. Every connection is checked,
+including those opened to follow redirects. Proxies from the environment are
+ignored, since a proxy would resolve and connect to the host itself.
+
+Imports requests, so views import this module on first use.
+"""
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+from .resolver import safe_addresses
+from .host_health import host_health, host_key
+
+
+class PinnedConnectionMixin:
+    def _new_conn(self):
+        # urllib3 connects to _dns_host; host (Host header, SNI) is derived from it afterwards
+        hostname = self._dns_host
+        addresses = safe_addresses(hostname)
+        try:
+            for index, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    start = time.perf_counter()
+                    conn = super()._new_conn()
+                    host_health().record_connect(host_key(hostname, self.port), time.perf_counter() - start)
+                    return conn
+                except NewConnectionError:
+                    if index == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = hostname
+
+
+class PinnedHTTPConnection(PinnedConnectionMixin, HTTPConnection):
+    pass
+
+
+class PinnedHTTPSConnection(PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class PinnedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PinnedHTTPConnection
+
+
+class PinnedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = PinnedHTTPSConnection
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections only go to addresses checked by safe_addresses."""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': PinnedHTTPConnectionPool,
+            'https': PinnedHTTPSConnectionPool,
+        }
+
+
+def fetch_session():
+    """Return a requests session for fetching user-supplied URLs."""
+    session = requests.Session()
+    # A proxy from HTTP(S)_PROXY would get the connection instead of the validated address
+    session.trust_env = False
+    adapter = PinnedAddressAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
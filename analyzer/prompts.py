@@ -0,0 +1,159 @@
+"""
+Prompt construction for the OpenAI calls about an analyzed website.
+
+Messages are laid out as a stable prefix followed by a variable suffix so that
+provider-side prompt caching can reuse the prefix:
+
+1. SYSTEM_PROMPT - identical for every call
+2. Site context (website URL and features) - identical for every call about a site
+3. Task instructions - identical for every batch of the same task
+4. Request details (page counts, batch numbers, page summaries) - varies per call
+
+Anything that changes between calls must go in the last message, never in the
+middle of the prefix.
+"""
+
+# Maximum number of features included in the shared site context
+MAX_CONTEXT_FEATURES = 30
+
+SYSTEM_PROMPT = (
+    "You are an expert assistant for website analysis, AI-oriented content generation "
+    "and findability (SEO) analysis. Follow the task instructions exactly and always "
+    "return valid JSON in the requested format, with no markdown code blocks or other text."
+)
+
+PAGE_GENERATION_INSTRUCTIONS = """Task: generate AI-oriented web pages for the website described above. These pages are specifically designed for AI scrapers and LLM consumption to improve AI rankings. They should be:
+
+1. Highly structured and machine-readable
+2. Rich in semantic information and context
+3. Optimized for AI understanding (not human SEO)
+4. Include clear feature descriptions, use cases, and capabilities
+5. Use structured data patterns that AI systems can easily parse
+6. Focus on factual, comprehensive information about the website's offerings
+
+Generate pages that would be useful for:
+- AI assistants understanding what the website offers
+- AI crawlers and LLM training data
+- Improving AI rankings and discoverability
+- Providing detailed, structured information about features
+
+For each page, return a JSON object with:
+- slug: URL-friendly identifier (lowercase, hyphens, no spaces) - MUST be unique
+- title: Clear, descriptive title optimized for AI understanding
+- content: Full HTML content with:
+  * Clear semantic structure (use proper HTML tags: <h1>, <h2>, <p>, <ul>, <li>)
+  * Rich context about features, benefits, and use cases
+  * Structured information that AI systems can parse
+  * Comprehensive descriptions (not marketing fluff)
+  * Technical details and capabilities
+  * Use cases and examples
+
+The content should be written for AI consumption - focus on clarity, completeness, and machine-readability over human marketing appeal.
+
+Return a JSON array with exactly the number of page objects requested below. Example format:
+[
+  {"slug": "features-overview", "title": "Features Overview", "content": "<h1>Features Overview</h1><p>...</p>"},
+  {"slug": "capabilities", "title": "Capabilities", "content": "<h1>Capabilities</h1><p>...</p>"}
+]
+
+Return ONLY valid JSON, no markdown code blocks or other text."""
+
+FINDABILITY_INSTRUCTIONS = """Task: write the recommendations part of a findability report for the website described above.
+
+The findability score and per-feature search coverage have already been measured by running simulated user search queries against the website content and AI pages; they are given after these instructions. Use them to:
+
+1. Assess how easily users can find each feature, focusing on low-coverage features
+2. Identify content gaps that explain the low coverage
+3. Recommend pages, FAQs and wording changes that would improve coverage
+
+Generate a JSON report with the following structure:
+{
+    "per_feature_notes": [
+        {"feature": "<feature name>", "note": "<findability assessment>"},
+        ...
+    ],
+    "content_gaps": [
+        "<gap description 1>",
+        "<gap description 2>",
+        ...
+    ],
+    "recommendations": {
+        "pages_to_add": [
+            "<recommended page/section 1>",
+            "<recommended page/section 2>",
+            ...
+        ],
+        "faq_suggestions": [
+            "<FAQ question 1>",
+            "<FAQ question 2>",
+            ...
+        ]
+    },
+    "wording_improvements": [
+        "<suggestion 1>",
+        "<suggestion 2>",
+        ...
+    ]
+}
+
+Return ONLY valid JSON, no markdown code blocks or other text."""
+
+
+def site_context(website_url, features_list):
+    """Return the site description shared by every call about a website."""
+    features_text = '\n'.join([f"- {f}" for f in features_list[:MAX_CONTEXT_FEATURES]])
+    return f"""Website URL: {website_url}
+
+Key Features:
+{features_text}"""
+
+
+def site_prefix_messages(website_url, features_list):
+    """Return the system and site context messages that start every site prompt."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": site_context(website_url, features_list)},
+    ]
+
+
+def page_generation_messages(website_url, features_list, pages_in_batch, batch_num=1, batches=1):
+    """
+    Build messages for one page generation batch.
+    Only the final message differs between batches.
+    """
+    request = f"Generate exactly {pages_in_batch} pages."
+    if batches > 1:
+        request = (
+            f"This is batch {batch_num} of {batches}. Generate exactly {pages_in_batch} unique pages. "
+            "Ensure all pages are different from previous batches."
+        )
+    return site_prefix_messages(website_url, features_list) + [
+        {"role": "user", "content": PAGE_GENERATION_INSTRUCTIONS},
+        {"role": "user", "content": request},
+    ]
+
+
+def coverage_summary(scores):
+    """Describe locally computed findability scores for the findability prompt."""
+    lines = [f"Overall findability score: {scores['overall_score']}/100", "", "Per-feature search coverage (0-100):"]
+    for item in scores.get('feature_coverage', []):
+        match = f" (best match: {item['best_match']})" if item.get('best_match') else " (no matching content)"
+        lines.append(f"- {item['feature']}: {item['coverage']}{match}")
+    return '\n'.join(lines)
+
+
+def findability_messages(website_url, features_list, scores, ai_pages_summary=''):
+    """Build messages for findability analysis, sharing the site prefix with page generation."""
+    details = coverage_summary(scores)
+    if ai_pages_summary:
+        details += '\n\n' + ai_pages_summary
+    return site_prefix_messages(website_url, features_list) + [
+        {"role": "user", "content": FINDABILITY_INSTRUCTIONS},
+        {"role": "user", "content": details},
+    ]
+
+
+def cached_prompt_tokens(usage):
+    """Return the number of prompt tokens served from the provider's prompt cache."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return (getattr(details, 'cached_tokens', 0) or 0) if details else 0
@@ -0,0 +1,56 @@
+"""
+Process-wide rate limiting for outbound OpenAI calls.
+
+A token bucket shared by every thread in the process, so concurrent work (bulk
+analysis, batch generation) stays under the account's requests-per-minute limit
+instead of being answered with 429s.
+"""
+import time
+import threading
+from django.conf import settings
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per `per` seconds, with bursts up to `burst`."""
+    def __init__(self, rate, per=60.0, burst=None):
+        self.rate = float(rate)
+        self.per = float(per)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def acquire(self, timeout=None):
+        """Block until a token is available. Returns False if timeout seconds pass first."""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) * self.per / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+_openai_limiter = None
+_openai_limiter_lock = threading.Lock()
+
+
+def openai_rate_limiter():
+    """Return the shared limiter for OpenAI requests (OPENAI_REQUESTS_PER_MINUTE, 0 disables it)."""
+    global _openai_limiter
+    with _openai_limiter_lock:
+        if _openai_limiter is None:
+            _openai_limiter = RateLimiter(getattr(settings, 'OPENAI_REQUESTS_PER_MINUTE', 500))
+        return _openai_limiter
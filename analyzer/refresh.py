@@ -0,0 +1,170 @@
+"""
+Scheduled refresh of tracked websites (manage.py refresh_sites).
+
+Each TrackedSite is re-checked every interval_hours, and the analysis is only
+redone when the site really changed:
+
+1. the page is fetched with If-None-Match / If-Modified-Since from the last
+   fetch; a 304 ends the check
+2. otherwise a 64-bit SimHash of the extracted text (word 3-gram shingles) is
+   compared with the fingerprint of the text the current analysis is based
+   on; up to REFRESH_CHANGE_THRESHOLD differing bits count as unchanged
+   (dates, counters, rotating testimonials)
+3. only then are features extracted again and, with regenerate_pages, the
+   session's AI pages regenerated
+
+Next checks are spread by REFRESH_JITTER (a fraction of the interval) so
+sites tracked together don't all come due at once, and failing sites back
+off up to 8 intervals. A site is claimed with a conditional update before it
+is checked, so overlapping runs never check the same site twice.
+"""
+import re
+import random
+import hashlib
+import logging
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from .models import TrackedSite
+from .views import fetch_website, extract_features_with_openai, generate_ai_pages_with_openai
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+SHINGLE_WORDS = 3
+# A claimed site whose check never finished is checked again after this long
+CLAIM_LEASE = timedelta(minutes=30)
+MAX_BACKOFF = 8
+
+
+def simhash(text):
+    """Return the 64-bit SimHash of text's word shingles."""
+    words = WORD_RE.findall((text or '').lower())
+    shingles = [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))]
+    digests = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, 64)
+    # A bit is set when most shingles set it
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int(''.join('1' if bit else '0' for bit in majority), 2)
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def jittered(hours):
+    jitter = getattr(settings, 'REFRESH_JITTER', 0.1)
+    return timedelta(hours=hours * random.uniform(1 - jitter, 1 + jitter))
+
+
+def track_site(session, interval_hours=None, regenerate_pages=True):
+    """Start (or update) tracking session's website. The first check is at a random point of the first interval."""
+    interval_hours = interval_hours or getattr(settings, 'REFRESH_INTERVAL_HOURS', 24)
+    site, _ = TrackedSite.objects.update_or_create(
+        session=session,
+        defaults={'interval_hours': interval_hours, 'regenerate_pages': regenerate_pages, 'enabled': True},
+        create_defaults={
+            'interval_hours': interval_hours,
+            'regenerate_pages': regenerate_pages,
+            'next_check_at': timezone.now() + timedelta(hours=interval_hours * random.random()),
+            # The text the current analysis is based on, so an unchanged site is recognized on the first check
+            'fingerprint': f"{simhash(session.website_text):016x}" if session.website_text else '',
+        },
+    )
+    return site
+
+
+def due_sites(limit=None):
+    sites = TrackedSite.objects.filter(enabled=True, next_check_at__lte=timezone.now()).select_related('session')
+    return sites[:limit] if limit else sites
+
+
+def claim(site):
+    """Claim site for this run by moving its next check past the lease. Returns False if another run has it."""
+    claimed = TrackedSite.objects.filter(pk=site.pk, next_check_at=site.next_check_at).update(
+        next_check_at=timezone.now() + CLAIM_LEASE)
+    return bool(claimed)
+
+
+def refresh_site(site):
+    """Check one tracked site and refresh its analysis if it changed. Returns the new status."""
+    session = site.session
+    now = timezone.now()
+    site.last_checked_at = now
+    success, result = fetch_website(session.website_url, etag=site.etag, last_modified=site.last_modified)
+    if success and result.not_modified:
+        return finish(site, TrackedSite.STATUS_NOT_MODIFIED)
+    if not success:
+        return finish(site, TrackedSite.STATUS_ERROR, error=result)
+
+    # Only kept once the analysis matches this response: stored before a failed
+    # refresh, they would turn the next check into a 304 and the change would be missed
+    validators = result.etag[:255], result.last_modified[:64]
+    fingerprint = simhash(result.text)
+    if site.fingerprint:
+        site.last_distance = hamming_distance(fingerprint, int(site.fingerprint, 16))
+        if site.last_distance <= getattr(settings, 'REFRESH_CHANGE_THRESHOLD', 6):
+            site.etag, site.last_modified = validators
+            return finish(site, TrackedSite.STATUS_UNCHANGED)
+    else:
+        site.last_distance = None
+
+    logger.info(f"{session.website_url[:50]} changed ({site.last_distance} bits), refreshing its analysis")
+    success, features = extract_features_with_openai(session.website_url, result.text)
+    if not success:
+        return finish(site, TrackedSite.STATUS_ERROR, error=features)
+    session.website_text = result.text
+    session.features = features
+    session.save(update_fields=['website_text', 'features'])
+
+    page_count = session.pages.count()
+    if site.regenerate_pages and page_count:
+        success, pages = generate_ai_pages_with_openai(session.website_url, features, num_pages=page_count)
+        if not success:
+            # The new features are kept; the old pages are regenerated on the next change
+            logger.warning(f"Failed to regenerate AI pages for {session.website_url[:50]}: {pages}")
+        else:
+            session.replace_ai_pages(pages)
+
+    site.etag, site.last_modified = validators
+    site.fingerprint = f"{fingerprint:016x}"
+    site.last_changed_at = now
+    return finish(site, TrackedSite.STATUS_CHANGED)
+
+
+def finish(site, status, error=''):
+    site.last_status = status
+    site.last_error = error
+    if status == TrackedSite.STATUS_ERROR:
+        site.consecutive_errors += 1
+        logger.warning(f"Refresh of {site.session.website_url[:50]} failed: {error}")
+    else:
+        site.consecutive_errors = 0
+    backoff = min(2 ** site.consecutive_errors, MAX_BACKOFF) if site.consecutive_errors else 1
+    site.next_check_at = timezone.now() + jittered(site.interval_hours * backoff)
+    site.save()
+    return status
+
+
+def refresh_due_sites(limit=None):
+    """Check every site that is due (at most limit). Returns {status: count}."""
+    counts = {}
+    for site in due_sites(limit):
+        if not claim(site):
+            continue
+        try:
+            status = refresh_site(site)
+        except Exception as e:
+            logger.exception(f"Unexpected error refreshing {site.session.website_url[:50]}")
+            status = finish(site, TrackedSite.STATUS_ERROR, error=str(e)[:500])
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def seconds_until_next_due():
+    """Seconds until the next enabled site is due, or None if no site is tracked."""
+    next_site = TrackedSite.objects.filter(enabled=True).order_by('next_check_at').first()
+    if next_site is None:
+        return None
+    return max(0.0, (next_site.next_check_at - timezone.now()).total_seconds())
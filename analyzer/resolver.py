@@ -0,0 +1,133 @@
+"""
+DNS resolution and address validation for outbound website fetches.
+
+Each host is resolved once and the answer is cached for DNS_CACHE_SECONDS
+(failed lookups for DNS_NEGATIVE_CACHE_SECONDS), so repeated fetches of one
+site skip the lookup. Every resolved address must be public: private,
+loopback, link-local, reserved, multicast and unspecified addresses (also as
+IPv4-mapped IPv6) are rejected, loopback only being allowed with
+ALLOW_LOOPBACK_FETCH for local development. The fetch then connects to the
+validated addresses themselves (see pinned_http), so a DNS answer that
+changes between the check and the connection (DNS rebinding) can't reach an
+internal address.
+"""
+import time
+import socket
+import logging
+import ipaddress
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LOCALHOST_NAMES = {'localhost', 'localhost.localdomain'}
+
+
+class UnsafeAddressError(ValueError):
+    """A host resolves to an address fetches must not connect to."""
+
+
+def parse_address(value):
+    """Return value as an ip_address (IPv4-mapped IPv6 unwrapped), or None if it isn't an IP literal."""
+    try:
+        address = ipaddress.ip_address(value.strip('[]').split('%')[0])
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+def is_public(address, allow_loopback=False):
+    if address.is_loopback:
+        return allow_loopback
+    return address.is_global and not address.is_multicast
+
+
+class CachingResolver:
+    """Resolve host names with a TTL cache of at most max_entries hosts."""
+    def __init__(self, ttl=300, negative_ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, host):
+        infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        addresses = []
+        for info in infos:
+            address = info[4][0]
+            if address not in addresses:
+                addresses.append(address)
+        return tuple(addresses)
+
+    def resolve(self, host):
+        """Return the addresses of host (cached). Raises socket.gaierror if it doesn't resolve."""
+        host = host.lower().rstrip('.')
+        now = time.monotonic()
+        with self.lock:
+            cached = self.cache.get(host)
+            if cached is not None and cached[0] > now:
+                self.cache.move_to_end(host)
+                addresses = cached[1]
+                if isinstance(addresses, Exception):
+                    raise addresses
+                return addresses
+
+        try:
+            addresses = self.lookup(host)
+            expires = now + self.ttl
+        except socket.gaierror as e:
+            addresses = e
+            expires = now + self.negative_ttl
+        with self.lock:
+            self.cache[host] = (expires, addresses)
+            self.cache.move_to_end(host)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        if isinstance(addresses, Exception):
+            raise addresses
+        return addresses
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def resolver():
+    """Return the process-wide resolver (DNS_CACHE_SECONDS, DNS_NEGATIVE_CACHE_SECONDS)."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = CachingResolver(
+                    ttl=getattr(settings, 'DNS_CACHE_SECONDS', 300),
+                    negative_ttl=getattr(settings, 'DNS_NEGATIVE_CACHE_SECONDS', 30),
+                )
+    return _resolver
+
+
+def safe_addresses(host):
+    """
+    Resolve host and return its addresses, all checked to be public.
+    Raises UnsafeAddressError if any of them isn't, or socket.gaierror if host doesn't resolve.
+    """
+    allow_loopback = getattr(settings, 'ALLOW_LOOPBACK_FETCH', False)
+    literal = parse_address(host)
+    if literal is not None:
+        addresses = (str(literal),)
+    elif host.lower().rstrip('.') in LOCALHOST_NAMES and not allow_loopback:
+        raise UnsafeAddressError(f"{host} is a local address")
+    else:
+        addresses = resolver().resolve(host)
+    for address in addresses:
+        if not is_public(parse_address(address), allow_loopback):
+            logger.warning(f"Refusing to connect to {host}: resolves to non-public address {address}")
+            raise UnsafeAddressError(f"{host} resolves to a non-public address")
+    return addresses
@@ -0,0 +1,177 @@
+"""
+Local near-duplicate detection for features and generated pages.
+
+Texts are embedded on the CPU as hashed word and character n-gram vectors
+(L2-normalized, so a dot product is the cosine similarity) and compared in
+batch with NumPy. No model download or API call is needed.
+"""
+import re
+import zlib
+import numpy as np
+from django.conf import settings
+
+DEFAULT_DIM = 4096
+WORD_RE = re.compile(r'[a-z0-9]+')
+TAG_RE = re.compile(r'<[^>]+>')
+
+# Common interchangeable words in feature lists, mapped to one canonical form
+# so that lexical vectors can match them ("Quick search" vs "Fast search")
+SYNONYMS = {
+    'quick': 'fast', 'rapid': 'fast', 'speedy': 'fast', 'instant': 'fast',
+    'realtime': 'real time',
+    'simple': 'easy', 'effortless': 'easy',
+    'protected': 'secure', 'safe': 'secure',
+    'teams': 'team', 'collaborative': 'collaboration',
+    'analytic': 'analytics', 'reporting': 'reports', 'report': 'reports',
+    'integrations': 'integration', 'integrates': 'integration',
+    'customizable': 'custom', 'customisable': 'custom', 'customized': 'custom',
+    'automated': 'automation', 'automatic': 'automation',
+    'helpdesk': 'support', 'assistance': 'support',
+}
+
+# Words that don't change what a feature is; every other word is a content word
+STOPWORDS = frozenset('a an and by for from in of on or our the to with your'.split())
+
+
+def normalize_text(text):
+    """Lowercase text, reduce it to alphanumeric words and map synonyms to a canonical form."""
+    words = WORD_RE.findall(str(text).lower())
+    return ' '.join(SYNONYMS.get(word, word) for word in words)
+
+
+def content_words(text):
+    """Return the set of content words of text, after synonym mapping."""
+    return {word for word in normalize_text(text).split() if word not in STOPWORDS}
+
+
+def strip_tags(html):
+    """Remove HTML tags, keeping the text between them."""
+    return TAG_RE.sub(' ', str(html))
+
+
+class HashedNgramVectorizer:
+    """Embed texts as hashed bags of word unigrams/bigrams and character n-grams."""
+    def __init__(self, dim=DEFAULT_DIM, char_ngram_sizes=(3, 4), word_weight=1.5):
+        self.dim = dim
+        self.char_ngram_sizes = char_ngram_sizes
+        self.word_weight = word_weight
+
+    def _ngrams(self, text):
+        words = text.split()
+        for word in words:
+            yield 'w:' + word, self.word_weight
+        for first, second in zip(words, words[1:]):
+            yield f'b:{first} {second}', self.word_weight
+        padded = f' {text} '
+        for n in self.char_ngram_sizes:
+            for i in range(len(padded) - n + 1):
+                yield 'c:' + padded[i:i + n], 1.0
+
+    def transform(self, texts):
+        """Return an (n, dim) float32 array of unit-length vectors."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = []
+            weights = []
+            for gram, weight in self._ngrams(normalize_text(text)):
+                # crc32 is stable across processes, unlike hash()
+                buckets.append(zlib.crc32(gram.encode('utf-8')) % self.dim)
+                weights.append(weight)
+            if buckets:
+                np.add.at(vectors[row], np.asarray(buckets), np.asarray(weights, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class VectorIndex:
+    """An in-memory index of text vectors queried by cosine similarity."""
+    def __init__(self, vectorizer=None, capacity=64):
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        # Rows are appended into a buffer that doubles when full, so adding
+        # vectors one at a time stays linear overall
+        self._buffer = np.zeros((capacity, self.vectorizer.dim), dtype=np.float32)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        return self._buffer[:self._size]
+
+    def embed(self, texts):
+        return self.vectorizer.transform(list(texts))
+
+    def add_vectors(self, vectors):
+        vectors = np.atleast_2d(vectors)
+        needed = self._size + len(vectors)
+        if needed > len(self._buffer):
+            capacity = max(needed, 2 * len(self._buffer))
+            buffer = np.zeros((capacity, self.vectorizer.dim), dtype=np.float32)
+            buffer[:self._size] = self.vectors
+            self._buffer = buffer
+        self._buffer[self._size:needed] = vectors
+        self._size = needed
+
+    def add(self, texts):
+        self.add_vectors(self.embed(texts))
+
+    def max_similarity(self, vectors):
+        """Return the highest similarity of each vector to anything already in the index."""
+        vectors = np.atleast_2d(vectors)
+        if not self._size:
+            return np.zeros(len(vectors), dtype=np.float32)
+        return (vectors @ self.vectors.T).max(axis=1)
+
+
+def cluster_near_duplicates(texts, threshold, vectorizer=None, can_merge=None):
+    """
+    Group texts whose similarity to a cluster's first member is at least threshold
+    (and, if given, for which can_merge(first, other) is true).
+    Returns a list of index lists, in order of first appearance.
+    """
+    if not texts:
+        return []
+    vectors = (vectorizer or HashedNgramVectorizer()).transform(list(texts))
+    similarity = vectors @ vectors.T
+    assigned = np.zeros(len(texts), dtype=bool)
+    clusters = []
+    for i in range(len(texts)):
+        if assigned[i]:
+            continue
+        members = np.flatnonzero((similarity[i] >= threshold) & ~assigned)
+        members = members[members > i]
+        if can_merge is not None:
+            members = [j for j in members if can_merge(i, j)]
+        assigned[i] = True
+        assigned[members] = True
+        clusters.append([i] + [int(j) for j in members])
+    return clusters
+
+
+def same_content_words(first, second):
+    """
+    True unless both texts have a content word the other lacks: "Fast search" and
+    "Quick search" match, "iOS app with offline mode" and "Android app with offline mode" don't.
+    """
+    return first <= second or second <= first
+
+
+def dedupe_features(features, threshold=None):
+    """
+    Merge near-duplicate features, keeping the first wording of each.
+    Features are only merged if they are similar and one's content words include the other's.
+    Returns (features: list, merged: int)
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'FEATURE_DEDUP_THRESHOLD', 0.85)
+    words = [content_words(feature) for feature in features]
+    clusters = cluster_near_duplicates(features, threshold, can_merge=lambda i, j: same_content_words(words[i], words[j]))
+    deduped = [features[cluster[0]] for cluster in clusters]
+    return deduped, len(features) - len(deduped)
+
+
+def page_text(page, max_chars=4000):
+    """Return the text used to compare generated pages."""
+    return f"{page.get('title', '')} {strip_tags(page.get('content', ''))[:max_chars]}"
@@ -0,0 +1,160 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+When several requests ask for the same thing at once (the same URL submitted
+by several users, or a double-clicked form), only one of them computes it and
+the others wait for and share its result:
+
+- threads of one process wait on an in-memory event
+- other processes (gunicorn workers, Cloud Run instances sharing the database)
+  find the SingleFlightEntry row claimed by the computing process and poll it
+  until the result is stored there
+
+Finished results are kept for SINGLE_FLIGHT_RESULT_SECONDS, so a request that
+arrives just after the computation finished reuses it as well. Results must be
+JSON-serializable; callers in other processes get them back from JSON (tuples
+as lists).
+"""
+import os
+import time
+import socket
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from urllib.parse import urlsplit, urlunsplit
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import SingleFlightEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# Finished entries older than this are deleted when a computation finishes
+CLEANUP_AFTER = timedelta(hours=1)
+
+
+def normalize_url(url):
+    """Normalize a URL so trivially different spellings of it share a key."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+
+def flight_key(*parts):
+    """Build a key from the parts identifying a computation (name, normalized URL, prompt...)."""
+    return hashlib.sha256('\n'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class Flight:
+    """An in-process computation that other threads can wait for."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(key, compute, reuse_result=None, wait_timeout=None):
+    """
+    Return compute()'s result, computing it only once for concurrent callers with the same key.
+    reuse_result(result) decides whether a finished result is kept for callers arriving
+    later (e.g. only successes); callers already waiting always share it.
+    If waiting takes longer than wait_timeout seconds, the caller computes the result itself.
+    """
+    if wait_timeout is None:
+        wait_timeout = getattr(settings, 'SINGLE_FLIGHT_WAIT_SECONDS', 90)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+
+    if not leader:
+        if not flight.done.wait(wait_timeout):
+            logger.warning(f"Gave up waiting for in-flight computation {key[:12]}, computing it again")
+            return compute()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = shared_compute(key, compute, reuse_result, wait_timeout)
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def shared_compute(key, compute, reuse_result, wait_timeout):
+    """Compute under the key's database entry, or wait for the process that holds it."""
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    lease = timedelta(seconds=getattr(settings, 'SINGLE_FLIGHT_LEASE_SECONDS', 120))
+    poll_interval = getattr(settings, 'SINGLE_FLIGHT_POLL_INTERVAL', 0.25)
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        claimed, entry = claim(key, owner, lease)
+        if claimed:
+            break
+        if entry is not None and entry.status == SingleFlightEntry.STATUS_DONE:
+            logger.info(f"Reusing result of computation {key[:12]} from {entry.owner}")
+            return entry.result
+        if time.monotonic() >= deadline:
+            logger.warning(f"Gave up waiting for computation {key[:12]} in {entry.owner if entry else '?'}")
+            return compute()
+        if entry is not None:
+            time.sleep(poll_interval)
+
+    try:
+        result = compute()
+    except BaseException:
+        SingleFlightEntry.objects.filter(key=key, owner=owner).delete()
+        raise
+    if reuse_result is None or reuse_result(result):
+        keep_for = getattr(settings, 'SINGLE_FLIGHT_RESULT_SECONDS', 30)
+    else:
+        # Just long enough for processes already polling to pick it up
+        keep_for = poll_interval * 4
+    finish(key, owner, result, keep_for)
+    return result
+
+
+def claim(key, owner, lease):
+    """
+    Try to become the process computing key. Returns (True, None) when claimed,
+    otherwise (False, entry) with the current entry (None if it just disappeared).
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            SingleFlightEntry.objects.create(key=key, owner=owner, expires_at=now + lease)
+        return True, None
+    except IntegrityError:
+        pass
+    entry = SingleFlightEntry.objects.filter(key=key).first()
+    if entry is None or entry.expires_at > now:
+        return False, entry
+    # Expired: a stale result, or the owner died mid-computation. Only one process wins the takeover
+    taken = SingleFlightEntry.objects.filter(pk=entry.pk, owner=entry.owner, expires_at=entry.expires_at).update(
+        status=SingleFlightEntry.STATUS_RUNNING, owner=owner, result=None, expires_at=now + lease)
+    return (True, None) if taken else (False, None)
+
+
+def finish(key, owner, result, keep_for):
+    now = timezone.now()
+    SingleFlightEntry.objects.filter(key=key, owner=owner).update(
+        status=SingleFlightEntry.STATUS_DONE, result=result, expires_at=now + timedelta(seconds=keep_for))
+    SingleFlightEntry.objects.filter(expires_at__lt=now - CLEANUP_AFTER).delete()
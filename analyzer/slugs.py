@@ -0,0 +1,62 @@
+"""
+Unique slug allocation for generated pages.
+
+SlugAllocator keeps the set of slugs already taken and, for every base slug,
+the next numeric suffix to try, so allocating n slugs costs O(n) overall even
+when most pages ask for the same slug.
+"""
+import re
+
+SLUG_INVALID_RE = re.compile(r'[^a-z0-9-]')
+
+
+def slugify(raw_slug):
+    """Make raw_slug URL-friendly: lowercase, spaces to hyphens, other characters dropped."""
+    return SLUG_INVALID_RE.sub('', str(raw_slug).lower().replace(' ', '-'))
+
+
+class SlugAllocator:
+    """
+    Allocates unique slugs: "pricing", then "pricing-1", "pricing-2", ...
+
+    Seed it with slugs that already exist (for example pages stored earlier)
+    and call allocate() for each new page.
+    """
+    def __init__(self, existing=()):
+        self.used = set()
+        # Next suffix to try for each base slug
+        self.next_suffix = {}
+        # Number of candidate slugs checked, for tests and diagnostics
+        self.probes = 0
+        for slug in existing:
+            self.reserve(slug)
+
+    def __contains__(self, slug):
+        return slug in self.used
+
+    def __len__(self):
+        return len(self.used)
+
+    def reserve(self, slug):
+        """Mark an existing slug as taken."""
+        if slug:
+            self.used.add(slug)
+
+    def allocate(self, raw_slug):
+        """Return a unique slug for raw_slug and mark it taken, or None if nothing URL-friendly is left."""
+        base = slugify(raw_slug)
+        if not base:
+            return None
+        slug = base
+        self.probes += 1
+        if slug in self.used:
+            counter = self.next_suffix.get(base, 1)
+            slug = f"{base}-{counter}"
+            self.probes += 1
+            while slug in self.used:
+                counter += 1
+                slug = f"{base}-{counter}"
+                self.probes += 1
+            self.next_suffix[base] = counter + 1
+        self.used.add(slug)
+        return slug
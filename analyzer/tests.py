@@ -1,3 +1,782 @@
-from django.test import TestCase
+import io
+import gzip
+import os
+import json
+import math
+import socket
+import tempfile
+import zipfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+import brotli
+from urllib3.exceptions import ConnectTimeoutError
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from loadtest import fake_openai
+from . import views, batch_jobs
+from .models import AnalysisSession, AiPage, SiteTokenStats, RequestProfile, SingleFlightEntry, CrawlHit, CrawlRollup, TrackedSite
+from .refresh import simhash, hamming_distance
+from .views import extract_features_with_openai, generate_ai_pages_with_openai
+from .slugs import SlugAllocator
+from .batch_planner import BatchPlanner, record_prompt_usage
+from .similarity import dedupe_features
+from .digests import page_digest, budgeted_digest, CHARS_PER_TOKEN
+from .findability_scoring import BM25Index, tokenize, simulated_queries, score_findability
+from .prompts import page_generation_messages, findability_messages, cached_prompt_tokens
+from .single_flight import single_flight
+from .warmup import import_times
+from .content_extraction import extract_main_content
+from .crawl_analytics import CrawlRecorder
+from .model_routing import route_completion, validate_features, pages_validator, RoutingError
+from .metrics import MODEL_CALLS, MODEL_ESCALATIONS
+from .host_health import HostHealthTracker, Deadline, CLOSED, OPEN, HALF_OPEN
+from .resolver import CachingResolver, UnsafeAddressError, safe_addresses
+from .crawlers import CrawlerClassifier, AI_TRAINER, AI_ASSISTANT, SEARCH_ENGINE, SOCIAL_PREVIEW, OTHER_BOT
 
-# Create your tests here.
+
+@override_settings(ALLOW_LOOPBACK_FETCH=True)
+class FakeOpenAIFlowTests(TestCase):
+    """Run the analyzer flow end to end against the offline OpenAI stand-in."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        config = fake_openai.FakeOpenAIConfig(latency=0, jitter=0, seed=1)
+        cls.server, cls.base_url = fake_openai.start_in_thread(config=config)
+        cls.env = mock.patch.dict(os.environ, {
+            'OPENAI_BASE_URL': f"{cls.base_url}/v1",
+            'OPENAI_API_KEY': 'fake-key',
+        })
+        cls.env.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.env.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def test_extract_features(self):
+        success, features = extract_features_with_openai('https://example.com', 'Example website text')
+        self.assertTrue(success, features)
+        self.assertIn('Fast full-text search', features)
+
+    def test_generate_pages_records_token_stats(self):
+        success, pages = generate_ai_pages_with_openai('https://example.com', ['Search', 'Exports'], 20)
+        self.assertTrue(success, pages)
+        self.assertEqual(len(pages), 20)
+        self.assertEqual(len({page['slug'] for page in pages}), 20)
+        stats = SiteTokenStats.objects.get(host='example.com')
+        self.assertGreater(stats.completion_tokens, 0)
+        self.assertEqual(stats.pages_generated, 20)
+
+    def test_full_flow(self):
+        response = self.client.post(reverse('website_analysis'), {'website_url': f"{self.base_url}/site/"})
+        self.assertRedirects(response, reverse('features_table'))
+        session = AnalysisSession.objects.get()
+        self.assertIn('full-text search', session.website_text)
+
+        response = self.client.post(reverse('generate_ai_pages'), {'pages_count': 10})
+        self.assertRedirects(response, reverse('features_table'))
+        session.refresh_from_db()
+        self.assertEqual(session.ai_pages_count, 10)
+
+        response = self.client.get(reverse('ai_page', args=[session.id, session.pages.first().slug]))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('run_findability_analysis'))
+        self.assertRedirects(response, reverse('findability'))
+        session.refresh_from_db()
+        self.assertGreater(session.findability_report['overall_score'], 0)
+        self.assertTrue(session.findability_report['content_gaps'])
+
+        with override_settings(METRICS_TOKEN='metrics-secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer metrics-secret')
+        self.assertEqual(response.status_code, 200)
+        # Without a token the metrics are only public in development
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+        body = response.content.decode()
+        for stage in ('fetch_connect', 'html_parse', 'openai_generate_pages', 'session_save'):
+            self.assertIn(f'analyzer_stage_duration_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('analyzer_openai_tokens_total{call="findability",kind="completion"}', body)
+
+
+    def test_repeated_analysis_shares_one_fetch(self):
+        with mock.patch('analyzer.views.fetch_website_text', wraps=views.fetch_website_text) as fetch:
+            for url in (f"{self.base_url}/site/", f"{self.base_url.upper()}/site/#top"):
+                response = self.client.post(reverse('website_analysis'), {'website_url': url})
+                self.assertRedirects(response, reverse('features_table'))
+        self.assertEqual(fetch.call_count, 1)
+        entry = SingleFlightEntry.objects.get()
+        self.assertEqual(entry.status, SingleFlightEntry.STATUS_DONE)
+
+    def test_fetch_connects_to_validated_address(self):
+        # A name only our resolver knows: the connection must use its cached answer, not a proxy
+        resolver = CachingResolver()
+        port = self.base_url.rsplit(':', 1)[1]
+        proxies = {'HTTP_PROXY': 'http://127.0.0.1:9', 'http_proxy': 'http://127.0.0.1:9', 'NO_PROXY': '', 'no_proxy': ''}
+        with mock.patch('analyzer.resolver._resolver', resolver), mock.patch.dict(os.environ, proxies), \
+                mock.patch.object(resolver, 'lookup', return_value=('127.0.0.1',)) as lookup:
+            for _ in range(2):
+                success, text = views.fetch_website_text(f"http://site.invalid:{port}/site/")
+                self.assertTrue(success, text)
+            self.assertEqual(lookup.call_count, 1)
+            lookup.return_value = ('10.0.0.7',)
+            resolver.clear()
+            self.assertEqual(views.fetch_website_text(f"http://site.invalid:{port}/site/"),
+                             (False, "Internal/private IP addresses are not allowed"))
+
+    def test_refresh_sites_reanalyzes_only_changed_sites(self):
+        self.client.post(reverse('website_analysis'), {'website_url': f"{self.base_url}/site/"})
+        session = AnalysisSession.objects.get()
+        session.replace_ai_pages([{'slug': f"old-{i}", 'title': 'Old', 'content': '<p>old</p>'} for i in range(10)])
+        call_command('refresh_sites', track=session.id, stdout=io.StringIO())
+        due = lambda **fields: TrackedSite.objects.update(next_check_at=timezone.now(), **fields)
+
+        with mock.patch('analyzer.refresh.extract_features_with_openai') as extract:
+            # Same text as the analysis; the second check is answered 304 thanks to the ETag
+            for status in (TrackedSite.STATUS_UNCHANGED, TrackedSite.STATUS_NOT_MODIFIED):
+                due()
+                call_command('refresh_sites', stdout=io.StringIO())
+                self.assertEqual(TrackedSite.objects.get().last_status, status)
+        extract.assert_not_called()
+
+        due(etag='', fingerprint=f"{simhash('an entirely different page about other things'):016x}")
+        with mock.patch('analyzer.refresh.extract_features_with_openai', return_value=(False, 'OpenAI API error')):
+            call_command('refresh_sites', stdout=io.StringIO())
+        site = TrackedSite.objects.get()
+        self.assertEqual(site.last_status, TrackedSite.STATUS_ERROR)
+        # The failed refresh kept no validators, so the next check sees the change instead of a 304
+        self.assertEqual(site.etag, '')
+
+        due()
+        call_command('refresh_sites', stdout=io.StringIO())
+        site = TrackedSite.objects.get()
+        self.assertEqual(site.last_status, TrackedSite.STATUS_CHANGED)
+        self.assertGreater(site.next_check_at, timezone.now() + timedelta(hours=21))
+        self.assertEqual(site.fingerprint, f"{simhash(session.website_text):016x}")
+        self.assertEqual(session.pages.count(), 10)
+        self.assertFalse(session.pages.filter(title='Old').exists())
+
+    def test_bulk_analysis_api_streams_ndjson(self):
+        site = f"{self.base_url}/site/"
+        response = self.client.post(reverse('bulk_analysis_api'), {'urls': site})
+        self.assertEqual(response.status_code, 302)  # staff only
+
+        User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        response = self.client.post(reverse('bulk_analysis_api'), json.dumps({'urls': [site, site, 'ftp://example.com']}),
+                                    content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        results = {r['url']: r for r in map(json.loads, b''.join(response.streaming_content).splitlines())}
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results[site]['ok'])
+        self.assertFalse(results['ftp://example.com']['ok'])
+        session = AnalysisSession.objects.get(id=results[site]['session_id'])
+        self.assertIn('Fast full-text search', session.features)
+
+    def test_bulk_analyze_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(f"name,url\nAcme,{self.base_url}/site/\nBroken,not-a-url\n")
+        self.addCleanup(os.unlink, f.name)
+        out = io.StringIO()
+        call_command('bulk_analyze', f.name, '--workers', '2', '--no-save', stdout=out, stderr=io.StringIO())
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted(r['ok'] for r in results), [False, True])
+        self.assertFalse(AnalysisSession.objects.exists())
+
+
+    def run_batch_command(self, jobs_path, *args):
+        out = io.StringIO()
+        # One worker runs jobs in this thread, which can see the test transaction
+        call_command('generate_pages_batch', jobs_path, '--workers', '1', '--poll-interval', '0.01', *args, stdout=out)
+        return out.getvalue()
+
+    def test_generate_pages_batch_resumes_from_checkpoint(self):
+        for mode in ([], ['--batch-api']):
+            with self.subTest(mode=mode), tempfile.TemporaryDirectory() as tmp:
+                jobs_path = os.path.join(tmp, 'jobs.jsonl')
+                with open(jobs_path, 'w') as f:
+                    f.write(json.dumps({'id': 'acme', 'url': f"{self.base_url}/site/", 'pages': 10}) + '\n')
+                    f.write(json.dumps({'url': 'https://example.com', 'features': ['Search', 'Exports'], 'pages': 12}) + '\n')
+                sessions_before = AnalysisSession.objects.count()
+
+                output = self.run_batch_command(jobs_path, *mode)
+                self.assertIn('Finished 2 job(s)', output)
+                sessions = AnalysisSession.objects.order_by('-id')[:2]
+                self.assertEqual(sorted(s.ai_pages_count for s in sessions), [10, 12])
+                self.assertTrue(any('Fast full-text search' in s.features for s in sessions))
+
+                output = self.run_batch_command(jobs_path, *mode)
+                self.assertIn('2 already done', output)
+                self.assertEqual(AnalysisSession.objects.count(), sessions_before + 2)
+
+    def test_generate_pages_batch_resume_after_crash_saves_each_job_once(self):
+        real_record = batch_jobs.Checkpoint.record
+        real_save = batch_jobs.save_results
+
+        def record_then_crash(checkpoint, entries):
+            real_record(checkpoint, entries)
+            raise RuntimeError('crash before commit')
+
+        def save_then_crash(results, checkpoint):
+            real_save(results, checkpoint)
+            raise RuntimeError('crash before the batch is recorded as collected')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs_path = os.path.join(tmp, 'jobs.jsonl')
+            with open(jobs_path, 'w') as f:
+                for i in range(2):
+                    f.write(json.dumps({'url': f"https://example{i}.com", 'features': ['Search'], 'pages': 10}) + '\n')
+            sessions_before = AnalysisSession.objects.count()
+
+            # Checkpointed, then the transaction was rolled back: the jobs run again
+            with mock.patch.object(batch_jobs.Checkpoint, 'record', record_then_crash), self.assertRaises(RuntimeError):
+                self.run_batch_command(jobs_path)
+            self.assertEqual(AnalysisSession.objects.count(), sessions_before)
+            output = self.run_batch_command(jobs_path)
+            self.assertIn('2 checkpointed job(s) were not saved', output)
+            self.assertEqual(AnalysisSession.objects.count(), sessions_before + 2)
+
+            # Saved, then stopped before the batch was recorded as collected: nothing is saved twice
+            batch_path = os.path.join(tmp, 'batch.jsonl')
+            os.rename(jobs_path, batch_path)
+            with mock.patch.object(batch_jobs, 'save_results', save_then_crash), self.assertRaises(RuntimeError):
+                self.run_batch_command(batch_path, '--batch-api')
+            self.assertEqual(AnalysisSession.objects.count(), sessions_before + 4)
+            output = self.run_batch_command(batch_path, '--batch-api')
+            self.assertIn('Resuming batch', output)
+            self.assertEqual(AnalysisSession.objects.count(), sessions_before + 4)
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0, PROFILING_TOKEN='secret', PROFILING_MODE='cprofile')
+class RequestProfilingTests(TestCase):
+    def test_flagged_request_is_profiled(self):
+        self.client.get(reverse('website_analysis'))
+        self.client.get(reverse('website_analysis'), HTTP_X_PROFILE='wrong')
+        self.assertFalse(RequestProfile.objects.exists())
+
+        self.client.get(reverse('website_analysis'), HTTP_X_PROFILE='secret')
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.path, '/')
+        self.assertGreater(profile.sql_count, 0)
+        self.assertIn('website_analysis', profile.cprofile_stats)
+
+
+class SlugAllocatorTests(TestCase):
+    def test_suffixes_follow_existing_slugs(self):
+        slugs = SlugAllocator(existing=['pricing', 'pricing-1'])
+        self.assertEqual(slugs.allocate('Pricing'), 'pricing-2')
+        self.assertEqual(slugs.allocate('pricing-2'), 'pricing-2-1')
+        self.assertEqual(slugs.allocate('Pricing'), 'pricing-3')
+        self.assertIsNone(slugs.allocate('!!!'))
+
+    def test_allocation_is_linear(self):
+        # 50,000 pages sharing 10 slugs, the worst case for a rescan-and-probe loop
+        n = 50000
+        slugs = SlugAllocator()
+        allocated = [slugs.allocate(f"Feature {i % 10}") for i in range(n)]
+        self.assertEqual(len(set(allocated)), n)
+        self.assertLessEqual(slugs.probes, 2 * n)
+
+        # Suffixed names colliding with other bases still need only a bounded number of probes
+        slugs = SlugAllocator()
+        for i in range(n):
+            slugs.allocate('page' if i % 2 else f"page-{i // 2 + 1}")
+        self.assertEqual(len(slugs), n)
+        self.assertLessEqual(slugs.probes, 3 * n)
+
+
+class BatchPlannerTests(TestCase):
+    def planner(self, **stats):
+        return BatchPlanner(SiteTokenStats(host='example.com', **stats), target_truncation_rate=0.05)
+
+    def test_batches_follow_observed_tokens_per_page(self):
+        planner = self.planner()
+        # 1000 tokens/page with 1.15 headroom: 13 pages fit in 15,800 tokens
+        self.assertEqual(planner.batch_size(), 13)
+        self.assertEqual(planner.estimate_batches(50), 4)
+        self.assertEqual(planner.plan_batch(5), (5, 5950))
+
+        planner.record_batch(10, 10, 4100, truncated=False)
+        self.assertAlmostEqual(planner.stats.tokens_per_page, 400.0)
+        planner.record_batch(10, 10, 8100, truncated=False)
+        self.assertAlmostEqual(planner.stats.tokens_per_page, 0.7 * 400 + 0.3 * 800)
+        self.assertEqual(planner.batch_size(), 26)
+
+    def test_truncation_shrinks_batches(self):
+        planner = self.planner(tokens_per_page=500.0)
+        self.assertEqual(planner.batch_size(), 27)
+        planner.record_batch(27, 0, 16000, truncated=True)
+        self.assertEqual(planner.stats.truncation_rate, 1.0)
+        self.assertEqual(planner.headroom, 2.0)
+        self.assertAlmostEqual(planner.stats.tokens_per_page, 16000 / 27 * 1.15)
+        self.assertEqual(planner.batch_size(), 11)
+
+    def test_calls_are_capped_when_batches_add_few_pages(self):
+        calls = []
+
+        def one_new_page(task, client, validate, **request):
+            calls.append(request)
+            page = {'slug': f"page-{len(calls)}", 'title': f"Page {len(calls)}",
+                    'content': ' '.join(f"word{len(calls)}x{i}" for i in range(50))}
+            usage = SimpleNamespace(completion_tokens=500, prompt_tokens=100, prompt_tokens_details=None)
+            return SimpleNamespace(usage=usage, choices=[SimpleNamespace(finish_reason='stop')]), [page], 'gpt-4o-mini'
+
+        with mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'fake-key'}), \
+                mock.patch.object(views, 'openai_client'), \
+                mock.patch.object(views, 'route_completion', side_effect=one_new_page):
+            success, pages = generate_ai_pages_with_openai('https://example.com', ['Search'], num_pages=10)
+        self.assertTrue(success)
+        # One planned batch plus three retries, not one call per page
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(len(pages), 4)
+
+
+class PromptLayoutTests(TestCase):
+    def test_calls_about_a_site_share_their_prefix(self):
+        features = ['Search', 'SSO']
+        first = page_generation_messages('https://example.com', features, 10, batch_num=1, batches=3)
+        second = page_generation_messages('https://example.com', features, 7, batch_num=2, batches=3)
+        findability = findability_messages('https://example.com', features, {'overall_score': 50, 'feature_coverage': []})
+
+        # Only the last message differs between batches
+        self.assertEqual(first[:-1], second[:-1])
+        self.assertNotEqual(first[-1], second[-1])
+        self.assertIn('batch 2 of 3', second[-1]['content'])
+        # Findability reuses the system and site messages
+        self.assertEqual(findability[:2], first[:2])
+        self.assertNotIn('batch', ''.join(message['content'] for message in first[:-1]).lower())
+
+    def test_cached_prompt_tokens_are_recorded(self):
+        usage = SimpleNamespace(prompt_tokens=1200, prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+        self.assertEqual(cached_prompt_tokens(usage), 1024)
+        self.assertEqual(cached_prompt_tokens(SimpleNamespace(prompt_tokens=10)), 0)
+
+        record_prompt_usage('https://Example.com/about', usage)
+        record_prompt_usage('https://example.com/', SimpleNamespace(prompt_tokens=800, prompt_tokens_details=None))
+        stats = SiteTokenStats.objects.get(host='example.com')
+        self.assertEqual((stats.prompt_tokens, stats.cached_prompt_tokens), (2000, 1024))
+        self.assertAlmostEqual(stats.cache_hit_rate, 0.512)
+
+
+class FeatureDedupTests(TestCase):
+    def test_rewordings_are_merged(self):
+        features = ['Fast search', 'Quick search', 'Real-time collaboration', 'Realtime collaboration',
+                    'Two-factor authentication', 'Two factor authentication', 'Custom reports', 'Customizable reporting']
+        deduped, merged = dedupe_features(features)
+        self.assertEqual(deduped, ['Fast search', 'Real-time collaboration', 'Two-factor authentication', 'Custom reports'])
+        self.assertEqual(merged, 4)
+
+    def test_near_misses_are_kept(self):
+        pairs = [
+            ('Native mobile app for iOS with offline mode', 'Native mobile app for Android with offline mode'),
+            ('Free plan for up to 5 users', 'Free plan for up to 10 users'),
+            ('Live chat', 'Real-time chat'),
+            ('Export to CSV', 'Export to PDF'),
+            ('Email support', 'Phone support'),
+        ]
+        for pair in pairs:
+            with self.subTest(pair=pair):
+                self.assertEqual(dedupe_features(list(pair)), (list(pair), 0))
+
+
+class FindabilityScoringTests(TestCase):
+    def test_bm25_ranking(self):
+        index = BM25Index(['fast search for documents', 'billing and invoices', 'search search search index'])
+        self.assertAlmostEqual(index.idf('search'), math.log(1.6), places=6)
+        scores, ideal = index.score_queries([tokenize('Fast search'), tokenize('invoices')])
+        self.assertEqual(scores[0].argmax(), 0)
+        # Repeating a term saturates instead of outranking a document with both terms
+        self.assertLess(scores[0, 2], scores[0, 0])
+        self.assertEqual(scores[1].nonzero()[0].tolist(), [1])
+        self.assertAlmostEqual(float(ideal[1]), index.idf('invoice'), places=6)
+
+    def test_paraphrased_queries_reward_user_wording(self):
+        self.assertEqual(simulated_queries('Fast search')[-1], 'quick find')
+        self.assertEqual(len(simulated_queries('Kanban boards')), 3)
+
+        feature_wording = {'title': 'Fast search', 'content': '<p>Fast search across documents.</p>'}
+        user_wording = {'title': 'Fast search', 'content': '<p>Fast search: a quick way to find documents.</p>'}
+        echoed = score_findability('', ['Fast search', 'Kanban boards'], [feature_wording])
+        self.assertEqual(echoed, score_findability('', ['Fast search', 'Kanban boards'], [feature_wording]))
+        self.assertEqual(echoed['feature_coverage'][1], {'feature': 'Kanban boards', 'coverage': 0, 'best_match': None})
+        self.assertLess(echoed['feature_coverage'][0]['coverage'], 100)
+        self.assertGreater(score_findability('', ['Fast search'], [user_wording])['overall_score'],
+                           echoed['feature_coverage'][0]['coverage'])
+
+
+class DigestTests(TestCase):
+    def test_digest_is_first_sentence_and_sections(self):
+        page = {'title': 'Search', 'content': '<h1>Search</h1><p>Find any document in seconds. More text.</p>'
+                                              '<h2>Filters</h2><h2>Operators</h2>'}
+        self.assertEqual(page_digest(page), 'Find any document in seconds. Sections: Filters; Operators')
+
+    def test_budget_shortens_digests_then_drops_pages(self):
+        pages = [{'title': f"Page {i}", 'digest': 'x' * 200} for i in range(10)]
+        summary = budgeted_digest(pages, 200)
+        lines = summary.splitlines()
+        self.assertEqual(lines[0], 'AI-Generated Pages Available (10):')
+        # Every page is listed, each digest cut to an equal share of the budget
+        self.assertEqual(len(lines), 11)
+        self.assertLessEqual(len(summary), 200 * CHARS_PER_TOKEN)
+        self.assertTrue(all(line.endswith('...') for line in lines[1:]))
+
+        self.assertEqual(budgeted_digest(pages, 10).splitlines()[1], '- ... and 10 more pages')
+        self.assertEqual(budgeted_digest([], 100), '')
+
+    def test_missing_digest_is_computed(self):
+        session = AnalysisSession.objects.create()
+        session.replace_ai_pages([{'slug': 'search', 'title': 'Search', 'content': '<p>Find any document.</p>'}])
+        self.assertEqual(session.pages.get().digest, '')
+        self.assertIn('- Search: Find any document.', budgeted_digest(session.ai_pages_list(), 100))
+
+
+class PaginationApiTests(TestCase):
+    def setUp(self):
+        self.client.get(reverse('website_analysis'))
+        self.session = AnalysisSession.objects.get()
+        self.session.website_url = 'https://example.com'
+        self.session.features = [f"Feature {i}" for i in range(75)]
+        self.session.save()
+        self.session.replace_ai_pages([
+            {'slug': f"page-{i}", 'title': f"Page {i}", 'content': f"<p>{'x' * i}</p>"} for i in range(120)
+        ])
+
+    def walk(self, url, limit):
+        items = []
+        cursor = None
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(url, params).json()
+            self.assertLessEqual(len(data['results']), limit)
+            items.extend(data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return items, data['total']
+
+    def test_ai_pages_api_walks_all_pages_without_content(self):
+        pages, total = self.walk(reverse('ai_pages_api'), 50)
+        self.assertEqual(total, 120)
+        self.assertEqual([page['slug'] for page in pages], [f"page-{i}" for i in range(120)])
+        self.assertNotIn('content', pages[0])
+        self.assertEqual(pages[3]['size'], len('<p>xxx</p>'))
+
+    def test_features_api_and_table_first_page(self):
+        features, total = self.walk(reverse('features_api'), 30)
+        self.assertEqual(total, 75)
+        self.assertEqual([item['feature'] for item in features], self.session.features)
+
+        response = self.client.get(reverse('features_table'))
+        self.assertContains(response, f'href="/ai/{self.session.id}/page-49/"')
+        self.assertNotContains(response, f'href="/ai/{self.session.id}/page-50/"')
+        self.assertEqual(response.context['ai_pages_count'], 120)
+
+    def test_form_renders_every_feature(self):
+        # Saving replaces the whole list, so a plain form post must carry all 75 features back
+        response = self.client.get(reverse('features_table'))
+        self.assertContains(response, 'value="Feature 74"')
+        self.assertEqual(response.context['features'], self.session.features)
+
+        response = self.client.post(reverse('features_table'), {'features': response.context['features']})
+        self.assertContains(response, 'Successfully saved 75 feature(s)')
+        self.session.refresh_from_db()
+        self.assertEqual(len(self.session.features), 75)
+
+    def test_export_streams_zip_and_ndjson(self):
+        response = self.client.get(reverse('export_ai_pages'), {'base_url': 'https://example.com/ai/'})
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 121)
+        self.assertIn('<p>xxx</p>', archive.read('page-3.html').decode('utf-8'))
+        self.assertNotIn('Back to Features Table', archive.read('page-3.html').decode('utf-8'))
+        self.assertIn('<loc>https://example.com/ai/page-119.html</loc>', archive.read('sitemap.xml').decode('utf-8'))
+
+        response = self.client.get(reverse('export_ai_pages'), {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['slug'] for line in lines], [f"page-{i}" for i in range(120)])
+        self.assertEqual(self.client.get(reverse('export_ai_pages'), {'format': 'pdf'}).status_code, 400)
+
+    def test_saved_features_are_kept_as_submitted(self):
+        features = ['Fast search', 'Quick search', 'Live chat']
+        response = self.client.post(reverse('features_table'), {'features': features})
+        self.assertContains(response, 'Successfully saved 3 feature(s)')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.features, features)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('ai_pages_api'), {'cursor': '!!'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ai_page_served_as_precompressed_gzip(self):
+        url = reverse('ai_page', args=[self.session.id, 'page-7'])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        html = gzip.decompress(response.content).decode('utf-8')
+        self.assertIn('<p>xxxxxxx</p>', html)
+        self.assertIn('<title>Page 7 - AI Page</title>', html)
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain.content.decode('utf-8'), html)
+
+    def test_crawler_hits_are_buffered_and_rolled_up(self):
+        recorder = CrawlRecorder(background=False)
+        user_agent = 'Mozilla/5.0 (compatible; GPTBot/1.2; +https://openai.com/gptbot)'
+        # Crawlers send no session cookie; they must still find the page and not create sessions
+        crawler = Client()
+        with mock.patch('analyzer.crawl_analytics._recorder', recorder):
+            for slug in ('page-1', 'page-1', 'page-2'):
+                response = crawler.get(reverse('ai_page', args=[self.session.id, slug]), HTTP_USER_AGENT=user_agent)
+                self.assertEqual(response.status_code, 200)
+            self.client.get(reverse('ai_page', args=[self.session.id, 'page-1']))
+        self.assertEqual(AnalysisSession.objects.count(), 1)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, crawler.cookies)
+        self.assertEqual(crawler.get(reverse('ai_page', args=[self.session.id + 1, 'page-1'])).status_code, 404)
+        self.assertEqual(CrawlHit.objects.count(), 0)
+        self.assertEqual(recorder.flush(), 3)
+        self.assertEqual(CrawlHit.objects.count(), 3)
+        rollup = CrawlRollup.objects.get(slug='page-1')
+        self.assertEqual((rollup.crawler, rollup.category, rollup.hits), ('gptbot', 'ai_trainer', 2))
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.login(username='admin', password='password')
+        # The manifest storage needs collectstatic output, which tests don't have
+        with override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+                'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}):
+            response = self.client.get(reverse('admin:analyzer_crawlrollup_changelist'))
+        self.assertContains(response, 'Most crawled pages')
+        self.assertContains(response, 'gptbot')
+
+    def test_json_responses_are_compressed(self):
+        url = reverse('features_api')
+        expected = self.client.get(url).json()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(response.content)), expected)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), expected)
+        # A refused coding isn't brought back by '*'
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0.0, *')
+        self.assertNotIn('Content-Encoding', response)
+
+
+class SingleFlightTests(TestCase):
+    def test_running_entry_of_dead_process_is_taken_over(self):
+        SingleFlightEntry.objects.create(key='k', owner='gone:1:1', expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(single_flight('k', lambda: [1, 2]), [1, 2])
+        # Reused while fresh, without computing again
+        self.assertEqual(single_flight('k', lambda: self.fail('computed twice')), [1, 2])
+
+    def test_failed_result_is_not_reused(self):
+        self.assertEqual(single_flight('k', lambda: [False, 'error'], reuse_result=lambda r: r[0]), [False, 'error'])
+        entry = SingleFlightEntry.objects.get()
+        self.assertLess(entry.expires_at, timezone.now() + timedelta(seconds=5))
+        SingleFlightEntry.objects.update(expires_at=timezone.now())
+        self.assertEqual(single_flight('k', lambda: [True, 'ok'], reuse_result=lambda r: r[0]), [True, 'ok'])
+
+
+class ResolverTests(TestCase):
+    def test_non_public_addresses_are_rejected(self):
+        for address in ('10.1.2.3', '192.168.0.1', '172.16.5.4', '169.254.169.254', '100.64.0.1', '0.0.0.0',
+                        '224.0.0.1', '127.0.0.1', '::1', 'fd00::1', 'fe80::1', '::ffff:127.0.0.1'):
+            with self.subTest(address=address):
+                self.assertRaises(UnsafeAddressError, safe_addresses, address)
+        self.assertEqual(safe_addresses('93.184.216.34'), ('93.184.216.34',))
+        self.assertEqual(views.validate_url('http://localhost:8000/'),
+                         (False, "Internal/private IP addresses are not allowed"))
+        with override_settings(ALLOW_LOOPBACK_FETCH=True):
+            self.assertEqual(safe_addresses('127.0.0.1'), ('127.0.0.1',))
+            self.assertRaises(UnsafeAddressError, safe_addresses, '10.1.2.3')
+
+    def test_host_is_rejected_if_any_address_is_private(self):
+        resolver = CachingResolver()
+        with mock.patch('analyzer.resolver._resolver', resolver), \
+                mock.patch.object(resolver, 'lookup', return_value=('93.184.216.34', '10.0.0.1')):
+            self.assertRaises(UnsafeAddressError, safe_addresses, 'example.com')
+
+
+class SimHashTests(TestCase):
+    def test_small_edits_keep_fingerprint_close(self):
+        text = ' '.join(f"word{i % 97} feature{i % 13}" for i in range(600))
+        edited = text.replace('word5 feature5', 'updated 2026 banner', 1)
+        self.assertLessEqual(hamming_distance(simhash(text), simhash(edited)), 6)
+        self.assertGreater(hamming_distance(simhash(text), simhash('A completely different website about cooking')), 6)
+
+
+class HostHealthTests(TestCase):
+    def test_circuit_opens_and_probes(self):
+        tracker = HostHealthTracker(failure_threshold=2, open_seconds=30)
+        for _ in range(2):
+            self.assertEqual(tracker.allow('down.test:80'), (True, 0))
+            tracker.record_failure('down.test:80')
+        allowed, retry_in = tracker.allow('down.test:80')
+        self.assertFalse(allowed)
+        self.assertGreater(retry_in, 29)
+        # After the open period one probe goes through, the others keep failing fast
+        with mock.patch('analyzer.host_health.time.monotonic', return_value=tracker.hosts['down.test:80'].opened_at + 31):
+            self.assertTrue(tracker.allow('down.test:80')[0])
+            self.assertFalse(tracker.allow('down.test:80')[0])
+            self.assertEqual(tracker.state('down.test:80'), HALF_OPEN)
+            tracker.record_success('down.test:80', 0.1)
+        self.assertEqual(tracker.state('down.test:80'), CLOSED)
+
+    def test_timeouts_follow_observed_latency(self):
+        tracker = HostHealthTracker(connect_timeout=5, read_timeout=10, min_timeout=1, multiplier=3)
+        self.assertEqual(tracker.timeouts('fast.test:443'), (5, 10))
+        for _ in range(20):
+            tracker.record_connect('fast.test:443', 0.05)
+            tracker.record_success('fast.test:443', 0.8)
+        connect_timeout, read_timeout = tracker.timeouts('fast.test:443')
+        self.assertEqual(connect_timeout, 1)
+        self.assertAlmostEqual(read_timeout, 2.4)
+
+    @override_settings(ALLOW_LOOPBACK_FETCH=True)
+    def test_failing_host_is_skipped(self):
+        tracker = HostHealthTracker(failure_threshold=2)
+        with socket.socket() as unused:
+            unused.bind(('127.0.0.1', 0))
+            url = f"http://127.0.0.1:{unused.getsockname()[1]}/"
+        with mock.patch('analyzer.host_health._tracker', tracker), \
+                mock.patch('analyzer.pinned_http.PinnedHTTPConnection._new_conn', autospec=True,
+                           side_effect=ConnectTimeoutError('timed out')) as connect:
+            for _ in range(2):
+                self.assertEqual(views.fetch_website_text(url)[1],
+                                 "Request timed out. The website may be slow or unreachable.")
+            success, error = views.fetch_website_text(url)
+        self.assertFalse(success)
+        self.assertIn('skipped for now', error)
+        self.assertEqual(connect.call_count, 2)
+
+        # A half-open probe that ends without a result frees the probe for the next fetch
+        key = next(iter(tracker.hosts))
+        with mock.patch('analyzer.host_health._tracker', tracker), \
+                mock.patch('analyzer.host_health.time.monotonic', return_value=tracker.hosts[key].opened_at + 61), \
+                mock.patch('analyzer.pinned_http.PinnedHTTPConnection._new_conn', autospec=True,
+                           side_effect=RuntimeError('unexpected')):
+            self.assertEqual(views.fetch_website_text(url, deadline=Deadline(0))[1],
+                             "The analysis took too long. Please try again.")
+            self.assertEqual(views.fetch_website_text(url)[1], "An unexpected error occurred while fetching the website")
+            self.assertEqual(tracker.state(key), HALF_OPEN)
+            self.assertEqual(tracker.allow(key), (True, 0))
+
+
+def fake_completion(content, finish_reason='stop'):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(finish_reason=finish_reason, message=SimpleNamespace(content=content))])
+
+
+@override_settings(MODEL_ROUTES={'extract_features': ['small', 'large']})
+class ModelRoutingTests(TestCase):
+    def fake_client(self, answers):
+        create = mock.Mock(side_effect=lambda model, **request: answers[model]())
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))), create
+
+    def test_fast_model_answer_is_used_when_valid(self):
+        client, create = self.fake_client({'small': lambda: fake_completion('["Search", "Export", "SSO"]')})
+        response, features, model = route_completion('extract_features', client, validate_features, messages=[])
+        self.assertEqual((features, model), (['Search', 'Export', 'SSO'], 'small'))
+        self.assertEqual(create.call_count, 1)
+
+    def test_escalates_on_invalid_or_weak_output(self):
+        escalations = MODEL_ESCALATIONS.get(task='extract_features', model='small')
+        client, create = self.fake_client({
+            'small': lambda: fake_completion('Sure! Here are the features: Search, Export'),
+            'large': lambda: fake_completion('```json\n["Search", "Export", "SSO", "API"]\n```'),
+        })
+        response, features, model = route_completion('extract_features', client, validate_features, messages=[])
+        self.assertEqual((len(features), model), (4, 'large'))
+        self.assertEqual(MODEL_ESCALATIONS.get(task='extract_features', model='small'), escalations + 1)
+
+        # Weak output of the fast model is still used if the large one fails
+        client, create = self.fake_client({
+            'small': lambda: fake_completion('["Search"]'),
+            'large': mock.Mock(side_effect=TimeoutError('timed out')),
+        })
+        self.assertEqual(route_completion('extract_features', client, validate_features)[1:], (['Search'], 'small'))
+        self.assertGreater(MODEL_CALLS.get(task='extract_features', model='large', outcome='error'), 0)
+
+        client, create = self.fake_client({'small': lambda: fake_completion('{}'), 'large': lambda: fake_completion('nope')})
+        with self.assertRaisesMessage(RoutingError, 'Failed to parse OpenAI response as JSON'):
+            route_completion('extract_features', client, validate_features)
+
+    @override_settings(MODEL_ROUTES={'generate_pages': ['small', 'large']})
+    def test_truncated_output_is_returned_without_escalating(self):
+        calls = {outcome: MODEL_CALLS.get(task='generate_pages', model='small', outcome=outcome)
+                 for outcome in ('accepted', 'truncated')}
+        client, create = self.fake_client({'small': lambda: fake_completion('[{"slug": "a", "ti', finish_reason='length')})
+        response, pages, model = route_completion('generate_pages', client, pages_validator(5), messages=[])
+        self.assertEqual((pages, model, response.choices[0].finish_reason), (None, 'small', 'length'))
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(MODEL_CALLS.get(task='generate_pages', model='small', outcome='truncated'), calls['truncated'] + 1)
+        self.assertEqual(MODEL_CALLS.get(task='generate_pages', model='small', outcome='accepted'), calls['accepted'])
+
+
+class CrawlerClassifierTests(TestCase):
+    def test_categories(self):
+        classifier = CrawlerClassifier()
+        cases = {
+            'Mozilla/5.0 AppleWebKit/537.36 (KHTML, like Gecko; compatible; GPTBot/1.2; +https://openai.com/gptbot)': AI_TRAINER,
+            'Mozilla/5.0 AppleWebKit/537.36 (KHTML, like Gecko); compatible; ChatGPT-User/1.0': AI_ASSISTANT,
+            'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)': SEARCH_ENGINE,
+            'Mozilla/5.0 (Macintosh) AppleWebKit/605.1.15 (KHTML, like Gecko) Applebot-Extended/0.1': AI_TRAINER,
+            'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)': SOCIAL_PREVIEW,
+            'SomeCrawler/3.0 (+https://example.com/crawler)': OTHER_BOT,
+        }
+        for user_agent, category in cases.items():
+            self.assertEqual(classifier.classify(user_agent).category, category, user_agent)
+        browser = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36'
+        self.assertIsNone(classifier.classify(browser))
+        self.assertIsNone(classifier.classify(''))
+
+
+class ImportTimeTests(TestCase):
+    def test_heavy_sdks_are_imported_lazily(self):
+        # python -X importtime of the URLconf, as loaded when a worker starts
+        times = import_times('import config.urls')
+        self.assertIn('analyzer.views', times)
+        for module in ('openai', 'requests'):
+            self.assertNotIn(module, times)
+
+
+class MainContentExtractionTests(TestCase):
+    def test_keeps_content_and_drops_boilerplate(self):
+        links = ''.join(f'<li><a href="/{name}">{name.title()} page</a></li>' for name in ('product', 'pricing', 'blog'))
+        html = f"""<html><body>
+            <div class="cookie-banner"><p>We use cookies to improve your experience on this website.</p></div>
+            <header><a href="/">Acme</a><ul>{links}</ul></header>
+            <main>
+                <h1>Invoicing for freelancers</h1>
+                <p>Create and send professional invoices in under a minute, with automatic payment reminders.</p>
+                <h2>Features</h2>
+                <ul><li>Recurring invoices</li><li>Multi-currency support</li><li>Stripe and PayPal payments</li></ul>
+                <p>Read more in <a href="/docs/getting-started-with-invoices">the getting started guide</a>.</p>
+                <p>Create and send professional invoices in under a minute, with automatic payment reminders.</p>
+                <h2>You may also like</h2>
+            </main>
+            <div class="links"><p><a href="/a">Invoice templates</a> <a href="/b">Estimate templates</a> <a href="/c">Receipts</a></p></div>
+            <footer><p>Copyright 2026 Acme Inc. All rights reserved.</p></footer>
+        </body></html>"""
+        text = extract_main_content(html)
+        self.assertEqual(text.splitlines(), [
+            'Invoicing for freelancers',
+            'Create and send professional invoices in under a minute, with automatic payment reminders.',
+            'Features',
+            '- Recurring invoices',
+            '- Multi-currency support',
+            '- Stripe and PayPal payments',
+        ])
+
+    def test_too_little_content_returns_none(self):
+        self.assertIsNone(extract_main_content('<html><body><a href="/">Home</a></body></html>'))
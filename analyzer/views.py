@@ -1,23 +1,76 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.urls import reverse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from django.utils.crypto import constant_time_compare
 import os
 import re
+import math
+import uuid
+import threading
 import json
+import socket
 import logging
-import requests
+from collections import namedtuple
 from urllib.parse import urlparse
 from html.parser import HTMLParser
-from dotenv import load_dotenv
-from openai import OpenAI
-from .models import AnalysisSession
-
-load_dotenv()
+from .models import AnalysisSession, AiPage
+from .batch_planner import BatchPlanner, record_prompt_usage
+from .prompts import page_generation_messages, findability_messages
+from .similarity import dedupe_features
+from .findability_scoring import score_findability
+from .digests import budgeted_digest
+from .page_collector import PageCollector
+from .pagination import features_page, ai_pages_page, parse_limit
+from .metrics import span, render_metrics, FETCH_BYTES, FETCH_SHORT_CIRCUITS
+from .compression import gzip_splice, accepts_encoding
+from .single_flight import single_flight, flight_key, normalize_url, DEFAULT_PORTS
+from .crawlers import classify_user_agent
+from .crawl_analytics import crawl_recorder
+from .content_extraction import extract_main_content
+from .resolver import safe_addresses, UnsafeAddressError
+from .host_health import host_health, host_key, Deadline
+from . import export
+from .model_routing import route_completion, RoutingError, validate_features, pages_validator, validate_findability
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+_openai_clients = {}
+_openai_clients_lock = threading.Lock()
+
+
+def openai_client(api_key, timeout=60.0):
+    """
+    Return the process-wide OpenAI client for api_key, creating it on first use.
+    The SDK is imported here rather than with this module, which keeps worker start-up fast.
+    """
+    key = (api_key, os.getenv('OPENAI_BASE_URL', ''), timeout)
+    client = _openai_clients.get(key)
+    if client is None:
+        with _openai_clients_lock:
+            client = _openai_clients.get(key)
+            if client is None:
+                from openai import OpenAI
+                # Remove proxy-related env vars that might interfere with OpenAI client
+                proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']
+                original_proxies = {}
+                for var in proxy_vars:
+                    if var in os.environ:
+                        original_proxies[var] = os.environ.pop(var)
+                
+                client = _openai_clients[key] = OpenAI(api_key=api_key, timeout=timeout)
+                
+                # Restore proxy vars if they existed
+                for var, value in original_proxies.items():
+                    os.environ[var] = value
+    return client
+
 def get_or_create_session(request):
     """Get or create an AnalysisSession for the current Django session."""
     session_id = request.session.get('analysis_session_id')
@@ -43,6 +96,20 @@ def health(request):
         'has_openai_key': has_openai_key
     })
 
+def metrics(request):
+    """
+    Prometheus metrics for this process (stage latencies, bytes fetched, OpenAI tokens).
+    Requires the METRICS_TOKEN bearer token; without one it is only served with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        if not settings.DEBUG:
+            # Per-host and token usage data must not be public in production
+            return HttpResponse("Not Found", status=404, content_type='text/plain')
+    elif not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f"Bearer {token}"):
+        return HttpResponse("Unauthorized", status=401, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class TextExtractor(HTMLParser):
     """Extract readable text from HTML, skipping navigation, cookies, and other non-content."""
     def __init__(self):
@@ -129,24 +196,49 @@ def validate_url(url):
     if parsed.scheme not in ('http', 'https'):
         return False, "Only HTTP and HTTPS URLs are allowed"
     
-    # Basic security: prevent localhost/internal IPs in production (can be relaxed for dev)
-    if parsed.hostname:
-        hostname_lower = parsed.hostname.lower()
-        if hostname_lower in ('localhost', '127.0.0.1', '0.0.0.0'):
-            # Allow localhost in development
-            pass
-        elif hostname_lower.startswith('192.168.') or hostname_lower.startswith('10.'):
-            return False, "Internal/private IP addresses are not allowed"
+    if not parsed.hostname:
+        return False, "Invalid URL format. Please include http:// or https://"
+    
+    # Every address the host resolves to must be public (loopback only with
+    # ALLOW_LOOPBACK_FETCH); fetches connect to these same cached addresses
+    try:
+        safe_addresses(parsed.hostname)
+    except UnsafeAddressError:
+        return False, "Internal/private IP addresses are not allowed"
+    except (socket.gaierror, UnicodeError):
+        return False, "Could not resolve the website's host name"
     
     return True, None
 
 
-def fetch_website_text(url, timeout=10, max_size=500000):
+# A fetched page: extracted text and the validators for a conditional re-fetch.
+# not_modified is True (and text None) when the server answered 304 to them
+FetchedPage = namedtuple('FetchedPage', ['text', 'etag', 'last_modified', 'not_modified'])
+
+
+def fetch_website_text(url, timeout=None, max_size=500000, deadline=None):
     """
     Fetch website HTML and extract readable text.
     Returns (success: bool, text: str or error_message: str)
+    """
+    success, result = fetch_website(url, timeout=timeout, max_size=max_size, deadline=deadline)
+    return (True, result.text) if success else (False, result)
+
+
+def fetch_website(url, timeout=None, max_size=500000, deadline=None, etag='', last_modified=''):
+    """
+    Fetch website HTML and extract readable text.
+    Returns (success: bool, FetchedPage or error_message: str)
     Increased max_size to 500KB to handle larger websites.
+    Timeouts adapt to the host's recent latency unless timeout is given, and the
+    whole fetch stays within FETCH_TOTAL_SECONDS and the caller's Deadline.
+    With the etag / last_modified of an earlier fetch, the request is conditional.
     """
+    # Imported on first use to keep worker start-up fast
+    import requests
+    from .pinned_http import fetch_session
+    # Set once the tracker let this fetch through, which may be the half-open probe
+    allowed_host = None
     try:
         # Validate URL
         is_valid, error_msg = validate_url(url)
@@ -154,13 +246,49 @@ def fetch_website_text(url, timeout=10, max_size=500000):
             logger.warning(f"URL validation failed: {error_msg} for URL: {url[:50]}...")
             return False, error_msg
         
+        # Hosts that keep failing are skipped for a while instead of tying up a thread
+        parsed = urlparse(url)
+        host = host_key(parsed.hostname, parsed.port or DEFAULT_PORTS[parsed.scheme])
+        tracker = host_health()
+        allowed, retry_in = tracker.allow(host)
+        if not allowed:
+            FETCH_SHORT_CIRCUITS.inc()
+            logger.warning(f"Circuit open for {host}, not fetching URL: {url[:50]}...")
+            return False, f"The website failed repeatedly and is skipped for now. Please try again in {math.ceil(retry_in)} seconds."
+        allowed_host = host
+        
+        total = getattr(settings, 'FETCH_TOTAL_SECONDS', 20)
+        fetch_deadline = Deadline(min(total, deadline.remaining()) if deadline is not None else total)
+        if fetch_deadline.expired:
+            return False, "The analysis took too long. Please try again."
+        connect_timeout, read_timeout = tracker.timeouts(host) if timeout is None else (timeout, timeout)
+        timeouts = (fetch_deadline.cap(connect_timeout), fetch_deadline.cap(read_timeout))
+        
         # Fetch with timeout and size limit
         headers = {
             'User-Agent': 'Mozilla/5.0 (compatible; WebsiteFeatureFinder/1.0)'
         }
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
         logger.info(f"Fetching website: {url}")
-        response = requests.get(url, timeout=timeout, headers=headers, stream=True)
-        response.raise_for_status()
+        # DNS, connect, TLS and time to first byte
+        with span('fetch_connect', url=url[:50]):
+            with fetch_session() as session:
+                response = session.get(url, timeout=timeouts, headers=headers, stream=True)
+            if response.status_code >= 500:
+                tracker.record_failure(host)
+            else:
+                tracker.record_success(host, response.elapsed.total_seconds())
+            response.raise_for_status()
+        
+        page_etag = response.headers.get('ETag', '')
+        page_last_modified = response.headers.get('Last-Modified', '')
+        if response.status_code == 304:
+            response.close()
+            logger.info(f"Not modified since last fetch: {url[:50]}...")
+            return True, FetchedPage(None, page_etag or etag, page_last_modified or last_modified, True)
         
         # Check content size (warn but don't fail immediately - we'll extract text anyway)
         content_length = response.headers.get('Content-Length')
@@ -169,59 +297,76 @@ def fetch_website_text(url, timeout=10, max_size=500000):
         
         # Read content with size limit
         content = b''
-        for chunk in response.iter_content(chunk_size=8192):
-            content += chunk
-            if len(content) > max_size:
-                logger.warning(f"Content size limit reached for URL: {url[:50]}... (stopping read, extracting text from what we have)")
-                break  # Stop reading but continue with what we have
+        with span('fetch_body', url=url[:50]) as fields:
+            for chunk in response.iter_content(chunk_size=8192):
+                content += chunk
+                if len(content) > max_size:
+                    logger.warning(f"Content size limit reached for URL: {url[:50]}... (stopping read, extracting text from what we have)")
+                    break  # Stop reading but continue with what we have
+                if fetch_deadline.expired:
+                    # A site trickling bytes never hits the read timeout
+                    logger.warning(f"Fetch time budget used up for URL: {url[:50]}... (extracting text from what we have)")
+                    break
+            fields['bytes'] = len(content)
+        FETCH_BYTES.inc(len(content))
         
         # Extract text from HTML
-        html_content = content.decode('utf-8', errors='ignore')
-        extractor = TextExtractor()
-        extractor.feed(html_content)
-        text = extractor.get_text(max_length=8000)  # Limit text sent to OpenAI
+        with span('html_parse') as fields:
+            html_content = content.decode('utf-8', errors='ignore')
+            text = None
+            if getattr(settings, 'MAIN_CONTENT_EXTRACTION', True):
+                # Only the page's main content, to keep the prompt small
+                text = extract_main_content(html_content, max_length=8000)
+            if text is None:
+                extractor = TextExtractor()
+                extractor.feed(html_content)
+                text = extractor.get_text(max_length=8000)  # Limit text sent to OpenAI
+            fields['chars'] = len(text)
         
         if not text or len(text.strip()) < 50:
             logger.warning(f"Insufficient text extracted from URL: {url[:50]}...")
             return False, "Could not extract enough readable text from the website"
         
         logger.info(f"Successfully extracted {len(text)} characters from URL: {url[:50]}...")
-        return True, text
+        return True, FetchedPage(text, page_etag, page_last_modified, False)
     
+    except UnsafeAddressError:
+        # A redirect, or a DNS answer that changed since validation, pointed at an internal address
+        logger.warning(f"Refused to fetch non-public address for URL: {url[:50]}...")
+        return False, "Internal/private IP addresses are not allowed"
     except requests.exceptions.Timeout:
+        tracker.record_failure(host)
         logger.error(f"Request timeout for URL: {url[:50]}...")
         return False, "Request timed out. The website may be slow or unreachable."
     except requests.exceptions.RequestException as e:
+        if not isinstance(e, requests.exceptions.HTTPError):
+            # HTTP errors were recorded with the response; 4xx means the host is up
+            tracker.record_failure(host)
         # Don't log full exception to avoid leaking sensitive info
         logger.error(f"Request failed for URL: {url[:50]}... Error type: {type(e).__name__}")
         return False, f"Failed to fetch website: {str(e)[:200]}"  # Limit error message length
     except Exception as e:
         logger.exception(f"Unexpected error fetching URL: {url[:50]}...")
         return False, "An unexpected error occurred while fetching the website"
+    finally:
+        if allowed_host is not None:
+            # Exits that didn't record a success or failure (deadline, refused address, unexpected
+            # errors) must not leave a half-open host waiting for the probe to time out
+            tracker.release(allowed_host)
 
 
-def extract_features_with_openai(website_url, website_text):
+def extract_features_with_openai(website_url, website_text, deadline=None):
     """
     Use OpenAI to extract features from website text.
     Returns (success: bool, features: list or error_message: str)
+    With a Deadline, the call is given only what is left of it.
     """
     openai_key = os.getenv('OPENAI_API_KEY', '')
     if not openai_key or openai_key == 'your_key_here':
         return False, "OpenAI API key not configured. Please set OPENAI_API_KEY in .env file."
     
     try:
-        # Remove proxy-related env vars that might interfere with OpenAI client
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']
-        original_proxies = {}
-        for var in proxy_vars:
-            if var in os.environ:
-                original_proxies[var] = os.environ.pop(var)
-        
-        client = OpenAI(api_key=openai_key, timeout=60.0)
-        
-        # Restore proxy vars if they existed
-        for var, value in original_proxies.items():
-            os.environ[var] = value
+        client = openai_client(openai_key)
         
         prompt = f"""Analyze the following website content and extract a concise list of features, capabilities, or key selling points.
 
@@ -240,50 +385,47 @@ Focus on:
 Return ONLY a valid JSON array, no other text. Example format:
 ["Feature 1", "Feature 2", "Feature 3"]"""
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that extracts features from website content. Always return valid JSON arrays."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Try to parse JSON
-        # Remove markdown code blocks if present
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'^```\s*', '', content)
-        content = re.sub(r'```\s*$', '', content)
-        content = content.strip()
-        
-        features = json.loads(content)
-        
-        if not isinstance(features, list):
-            return False, "OpenAI returned invalid format (expected a list)"
-        
-        if len(features) < 1:
-            return False, "No features were extracted"
-        
-        # Validate and clean features
-        cleaned_features = []
-        for feature in features:
-            if isinstance(feature, str) and feature.strip():
-                cleaned_features.append(feature.strip())
+        # Fast model first; the output is checked and escalated to a larger model if it falls short
+        with span('openai_extract_features') as fields:
+            response, cleaned_features, model = route_completion(
+                'extract_features', client, validate_features, deadline=deadline, fields=fields,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that extracts features from website content. Always return valid JSON arrays."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=1000
+            )
         
-        if not cleaned_features:
-            return False, "No valid features were extracted"
+        # Merge near-duplicates ("Fast search" / "Quick search") before they inflate later prompts
+        cleaned_features, merged = dedupe_features(cleaned_features)
+        if merged:
+            logger.info(f"Merged {merged} near-duplicate feature(s) for URL: {website_url[:50]}...")
         
         return True, cleaned_features
     
-    except json.JSONDecodeError as e:
-        return False, f"Failed to parse OpenAI response as JSON: {str(e)}"
+    except RoutingError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"OpenAI API error: {str(e)}"
 
 
+def analyze_website(website_url):
+    """
+    Fetch a website and extract its features.
+    Returns (success, website_text, features or error_message).
+    Both steps share one ANALYSIS_DEADLINE_SECONDS budget.
+    """
+    deadline = Deadline(getattr(settings, 'ANALYSIS_DEADLINE_SECONDS', 60))
+    fetch_success, fetch_result = fetch_website_text(website_url, deadline=deadline)
+    if not fetch_success:
+        return False, '', fetch_result
+    extract_success, extract_result = extract_features_with_openai(website_url, fetch_result, deadline=deadline)
+    if not extract_success:
+        return False, fetch_result, extract_result
+    return True, fetch_result, extract_result
+
+
 @require_http_methods(["GET", "POST"])
 def website_analysis(request):
     """Page 1: Website analysis page."""
@@ -305,22 +447,20 @@ def website_analysis(request):
                 error_message = validation_error
                 logger.warning(f"URL validation failed: {validation_error}")
             else:
-                # Fetch website text
-                fetch_success, fetch_result = fetch_website_text(website_url)
-            
-            if not fetch_success:
-                error_message = fetch_result
-            else:
-                # Extract features with OpenAI
-                extract_success, extract_result = extract_features_with_openai(website_url, fetch_result)
+                # Identical concurrent submissions share one fetch and extraction
+                key = flight_key('website_analysis', normalize_url(website_url))
+                success, website_text, result = single_flight(
+                    key, lambda: analyze_website(website_url), reuse_result=lambda r: r[0])
                 
-                if not extract_success:
-                    error_message = extract_result
+                if not success:
+                    error_message = result
                 else:
                     # Save to session
                     session.website_url = website_url
-                    session.features = extract_result
-                    session.save()
+                    session.website_text = website_text
+                    session.features = result
+                    with span('session_save'):
+                        session.save()
                     
                     # Redirect to features page
                     return redirect('features_table')
@@ -375,29 +515,91 @@ def features_table(request):
                     error_message = "Too many features (maximum 100 allowed)"
                     logger.warning(f"Too many features: {len(cleaned_features)}")
                 else:
-                    # Save to session
+                    # Saved as submitted: only extracted features are merged, never rows the user typed in
                     session.features = cleaned_features
-                    session.save()
+                    with span('session_save'):
+                        session.save()
                     success_message = f"Successfully saved {len(cleaned_features)} feature(s)"
                     logger.info(f"Saved {len(cleaned_features)} features to session {session.id}")
     
+    # Saving replaces the whole list, so every feature (at most 100) is rendered in the form;
+    # only the AI pages are paginated, the rest being fetched from the JSON API on demand
+    ai_pages = ai_pages_page(session)
     context = {
         'session': session,
         'session_id': session.id,
         'features': session.features if isinstance(session.features, list) else [],
         'features_count': session.features_count,
-        'ai_pages': session.ai_pages if isinstance(session.ai_pages, list) else [],
-        'ai_pages_count': session.ai_pages_count,
+        'ai_pages': ai_pages['results'],
+        'ai_pages_next_cursor': ai_pages['next_cursor'],
+        'ai_pages_count': ai_pages['total'],
         'has_findability_report': session.has_findability_report,
         'error_message': error_message,
         'success_message': success_message,
     }
     return render(request, 'analyzer/features_table.html', context)
 
+
+@require_http_methods(["GET"])
+def features_api(request):
+    """Cursor-paginated features of the current session as JSON."""
+    session = get_or_create_session(request)
+    try:
+        data = features_page(session.features, request.GET.get('cursor'), parse_limit(request.GET.get('limit')))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(data)
+
+
+@require_http_methods(["GET"])
+def ai_pages_api(request):
+    """Cursor-paginated AI page metadata (slug, title, size; never content) of the current session as JSON."""
+    session = get_or_create_session(request)
+    try:
+        data = ai_pages_page(session, request.GET.get('cursor'), parse_limit(request.GET.get('limit')))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(data)
+
+@require_http_methods(["GET"])
+def export_ai_pages(request):
+    """
+    Download all AI pages of the current session, streamed page by page.
+    ?format=zip (default): <slug>.html files and a sitemap.xml; ?format=ndjson: one page per line.
+    ?base_url=https://example.com/ai lists the pages in the sitemap as <base_url>/<slug>.html,
+    where they will be deployed; by default the sitemap lists their URLs on this site.
+    """
+    session = get_or_create_session(request)
+    export_format = request.GET.get('format', 'zip')
+    if export_format not in ('zip', 'ndjson'):
+        return JsonResponse({'error': "format must be zip or ndjson"}, status=400)
+    
+    if export_format == 'ndjson':
+        response = StreamingHttpResponse(export.ndjson_lines(session), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="ai-pages-{session.id}.ndjson"'
+        return response
+    
+    base_url = request.GET.get('base_url', '').strip().rstrip('/')
+    if base_url:
+        parsed = urlparse(base_url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            return JsonResponse({'error': "base_url must be an http:// or https:// URL"}, status=400)
+    
+    def page_url(slug):
+        if base_url:
+            return f"{base_url}/{export.file_name(slug)}"
+        return request.build_absolute_uri(reverse('ai_page', args=[session.id, slug]))
+    
+    response = StreamingHttpResponse(export.zip_chunks(session, page_url), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="ai-pages-{session.id}.zip"'
+    return response
+
+
 def generate_ai_pages_with_openai(website_url, features_list, num_pages=50):
     """
     Use OpenAI to generate AI-oriented pages based on website URL and features.
-    Uses batching for large page counts to avoid token limits.
+    Uses batching for large page counts to avoid token limits; batch sizes and
+    max_tokens are planned from the tokens per page observed for the site.
     Args:
         website_url: The website URL
         features_list: List of features
@@ -416,159 +618,115 @@ def generate_ai_pages_with_openai(website_url, features_list, num_pages=50):
         return False, "OpenAI API key not configured. Please set OPENAI_API_KEY in .env file."
     
     try:
-        # Remove proxy-related env vars that might interfere with OpenAI client
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']
-        original_proxies = {}
-        for var in proxy_vars:
-            if var in os.environ:
-                original_proxies[var] = os.environ.pop(var)
-        
-        client = OpenAI(api_key=openai_key, timeout=60.0)
+        client = openai_client(openai_key)
         
-        # Restore proxy vars if they existed
-        for var, value in original_proxies.items():
-            os.environ[var] = value
-        
-        features_text = '\n'.join([f"- {f}" for f in features_list[:20]])  # Limit to 20 features
-        
-        # Determine batch size based on number of pages
-        # For large requests, batch in chunks of 20-30 pages per API call
-        if num_pages <= 30:
-            batch_size = num_pages
-            batches = 1
-        else:
-            batch_size = 25  # Generate 25 pages per batch
-            batches = (num_pages + batch_size - 1) // batch_size  # Ceiling division
+        # Batch size and max_tokens adapt to the tokens per page observed for this site
+        planner = BatchPlanner.for_site(website_url)
+        batches = planner.estimate_batches(num_pages)
         
-        all_pages = []
+        # Accepted pages; rejects near-duplicates of pages from this or earlier batches
+        collector = PageCollector()
+        batch_num = 0
+        # Give up after this many calls that produce no usable pages (truncated, invalid)
+        max_failed_batches = 3
+        failed_batches = 0
         
-        for batch_num in range(batches):
-            # Calculate how many pages to generate in this batch
-            pages_in_batch = min(batch_size, num_pages - len(all_pages))
-            
-            if pages_in_batch <= 0:
-                break
-            
-            # Adjust prompt for batch context
-            batch_context = ""
-            if batches > 1:
-                batch_context = f"\n\nThis is batch {batch_num + 1} of {batches}. Generate exactly {pages_in_batch} unique pages. Ensure all pages are different from previous batches."
-            
-            prompt = f"""Generate {pages_in_batch} AI-oriented web pages for a website. These pages are specifically designed for AI scrapers and LLM consumption to improve AI rankings. They should be:
-
-1. Highly structured and machine-readable
-2. Rich in semantic information and context
-3. Optimized for AI understanding (not human SEO)
-4. Include clear feature descriptions, use cases, and capabilities
-5. Use structured data patterns that AI systems can easily parse
-6. Focus on factual, comprehensive information about the website's offerings
-
-Website URL: {website_url}
-
-Key Features:
-{features_text}
-{batch_context}
-
-Generate pages that would be useful for:
-- AI assistants understanding what the website offers
-- AI crawlers and LLM training data
-- Improving AI rankings and discoverability
-- Providing detailed, structured information about features
-
-For each page, return a JSON object with:
-- slug: URL-friendly identifier (lowercase, hyphens, no spaces) - MUST be unique
-- title: Clear, descriptive title optimized for AI understanding
-- content: Full HTML content with:
-  * Clear semantic structure (use proper HTML tags: <h1>, <h2>, <p>, <ul>, <li>)
-  * Rich context about features, benefits, and use cases
-  * Structured information that AI systems can parse
-  * Comprehensive descriptions (not marketing fluff)
-  * Technical details and capabilities
-  * Use cases and examples
-
-The content should be written for AI consumption - focus on clarity, completeness, and machine-readability over human marketing appeal.
-
-Return a JSON array of exactly {pages_in_batch} page objects. Example format:
-[
-  {{"slug": "features-overview", "title": "Features Overview", "content": "<h1>Features Overview</h1><p>...</p>"}},
-  {{"slug": "capabilities", "title": "Capabilities", "content": "<h1>Capabilities</h1><p>...</p>"}}
-]
-
-Return ONLY valid JSON, no markdown code blocks or other text."""
-
-            # Calculate max_tokens for this batch
-            # Estimate: ~800-1200 tokens per page
-            estimated_tokens = max(4000, pages_in_batch * 1000)
-            max_tokens = min(16000, estimated_tokens)  # Cap at 16k (model limit)
-            
-            logger.info(f"Generating batch {batch_num + 1}/{batches}: {pages_in_batch} pages (max_tokens: {max_tokens})")
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates AI-oriented web pages. Always return valid JSON arrays with the exact number of pages requested."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=max_tokens
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Remove markdown code blocks if present
-            content = re.sub(r'^```json\s*', '', content)
-            content = re.sub(r'^```\s*', '', content)
-            content = re.sub(r'```\s*$', '', content)
-            content = content.strip()
-            
-            batch_pages = json.loads(content)
-            
-            if not isinstance(batch_pages, list):
-                logger.warning(f"Batch {batch_num + 1} returned invalid format, skipping")
-                continue
-            
-            # Validate and clean pages from this batch
-            for page in batch_pages:
-                if isinstance(page, dict) and 'slug' in page and 'title' in page and 'content' in page:
-                    # Ensure slug is URL-friendly and unique
-                    slug = re.sub(r'[^a-z0-9-]', '', page['slug'].lower().replace(' ', '-'))
-                    if slug:
-                        # Check for duplicate slugs
-                        existing_slugs = {p.get('slug') for p in all_pages}
-                        original_slug = slug
-                        counter = 1
-                        while slug in existing_slugs:
-                            slug = f"{original_slug}-{counter}"
-                            counter += 1
-                        
-                        all_pages.append({
-                            'slug': slug,
-                            'title': str(page['title']).strip(),
-                            'content': str(page['content']).strip()
-                        })
-            
-            logger.info(f"Batch {batch_num + 1} completed: {len(batch_pages)} pages generated, {len(all_pages)} total so far")
-            
-            # If we've reached the target, stop
-            if len(all_pages) >= num_pages:
-                break
+        try:
+            # Calls are capped at the planned batches plus a few retries, so batches that add
+            # only a page or two (mostly near-duplicates) can't turn into one call per page
+            while (len(collector) < num_pages and failed_batches < max_failed_batches
+                   and batch_num < max(batches, planner.estimate_batches(num_pages)) + max_failed_batches):
+                pages_in_batch, max_tokens = planner.plan_batch(num_pages - len(collector))
+                
+                batch_num += 1
+                logger.info(f"Generating batch {batch_num}/{max(batches, batch_num)}: {pages_in_batch} pages (max_tokens: {max_tokens})")
+                
+                # Shared site prefix and instructions first, batch-specific request last,
+                # so every batch after the first reuses the provider's prompt cache
+                try:
+                    with span('openai_generate_pages', batch=batch_num, pages=pages_in_batch) as fields:
+                        response, batch_pages, model = route_completion(
+                            'generate_pages', client, pages_validator(pages_in_batch), fields=fields,
+                            messages=page_generation_messages(
+                                website_url, features_list, pages_in_batch,
+                                batch_num=batch_num, batches=max(batches, batch_num)
+                            ),
+                            temperature=0.7,
+                            max_tokens=max_tokens
+                        )
+                except RoutingError as e:
+                    logger.warning(f"Batch {batch_num} returned invalid format ({e}), skipping")
+                    failed_batches += 1
+                    continue
+                
+                completion_tokens = response.usage.completion_tokens if response.usage else 0
+                truncated = response.choices[0].finish_reason == 'length'
+                
+                if truncated:
+                    # Output was cut off by max_tokens, so the JSON is incomplete
+                    planner.record_batch(pages_in_batch, 0, completion_tokens, truncated=True, usage=response.usage)
+                    logger.warning(f"Batch {batch_num} truncated at {completion_tokens} completion tokens, replanning")
+                    failed_batches += 1
+                    continue
+                
+                planner.record_batch(pages_in_batch, len(batch_pages), completion_tokens, truncated=False, usage=response.usage)
+                
+                # Validate and clean pages from this batch
+                if not collector.add_batch(batch_pages):
+                    failed_batches += 1
+                
+                logger.info(f"Batch {batch_num} completed: {len(batch_pages)} pages generated, {len(collector)} total so far")
+        finally:
+            planner.save()
         
         # Trim to exact number requested
-        all_pages = all_pages[:num_pages]
+        all_pages = collector.pages[:num_pages]
         
         if not all_pages:
             return False, "No valid pages were generated"
         
-        logger.info(f"Total pages generated: {len(all_pages)} (requested: {num_pages})")
+        logger.info(f"Total pages generated: {len(all_pages)} (requested: {num_pages}, near-duplicates skipped: {collector.duplicates_skipped})")
         return True, all_pages
     
-    except json.JSONDecodeError as e:
-        return False, f"Failed to parse OpenAI response as JSON: {str(e)}"
     except Exception as e:
         logger.exception(f"Error generating AI pages: {str(e)}")
         return False, f"OpenAI API error: {str(e)}"
 
 
+@staff_member_required
+@require_http_methods(["POST"])
+def bulk_analysis_api(request):
+    """
+    Analyze many websites at once (staff only).
+    Accepts a JSON body {"urls": [...]}, an uploaded "file" (URL list or CSV) or
+    a "urls" form field, and streams one JSON result per URL as NDJSON as each finishes.
+    """
+    from .bulk import parse_urls, iter_bulk_analysis
+    
+    if request.content_type == 'application/json':
+        try:
+            urls = json.loads(request.body or b'{}').get('urls')
+        except (json.JSONDecodeError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        if not isinstance(urls, list):
+            return JsonResponse({'error': '"urls" must be a list'}, status=400)
+        urls = [u for u in urls if isinstance(u, str)]
+    elif 'file' in request.FILES:
+        urls = parse_urls(request.FILES['file'].read().decode('utf-8', errors='ignore'))
+    else:
+        urls = parse_urls(request.POST.get('urls', ''))
+    
+    if not urls:
+        return JsonResponse({'error': 'No URLs provided'}, status=400)
+    max_urls = getattr(settings, 'BULK_MAX_URLS', 500)
+    if len(urls) > max_urls:
+        return JsonResponse({'error': f'Too many URLs (maximum {max_urls} allowed)'}, status=400)
+    
+    logger.info(f"Bulk analysis of {len(urls)} URL(s) requested by {request.user}")
+    results = (json.dumps(result) + '\n' for result in iter_bulk_analysis(urls))
+    return StreamingHttpResponse(results, content_type='application/x-ndjson')
+
+
 @require_http_methods(["POST"])
 def generate_ai_pages(request):
     """Generate AI pages and store them in the session."""
@@ -596,8 +754,8 @@ def generate_ai_pages(request):
         messages.error(request, f"Failed to generate AI pages: {result}")
     else:
         # Save to session
-        session.ai_pages = result
-        session.save()
+        with span('session_save', pages=len(result)):
+            session.replace_ai_pages(result)
         messages.success(request, f"Successfully generated {len(result)} AI page(s)! (Requested: {num_pages})")
     
     return redirect('features_table')
@@ -608,9 +766,8 @@ def delete_all_ai_pages(request):
     """Delete all AI-generated pages from the session."""
     session = get_or_create_session(request)
     
-    if session.ai_pages and len(session.ai_pages) > 0:
-        session.ai_pages = []
-        session.save()
+    deleted, _ = session.pages.all().delete()
+    if deleted:
         messages.success(request, "All AI pages have been deleted.")
         logger.info(f"Deleted all AI pages from session {session.id}")
     else:
@@ -619,62 +776,59 @@ def delete_all_ai_pages(request):
     return redirect('features_table')
 
 
-def ai_page(request, slug):
+def gzip_page_response(request, page, context):
+    """
+    Serve an AI page as gzip built around its stored compressed content, so the page
+    body is never decompressed. Returns None if the template can't be split.
+    """
+    marker = f"<!--ai-page-content-{uuid.uuid4().hex}-->"
+    # Render the template around a marker in place of the page content
+    html = render_to_string('analyzer/ai_page.html', dict(context, content_marker=marker), request=request)
+    parts = html.split(marker)
+    if len(parts) != 2:
+        return None
+    body = gzip_splice(parts[0].encode('utf-8'), page.content_deflate, page.content_crc32, page.size,
+                       parts[1].encode('utf-8'))
+    response = HttpResponse(body, content_type='text/html; charset=utf-8')
+    response['Content-Encoding'] = 'gzip'
+    return response
+
+
+def ai_page(request, session_id, slug):
     """
     View an AI-generated page.
     These pages are optimized for AI scrapers/bots and AI rankings (SiteBuddy SEO for AI).
     Human users can also view them for preview purposes.
     """
     # Check User-Agent to determine if request is from AI scraper or human browser
-    user_agent = request.META.get('HTTP_USER_AGENT', '').lower()
-    
-    # List of known AI crawlers/bots (add more as needed)
-    ai_crawlers = [
-        'gptbot',           # OpenAI GPTBot
-        'chatgpt',          # ChatGPT
-        'chatgpt-user',     # ChatGPT user agent
-        'anthropic-ai',      # Anthropic Claude
-        'claude',           # Claude
-        'google-ai',         # Google AI
-        'googlebot',        # Google (may include AI features)
-        'bingbot',          # Bing (may include AI features)
-        'ccbot',            # Common Crawl
-        'facebookexternalhit',  # Facebook crawler
-        'linkedinbot',      # LinkedIn
-        'twitterbot',       # Twitter/X
-        'slackbot',         # Slack
-        'whatsapp',         # WhatsApp
-        'telegrambot',      # Telegram
-        'discordbot',       # Discord
-        'crawler',          # Generic crawler
-        'spider',           # Generic spider
-        'bot',              # Generic bot (check last to avoid false positives)
-    ]
-    
-    # Check if it's a known AI/bot crawler
-    is_ai_crawler = any(crawler in user_agent for crawler in ai_crawlers)
+    crawler = classify_user_agent(request.META.get('HTTP_USER_AGENT', ''))
+    is_ai_crawler = crawler is not None
     
-    session = get_or_create_session(request)
-    
-    # Find the page by slug
-    page = None
-    if session.ai_pages and isinstance(session.ai_pages, list):
-        for p in session.ai_pages:
-            if isinstance(p, dict) and p.get('slug') == slug:
-                page = p
-                break
+    # Looked up by the session id in the URL, not the cookie: crawlers send none, and must not create sessions
+    page = AiPage.objects.select_related('session').filter(session_id=session_id, slug=slug).first()
     
     if not page:
         from django.http import Http404
         raise Http404("AI page not found")
     
+    session = page.session
     context = {
         'page': page,
         'session': session,
         'is_ai_crawler': is_ai_crawler,
     }
     
-    response = render(request, 'analyzer/ai_page.html', context)
+    response = None
+    if accepts_encoding(request, 'gzip'):
+        response = gzip_page_response(request, page, context)
+    if response is None:
+        response = render(request, 'analyzer/ai_page.html', context)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    
+    if crawler is not None:
+        recorder = crawl_recorder()
+        if recorder is not None:
+            recorder.record(session.id, page.slug, crawler, len(response.content))
     
     # Set appropriate robots headers
     if is_ai_crawler:
@@ -688,9 +842,12 @@ def ai_page(request, slug):
     return response
 
 
-def run_findability_analysis_with_openai(website_url, features_list, ai_pages_list=None):
+def run_findability_analysis_with_openai(website_url, features_list, ai_pages_list=None, website_text=''):
     """
-    Use OpenAI to run findability analysis.
+    Run findability analysis.
+    The score, simulated queries and per-feature coverage are computed locally
+    (BM25 over the website text and AI pages); OpenAI only writes the notes and
+    recommendations.
     Returns (success: bool, report: dict or error_message: str)
     """
     openai_key = os.getenv('OPENAI_API_KEY', '')
@@ -698,112 +855,33 @@ def run_findability_analysis_with_openai(website_url, features_list, ai_pages_li
         return False, "OpenAI API key not configured. Please set OPENAI_API_KEY in .env file."
     
     try:
-        # Remove proxy-related env vars that might interfere with OpenAI client
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']
-        original_proxies = {}
-        for var in proxy_vars:
-            if var in os.environ:
-                original_proxies[var] = os.environ.pop(var)
-        
-        client = OpenAI(api_key=openai_key, timeout=60.0)
+        client = openai_client(openai_key)
         
-        # Restore proxy vars if they existed
-        for var, value in original_proxies.items():
-            os.environ[var] = value
-        
-        features_text = '\n'.join([f"- {f}" for f in features_list[:30]])  # Limit to 30 features
-        
-        # Prepare AI pages content summary if available
+        # Digest of every AI page, shortened to fit the token budget
         ai_pages_summary = ""
         if ai_pages_list and len(ai_pages_list) > 0:
-            ai_pages_summary = "\n\nAI-Generated Pages Available:\n"
-            for page in ai_pages_list[:5]:  # Limit to 5 pages
-                if isinstance(page, dict):
-                    ai_pages_summary += f"- {page.get('title', 'Untitled')}: {page.get('content', '')[:200]}...\n"
-        
-        prompt = f"""You are analyzing the findability of a website. Your task is to:
-
-1. Generate 15-25 realistic user search queries that people might use to find this website's features
-2. Analyze how well the website content supports these queries
-3. Create a comprehensive findability report
-
-Website URL: {website_url}
-
-Key Features:
-{features_text}
-{ai_pages_summary}
-
-Generate a JSON report with the following structure:
-{{
-    "overall_score": <number 0-100>,
-    "simulated_queries": [<list of 15-25 search query strings>],
-    "per_feature_notes": [
-        {{"feature": "<feature name>", "note": "<findability assessment>"}},
-        ...
-    ],
-    "content_gaps": [
-        "<gap description 1>",
-        "<gap description 2>",
-        ...
-    ],
-    "recommendations": {{
-        "pages_to_add": [
-            "<recommended page/section 1>",
-            "<recommended page/section 2>",
-            ...
-        ],
-        "faq_suggestions": [
-            "<FAQ question 1>",
-            "<FAQ question 2>",
-            ...
-        ]
-    }},
-    "wording_improvements": [
-        "<suggestion 1>",
-        "<suggestion 2>",
-        ...
-    ]
-}}
-
-The overall_score should reflect how easily users can find information about the features (0 = very poor, 100 = excellent).
-Return ONLY valid JSON, no markdown code blocks or other text."""
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert in website findability and SEO analysis. Always return valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Remove markdown code blocks if present
-        content = re.sub(r'^```json\s*', '', content)
-        content = re.sub(r'^```\s*', '', content)
-        content = re.sub(r'```\s*$', '', content)
-        content = content.strip()
-        
-        report = json.loads(content)
-        
-        if not isinstance(report, dict):
-            return False, "OpenAI returned invalid format (expected a dictionary)"
-        
-        # Validate required fields
-        if 'overall_score' not in report:
-            return False, "Report missing overall_score"
+            token_budget = getattr(settings, 'FINDABILITY_DIGEST_TOKEN_BUDGET', 3000)
+            ai_pages_summary = budgeted_digest(ai_pages_list, token_budget)
+        
+        # Deterministic scoring, fed to the prompt so the prose matches the numbers
+        with span('findability_scoring'):
+            scores = score_findability(website_text, features_list, ai_pages_list)
+        logger.info(f"Local findability score for {website_url[:50]}: {scores['overall_score']}")
+        
+        # Same system and site context prefix as page generation, so the prompt cache is shared
+        with span('openai_findability') as fields:
+            response, report, model = route_completion(
+                'findability', client, validate_findability, fields=fields,
+                messages=findability_messages(website_url, features_list, scores, ai_pages_summary),
+                temperature=0.7,
+                max_tokens=4000
+            )
+        record_prompt_usage(website_url, response.usage)
         
-        # Ensure score is between 0-100
-        if isinstance(report.get('overall_score'), (int, float)):
-            report['overall_score'] = max(0, min(100, int(report['overall_score'])))
-        else:
-            report['overall_score'] = 0
+        # Scores always come from the local engine
+        report.update(scores)
         
         # Ensure lists exist
-        if 'simulated_queries' not in report:
-            report['simulated_queries'] = []
         if 'per_feature_notes' not in report:
             report['per_feature_notes'] = []
         if 'content_gaps' not in report:
@@ -815,8 +893,8 @@ Return ONLY valid JSON, no markdown code blocks or other text."""
         
         return True, report
     
-    except json.JSONDecodeError as e:
-        return False, f"Failed to parse OpenAI response as JSON: {str(e)}"
+    except RoutingError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"OpenAI API error: {str(e)}"
 
@@ -838,7 +916,8 @@ def run_findability_analysis(request):
     success, result = run_findability_analysis_with_openai(
         session.website_url,
         session.features,
-        session.ai_pages if isinstance(session.ai_pages, list) else None
+        session.ai_pages_list(),
+        session.website_text
     )
     
     if not success:
@@ -846,7 +925,8 @@ def run_findability_analysis(request):
     else:
         # Save to session
         session.findability_report = result
-        session.save()
+        with span('session_save'):
+            session.save()
         messages.success(request, "Findability analysis completed successfully!")
     
     return redirect('findability')
@@ -0,0 +1,73 @@
+"""
+Start-up work for gunicorn (see gunicorn.conf.py) and import-time measurement.
+
+preload() runs once in the gunicorn master after the application is loaded
+and before workers are forked, so everything it loads is shared by the
+workers: the OpenAI SDK and requests (imported lazily by the views), the URL
+resolver, compiled templates and crawler signatures. It must not open sockets
+or database connections. warm_worker() runs in each worker after the fork and
+creates the per-process OpenAI client, so the first request doesn't pay for it.
+"""
+import os
+import re
+import sys
+import time
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = [
+    'analyzer/website_analysis.html',
+    'analyzer/features_table.html',
+    'analyzer/findability.html',
+    'analyzer/ai_page.html',
+]
+IMPORT_TIME_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def preload():
+    """Import and compile everything requests need, in the master process."""
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+    from .crawlers import crawler_classifier
+
+    start = time.perf_counter()
+    import requests  # noqa: F401
+    from . import pinned_http  # noqa: F401
+    from openai import OpenAI  # noqa: F401
+    get_resolver().url_patterns
+    for name in TEMPLATES:
+        get_template(name)
+    crawler_classifier()
+    logger.info(f"Preloaded application in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+def warm_worker():
+    """Prepare a freshly forked worker."""
+    from django.db import connections
+    from .views import openai_client
+
+    # A connection opened in the master must never be shared between processes
+    connections.close_all()
+    api_key = os.getenv('OPENAI_API_KEY', '')
+    if api_key and api_key != 'your_key_here':
+        openai_client(api_key)
+
+
+def import_times(statement='import config.urls'):
+    """
+    Run statement in a fresh interpreter with -X importtime, after django.setup().
+    Returns {module: cumulative import time in microseconds} for every module imported.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.getenv('DJANGO_SETTINGS_MODULE', 'config.settings'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import django; django.setup(); {statement}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks for the analyzer hot paths.
+
+Run from the project root (see benchmarks/pytest.ini for the saved baseline
+and regression threshold):
+
+    python -m pytest -c benchmarks/pytest.ini benchmarks --benchmark-compare --benchmark-compare-fail=median:25%
+"""
+from unittest import mock
+import pytest
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from analyzer.models import AnalysisSession
+from analyzer.views import TextExtractor, validate_url
+from analyzer.slugs import SlugAllocator
+from analyzer.crawlers import CrawlerClassifier
+from analyzer.resolver import CachingResolver
+from analyzer.warmup import import_times
+from analyzer.content_extraction import extract_main_content
+from analyzer.digests import estimate_tokens
+from analyzer.pagination import DEFAULT_PAGE_SIZE
+
+CORPUS_NAMES = ['docs_page', 'ecommerce_product', 'saas_landing']
+
+URLS = [
+    'https://example.com',
+    'https://www.example.com/products/item?id=123&ref=home',
+    'http://sub.domain.example.org:8080/path/to/page',
+    'https://192.168.1.10/admin',
+    'ftp://example.com/file',
+    'not a url',
+    'https://' + 'a' * 2100 + '.com',
+]
+
+USER_AGENTS = [
+    'Mozilla/5.0 AppleWebKit/537.36 (KHTML, like Gecko; compatible; GPTBot/1.2; +https://openai.com/gptbot)',
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+]
+
+
+def extract_text(html):
+    extractor = TextExtractor()
+    extractor.feed(html)
+    return extractor.get_text(max_length=8000)
+
+
+@pytest.mark.parametrize('name', CORPUS_NAMES + [f'{name}_large' for name in CORPUS_NAMES])
+def test_text_extractor(benchmark, html_corpus, name):
+    text = benchmark(extract_text, html_corpus[name])
+    assert len(text) > 50
+
+
+@pytest.mark.parametrize('name', CORPUS_NAMES + [f'{name}_large' for name in CORPUS_NAMES])
+def test_main_content_extraction(benchmark, html_corpus, name):
+    # extra_info reports the prompt tokens saved compared to TextExtractor
+    html = html_corpus[name]
+    text = benchmark(extract_main_content, html, 8000)
+    full_tokens = estimate_tokens(extract_text(html))
+    benchmark.extra_info.update(
+        tokens_full=full_tokens,
+        tokens_main=estimate_tokens(text),
+        tokens_saved_pct=round(100 * (1 - estimate_tokens(text) / full_tokens), 1),
+    )
+    assert len(text) > 50
+
+
+def test_validate_url(benchmark):
+    # Host names resolve from the DNS cache, as for repeated fetches; no network needed
+    resolver = CachingResolver()
+    resolver.lookup = lambda host: ('93.184.216.34',)
+
+    def validate_all():
+        return [validate_url(url) for url in URLS]
+    with mock.patch('analyzer.resolver._resolver', resolver):
+        results = benchmark(validate_all)
+    assert results[0] == (True, None)
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_classify_user_agents(benchmark, cached):
+    classifier = CrawlerClassifier()
+    classify = classifier.classify if cached else classifier.match
+
+    def classify_all():
+        return [classify(user_agent) for user_agent in USER_AGENTS]
+    results = benchmark(classify_all)
+    assert results[-1] is None
+
+
+def test_slug_deduplication(benchmark, colliding_slugs):
+    def allocate_all():
+        slugs = SlugAllocator()
+        return [slugs.allocate(raw_slug) for raw_slug in colliding_slugs]
+    allocated = benchmark(allocate_all)
+    assert len(set(allocated)) == len(colliding_slugs)
+
+
+def test_render_features_table(benchmark, large_session_pages, features):
+    # The view renders only the first page of AI pages; the rest are fetched from /api/ai-pages/
+    session = AnalysisSession(id=1, website_url='https://example.com', features=features)
+    first_page = [
+        {'slug': page['slug'], 'title': page['title'], 'size': len(page['content']), 'url': f"/ai/{session.id}/{page['slug']}/"}
+        for page in large_session_pages[:DEFAULT_PAGE_SIZE]
+    ]
+    request = RequestFactory().get('/features/')
+    context = {
+        'session': session,
+        'session_id': session.id,
+        'features': session.features,
+        'features_count': session.features_count,
+        'ai_pages': first_page,
+        'ai_pages_next_cursor': 'NDk',
+        'ai_pages_count': len(large_session_pages),
+        'has_findability_report': False,
+        'error_message': None,
+        'success_message': None,
+    }
+    html = benchmark(render_to_string, 'analyzer/features_table.html', context, request)
+    assert first_page[-1]['title'] in html
+
+
+def test_startup_imports(benchmark):
+    # Cold import of the URLconf in a fresh interpreter (python -X importtime);
+    # the median is tracked against the baseline like the other benchmarks
+    times = benchmark.pedantic(import_times, rounds=5, iterations=1)
+    benchmark.extra_info['config_urls_ms'] = times['config.urls'] / 1000
+    assert 'openai' not in times
@@ -0,0 +1,79 @@
+"""
+Fixtures for the analyzer micro-benchmarks.
+
+The HTML corpus lives in benchmarks/corpus/; synthetic sessions are built with a
+fixed random seed so every run measures the same data.
+"""
+import os
+import random
+from pathlib import Path
+import pytest
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'corpus'
+# Roughly the 500KB fetch limit in fetch_website_text
+LARGE_PAGE_BYTES = 500_000
+
+WORDS = (
+    'search collaboration export report dashboard integration api webhook security '
+    'automation workflow analytics team project document backup mobile billing '
+    'permission audit sync offline notification template calendar invoice'
+).split()
+
+
+def corpus_documents():
+    return {path.stem: path.read_text(encoding='utf-8') for path in sorted(CORPUS_DIR.glob('*.html'))}
+
+
+def enlarge(html, size=LARGE_PAGE_BYTES):
+    """Repeat the <main> section of a page until the page reaches size bytes."""
+    start, end = html.find('<main'), html.find('</main>')
+    if start == -1 or end == -1:
+        return html * max(1, size // len(html))
+    main = html[start:end + len('</main>')]
+    copies = max(1, (size - len(html)) // len(main))
+    return html[:start] + main * copies + html[end + len('</main>'):]
+
+
+@pytest.fixture(scope='session')
+def html_corpus():
+    """Real-world-style pages keyed by name, plus a large variant of each."""
+    documents = corpus_documents()
+    documents.update({f'{name}_large': enlarge(html) for name, html in list(documents.items())})
+    return documents
+
+
+def synthetic_page(rng, index):
+    words = [rng.choice(WORDS) for _ in range(600)]
+    title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} guide {index}"
+    paragraphs = ''.join(f"<p>{' '.join(words[i:i + 60])}.</p>" for i in range(0, len(words), 60))
+    return {
+        'slug': title.lower().replace(' ', '-'),
+        'title': title,
+        'content': f"<h1>{title}</h1><h2>Overview</h2>{paragraphs}<h2>Use cases</h2><ul><li>{words[0]}</li></ul>",
+    }
+
+
+@pytest.fixture(scope='session')
+def large_session_pages():
+    """300 generated pages, the maximum one generation run produces."""
+    rng = random.Random(42)
+    return [synthetic_page(rng, i) for i in range(300)]
+
+
+@pytest.fixture(scope='session')
+def colliding_slugs():
+    """300 raw slugs where most pages share one of a few slugs, the worst case for de-duplication."""
+    rng = random.Random(7)
+    return [rng.choice(['features-overview', 'Pricing Plans', 'faq', 'use-cases']) for _ in range(300)]
+
+
+@pytest.fixture(scope='session')
+def features():
+    rng = random.Random(3)
+    return [f"{rng.choice(WORDS).title()} {rng.choice(WORDS)}" for _ in range(30)]
@@ -0,0 +1,100 @@
+"""
+Response compression for HTML and JSON.
+
+Like django.middleware.gzip.GZipMiddleware, but prefers Brotli when the client
+accepts it (and the brotli package is installed), and only compresses the
+content types listed in RESPONSE_COMPRESSION_TYPES. Streaming responses
+(NDJSON bulk analysis) are compressed chunk by chunk with a flush after each,
+so results still reach the client as they are produced.
+
+Responses that already have a Content-Encoding are left alone: static files
+(served precompressed by WhiteNoise) and AI pages (served from their stored
+gzip data, see analyzer.compression).
+"""
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from analyzer.compression import accepts_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# As django.middleware.gzip: random padding in the gzip header mitigates BREACH
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def gzip_sequence(sequence):
+    # django.utils.text.compress_sequence doesn't flush, so chunks would be held back
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for item in sequence:
+        data = compressor.compress(item) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush(zlib.Z_FINISH)
+
+
+def brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress HTML/JSON responses with Brotli or gzip, depending on Accept-Encoding."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_length = getattr(settings, 'RESPONSE_COMPRESSION_MIN_LENGTH', 200)
+        self.brotli_quality = getattr(settings, 'RESPONSE_COMPRESSION_BROTLI_QUALITY', 5)
+        self.content_types = tuple(getattr(settings, 'RESPONSE_COMPRESSION_TYPES', ('text/html', 'application/json')))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.should_compress(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if brotli is not None and accepts_encoding(request, 'br'):
+            encoding = 'br'
+        elif accepts_encoding(request, 'gzip'):
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            content = response.streaming_content
+            if encoding == 'br':
+                response.streaming_content = brotli_sequence(content, self.brotli_quality)
+            else:
+                response.streaming_content = gzip_sequence(content)
+            # Length is unknown when streaming
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=self.brotli_quality)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body differs from the uncompressed one, so a strong ETag no longer matches it
+        etag = response.headers.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def should_compress(self, response):
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(self.content_types):
+            return False
+        return response.streaming or len(response.content) >= self.min_length
@@ -0,0 +1,178 @@
+"""
+Opt-in request profiling middleware.
+
+Profiles a sampled fraction of requests (PROFILING_SAMPLE_RATE), or any request
+sent with the PROFILING_HEADER header set to PROFILING_TOKEN, and stores the
+result as an analyzer.RequestProfile that can be browsed in the admin:
+
+- statistical stack samples in collapsed ("folded") form, ready for
+  flamegraph.pl or speedscope ("sample" mode, low overhead)
+- cProfile function statistics ("cprofile" mode, exact but slower)
+- number and total duration of SQL queries, with the slowest ones
+
+Enable with PROFILING_ENABLED=1; nothing is done per request otherwise.
+"""
+import io
+import os
+import sys
+import time
+import random
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from django.conf import settings
+from django.db import connection
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 64
+SLOWEST_QUERIES = 10
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Sample the call stack of one thread at a fixed interval from a background thread."""
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self):
+        """Return samples as "frame;frame;frame count" lines, the collapsed flame-graph format."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts and times SQL queries."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.total += elapsed
+            self.queries.append((elapsed, sql))
+
+    def slowest(self):
+        return [
+            {'sql': sql[:500], 'ms': round(elapsed * 1000, 2)}
+            for elapsed, sql in sorted(self.queries, key=lambda q: q[0], reverse=True)[:SLOWEST_QUERIES]
+        ]
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile sampled requests and store them for the admin.
+    Place it near the top of MIDDLEWARE so the rest of the stack is included.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', False)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.mode = getattr(settings, 'PROFILING_MODE', 'sample')
+        self.interval = getattr(settings, 'PROFILING_INTERVAL', 0.005)
+        self.token = getattr(settings, 'PROFILING_TOKEN', '')
+        header = getattr(settings, 'PROFILING_HEADER', 'X-Profile')
+        self.header_key = 'HTTP_' + header.upper().replace('-', '_')
+        self.exclude = tuple(getattr(settings, 'PROFILING_EXCLUDE_PREFIXES', ()))
+
+    def should_profile(self, request):
+        if not self.enabled or request.path.startswith(self.exclude):
+            return False
+        if self.token and constant_time_compare(request.META.get(self.header_key, ''), self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        queries = QueryRecorder()
+        sampler = None
+        profiler = None
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this process
+                profiler = None
+        else:
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler:
+                profiler.disable()
+            if sampler:
+                sampler.stop()
+
+        try:
+            self.save(request, response, elapsed, queries, sampler, profiler)
+        except Exception:
+            logger.exception(f"Failed to store profile for {request.path}")
+        return response
+
+    def save(self, request, response, elapsed, queries, sampler, profiler):
+        from analyzer.models import RequestProfile
+
+        stats_text = ''
+        if profiler:
+            buffer = io.StringIO()
+            pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(50)
+            stats_text = buffer.getvalue()
+
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.path[:500],
+            status_code=response.status_code,
+            duration_ms=elapsed * 1000,
+            mode='cprofile' if profiler else 'sample',
+            samples=sum(sampler.stacks.values()) if sampler else 0,
+            folded_stacks=sampler.folded() if sampler else '',
+            cprofile_stats=stats_text,
+            sql_count=queries.count,
+            sql_ms=queries.total * 1000,
+            slowest_queries=queries.slowest(),
+        )
+        # Keep only the most recent profiles
+        keep = getattr(settings, 'PROFILING_MAX_PROFILES', 500)
+        RequestProfile.objects.filter(id__lte=profile.id - keep).delete()
+        logger.info(f"Profiled {request.method} {request.path}: {elapsed * 1000:.1f}ms, {queries.count} queries (profile {profile.id})")
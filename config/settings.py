@@ -41,9 +41,11 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',') if os.getenv('ALLOWED_
 CSRF_TRUSTED_ORIGINS = [origin.strip() for origin in os.getenv('CSRF_TRUSTED_ORIGINS', '').split(',') if origin.strip()]
 
 # Security settings for HTTPS (Cloud Run uses HTTPS)
-CSRF_COOKIE_SECURE = True  # Only send CSRF cookie over HTTPS
+# Set SECURE_COOKIES=0 only for local plain-HTTP runs such as the load test
+SECURE_COOKIES = os.getenv('SECURE_COOKIES', '1') == '1'
+CSRF_COOKIE_SECURE = SECURE_COOKIES  # Only send CSRF cookie over HTTPS
 CSRF_COOKIE_SAMESITE = 'Lax'  # Allow CSRF cookie in same-site requests
-SESSION_COOKIE_SECURE = True  # Only send session cookie over HTTPS
+SESSION_COOKIE_SECURE = SECURE_COOKIES  # Only send session cookie over HTTPS
 SESSION_COOKIE_SAMESITE = 'Lax'
 
 # Trust proxy headers from Cloud Run
@@ -64,6 +66,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # Hashed, precompressed static files
+    'config.profiling_middleware.RequestProfilingMiddleware',  # Opt-in, see PROFILING_* settings
+    'config.compression_middleware.CompressionMiddleware',  # Brotli/gzip for HTML and JSON
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'config.csrf_middleware.CloudRunCsrfMiddleware',  # Custom middleware to add Cloud Run origins
@@ -99,7 +104,7 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
@@ -141,11 +146,142 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic writes content-hashed copies of every file plus .gz and .br
+# versions; WhiteNoise serves them with far-future cache headers
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+# Unhashed files (requested without the manifest name) are cached briefly
+WHITENOISE_MAX_AGE = int(os.getenv('WHITENOISE_MAX_AGE', '3600'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# AI page generation
+# Target fraction of page-generation batches cut off by max_tokens; the batch
+# planner shrinks batches when the observed rate for a site exceeds it
+AI_PAGES_TARGET_TRUNCATION_RATE = float(os.getenv('AI_PAGES_TARGET_TRUNCATION_RATE', '0.05'))
+
+# Cosine similarity (0-1) above which features are merged and generated pages
+# are dropped as near-duplicates. Features must also share their content words
+# ("iOS app" and "Android app" are never merged), and only extracted features
+# are merged, never the ones a user saves
+FEATURE_DEDUP_THRESHOLD = float(os.getenv('FEATURE_DEDUP_THRESHOLD', '0.85'))
+AI_PAGE_DEDUP_THRESHOLD = float(os.getenv('AI_PAGE_DEDUP_THRESHOLD', '0.9'))
+
+# Approximate token budget for the digest of all AI pages sent to findability analysis
+FINDABILITY_DIGEST_TOKEN_BUDGET = int(os.getenv('FINDABILITY_DIGEST_TOKEN_BUDGET', '3000'))
+
+# Send only the main content of fetched pages to feature extraction (text and
+# link density per block); 0 keeps all visible text as before
+MAIN_CONTENT_EXTRACTION = os.getenv('MAIN_CONTENT_EXTRACTION', '1') == '1'
+
+# Fetching websites (analyzer.resolver): DNS answers are cached this long, and
+# every resolved address must be public before a fetch connects to it
+DNS_CACHE_SECONDS = int(os.getenv('DNS_CACHE_SECONDS', '300'))
+DNS_NEGATIVE_CACHE_SECONDS = int(os.getenv('DNS_NEGATIVE_CACHE_SECONDS', '30'))
+# Allow fetching sites on this machine (localhost), e.g. for local development
+ALLOW_LOOPBACK_FETCH = os.getenv('ALLOW_LOOPBACK_FETCH', '1' if DEBUG else '0') == '1'
+
+# Per-host circuit breaker (analyzer.host_health): after this many consecutive
+# failed fetches a host is skipped for FETCH_BREAKER_OPEN_SECONDS, then one
+# probe fetch decides whether it is healthy again
+FETCH_BREAKER_FAILURES = int(os.getenv('FETCH_BREAKER_FAILURES', '3'))
+FETCH_BREAKER_OPEN_SECONDS = float(os.getenv('FETCH_BREAKER_OPEN_SECONDS', '60'))
+# Connect and read timeouts start at these values and adapt to each host's p95
+# latency times FETCH_TIMEOUT_MULTIPLIER, never below FETCH_MIN_TIMEOUT
+FETCH_CONNECT_TIMEOUT = float(os.getenv('FETCH_CONNECT_TIMEOUT', '5'))
+FETCH_READ_TIMEOUT = float(os.getenv('FETCH_READ_TIMEOUT', '10'))
+FETCH_MIN_TIMEOUT = float(os.getenv('FETCH_MIN_TIMEOUT', '1'))
+FETCH_TIMEOUT_MULTIPLIER = float(os.getenv('FETCH_TIMEOUT_MULTIPLIER', '3'))
+# Total time for one fetch, including reading the body
+FETCH_TOTAL_SECONDS = float(os.getenv('FETCH_TOTAL_SECONDS', '20'))
+# Total time for one website analysis (fetch plus feature extraction)
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv('ANALYSIS_DEADLINE_SECONDS', '60'))
+
+# Model routing (analyzer.model_routing): comma-separated models tried in order
+# for each task, fastest first. The next model is only called when the output
+# of the previous one fails validation or the call fails
+MODEL_ROUTES = {
+    'extract_features': os.getenv('MODELS_EXTRACT_FEATURES', 'gpt-4o-mini,gpt-4o').split(','),
+    'generate_pages': os.getenv('MODELS_GENERATE_PAGES', 'gpt-4o-mini,gpt-4o').split(','),
+    'findability': os.getenv('MODELS_FINDABILITY', 'gpt-4o-mini,gpt-4o').split(','),
+}
+
+# Refreshing tracked sites (analyzer.refresh, manage.py refresh_sites)
+# Default hours between checks of a tracked site
+REFRESH_INTERVAL_HOURS = float(os.getenv('REFRESH_INTERVAL_HOURS', '24'))
+# Checks are spread by up to this fraction of the interval either way
+REFRESH_JITTER = float(os.getenv('REFRESH_JITTER', '0.1'))
+# SimHash bits (of 64) that may differ before the site counts as changed
+REFRESH_CHANGE_THRESHOLD = int(os.getenv('REFRESH_CHANGE_THRESHOLD', '6'))
+
+# Shared limit for OpenAI requests from this process, for web requests and
+# bulk/batch commands alike (0 = unlimited)
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))
+
+# Bulk analysis
+BULK_MAX_URLS = int(os.getenv('BULK_MAX_URLS', '500'))
+BULK_MAX_WORKERS = int(os.getenv('BULK_MAX_WORKERS', '8'))
+# How long fetched text and extracted features are reused for the same URL
+BULK_CACHE_SECONDS = int(os.getenv('BULK_CACHE_SECONDS', '3600'))
+
+# Single-flight coalescing of identical concurrent analyses (analyzer.single_flight)
+# How long a successful result is reused for the same URL
+SINGLE_FLIGHT_RESULT_SECONDS = int(os.getenv('SINGLE_FLIGHT_RESULT_SECONDS', '30'))
+# How long waiting requests wait before computing the result themselves
+SINGLE_FLIGHT_WAIT_SECONDS = int(os.getenv('SINGLE_FLIGHT_WAIT_SECONDS', '90'))
+# After this long a computing process is presumed dead and its claim is taken over
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', '120'))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv('SINGLE_FLIGHT_POLL_INTERVAL', '0.25'))
+
+# Crawler classification (analyzer.crawlers): extra "token:category" signatures,
+# categories ai_trainer, ai_assistant, search_engine, social_preview, other_bot
+CRAWLER_EXTRA_SIGNATURES = os.getenv('CRAWLER_EXTRA_SIGNATURES', '')
+# Number of recent User-Agent strings whose classification is cached
+CRAWLER_CACHE_SIZE = int(os.getenv('CRAWLER_CACHE_SIZE', '4096'))
+
+# Crawler hits on AI pages (analyzer.crawl_analytics): buffered in memory and
+# written in batches by a background thread
+CRAWL_ANALYTICS_ENABLED = os.getenv('CRAWL_ANALYTICS_ENABLED', '1') == '1'
+# Hits kept in memory at most; the oldest are dropped if the database falls behind
+CRAWL_ANALYTICS_BUFFER_SIZE = int(os.getenv('CRAWL_ANALYTICS_BUFFER_SIZE', '10000'))
+CRAWL_ANALYTICS_FLUSH_SIZE = int(os.getenv('CRAWL_ANALYTICS_FLUSH_SIZE', '500'))
+CRAWL_ANALYTICS_FLUSH_INTERVAL = float(os.getenv('CRAWL_ANALYTICS_FLUSH_INTERVAL', '5'))
+# Raw hits are kept this long; daily rollups are kept
+CRAWL_HIT_RETENTION_DAYS = int(os.getenv('CRAWL_HIT_RETENTION_DAYS', '30'))
+
+# Metrics
+# /metrics/ requires "Authorization: Bearer <METRICS_TOKEN>". If unset, it is
+# only served with DEBUG on (404 otherwise)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Request profiling (config.profiling_middleware); profiles are stored in the admin
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+# Fraction of requests profiled at random
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.0'))
+# "sample" (stack sampling, flame graphs) or "cprofile" (exact function stats)
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'sample')
+PROFILING_INTERVAL = float(os.getenv('PROFILING_INTERVAL', '0.005'))
+# Requests sent with this header set to PROFILING_TOKEN are always profiled
+PROFILING_HEADER = os.getenv('PROFILING_HEADER', 'X-Profile')
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_EXCLUDE_PREFIXES = ('/static/', '/admin/', '/health/', '/metrics/')
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '500'))
+
+# Response compression (config.compression_middleware)
+RESPONSE_COMPRESSION_TYPES = ('text/html', 'application/json', 'application/x-ndjson', 'text/plain')
+RESPONSE_COMPRESSION_MIN_LENGTH = int(os.getenv('RESPONSE_COMPRESSION_MIN_LENGTH', '200'))
+# 4-6 compresses about as fast as gzip with smaller output; 11 is for static files only
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.getenv('RESPONSE_COMPRESSION_BROTLI_QUALITY', '5'))
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -21,11 +21,16 @@ from analyzer import views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', views.health, name='health'),
+    path('metrics/', views.metrics, name='metrics'),
     path('', views.website_analysis, name='website_analysis'),
     path('features/', views.features_table, name='features_table'),
     path('features/generate-ai-pages/', views.generate_ai_pages, name='generate_ai_pages'),
     path('features/delete-all-ai-pages/', views.delete_all_ai_pages, name='delete_all_ai_pages'),
-    path('ai/<str:slug>/', views.ai_page, name='ai_page'),
+    path('ai-pages/export/', views.export_ai_pages, name='export_ai_pages'),
+    path('ai/<int:session_id>/<str:slug>/', views.ai_page, name='ai_page'),
+    path('api/features/', views.features_api, name='features_api'),
+    path('api/ai-pages/', views.ai_pages_api, name='ai_pages_api'),
+    path('api/bulk-analysis/', views.bulk_analysis_api, name='bulk_analysis_api'),
     path('findability/', views.findability, name='findability'),
     path('findability/run-analysis/', views.run_findability_analysis, name='run_findability_analysis'),
 ]
@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration for Cloud Run.
+
+The application is loaded once in the master (preload_app) and warmed up there
+before workers are forked, so a new instance serves its first request without
+paying for imports and template compilation in every worker.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# Cloud Run enforces its own request timeout
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '0'))
+# Cloud Run allows 10 seconds between SIGTERM and SIGKILL
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '8'))
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the application is loaded, before workers are forked
+    from analyzer.warmup import preload
+    preload()
+
+
+def post_worker_init(worker):
+    from analyzer.warmup import warm_worker
+    warm_worker()
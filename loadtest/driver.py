@@ -0,0 +1,250 @@
+"""
+End-to-end load test for the analyzer flow.
+
+Each virtual user runs the full flow against a running app:
+website_analysis -> generate_ai_pages -> ai_page -> run_findability_analysis,
+and the driver reports p50/p95/p99 latency per step and requests per second.
+
+By default it starts the fake OpenAI server (see loadtest.fake_openai) and runs
+every server configuration in turn, each against a fresh SQLite database:
+
+    python -m loadtest.driver --users 8 --iterations 3
+
+Test a single configuration, or an app that is already running:
+
+    python -m loadtest.driver --config "gunicorn-4t=gunicorn --workers 1 --threads 4 --bind 127.0.0.1:{port} config.wsgi:application"
+    python -m loadtest.driver --target http://127.0.0.1:8000 --openai-url http://127.0.0.1:8765/v1
+"""
+import os
+import re
+import math
+import sys
+import json
+import time
+import shlex
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import requests
+from . import fake_openai
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_CONFIGS = {
+    'gunicorn-1w-8t': 'gunicorn --workers 1 --threads 8 --bind 127.0.0.1:{port} config.wsgi:application',
+    'gunicorn-2w-4t': 'gunicorn --workers 2 --threads 4 --bind 127.0.0.1:{port} config.wsgi:application',
+    'gunicorn-4w-sync': 'gunicorn --workers 4 --bind 127.0.0.1:{port} config.wsgi:application',
+    'uvicorn-2w': 'uvicorn --workers 2 --host 127.0.0.1 --port {port} config.asgi:application',
+}
+STEPS = ['website_analysis', 'generate_ai_pages', 'ai_page', 'run_findability_analysis']
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+AI_PAGE_RE = re.compile(r'href="(/ai/[^"]+/)"')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Recorder:
+    """Thread-safe collection of (step, seconds, ok) samples."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+
+    def record(self, step, seconds, ok):
+        with self.lock:
+            self.samples[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+
+def timed(recorder, step, func):
+    start = time.perf_counter()
+    ok = False
+    try:
+        response = func()
+        ok = response.status_code < 400
+        return response
+    finally:
+        recorder.record(step, time.perf_counter() - start, ok)
+
+
+def csrf_token(response):
+    match = CSRF_RE.search(response.text)
+    return match.group(1) if match else ''
+
+
+def run_user(base_url, site_url, recorder, iterations, pages_count, ai_page_views):
+    """One virtual user running the whole flow `iterations` times."""
+    session = requests.Session()
+    for _ in range(iterations):
+        try:
+            token = csrf_token(session.get(f"{base_url}/"))
+            response = timed(recorder, 'website_analysis', lambda: session.post(
+                f"{base_url}/", data={'website_url': site_url, 'csrfmiddlewaretoken': token}))
+            token = csrf_token(response)
+
+            response = timed(recorder, 'generate_ai_pages', lambda: session.post(
+                f"{base_url}/features/generate-ai-pages/",
+                data={'pages_count': pages_count, 'csrfmiddlewaretoken': token}))
+            links = AI_PAGE_RE.findall(response.text)
+            token = csrf_token(response)
+
+            for link in links[:ai_page_views]:
+                timed(recorder, 'ai_page', lambda: session.get(f"{base_url}{link}"))
+
+            timed(recorder, 'run_findability_analysis', lambda: session.post(
+                f"{base_url}/findability/run-analysis/", data={'csrfmiddlewaretoken': token}))
+        except requests.RequestException:
+            recorder.record('website_analysis', 0.0, False)
+
+
+def run_load(base_url, site_url, users, iterations, pages_count, ai_page_views):
+    """Run all virtual users against base_url. Returns a report dict."""
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        for _ in range(users):
+            pool.submit(run_user, base_url, site_url, recorder, iterations, pages_count, ai_page_views)
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(samples) for samples in recorder.samples.values())
+    report = {'elapsed_seconds': round(elapsed, 3), 'requests': total,
+              'requests_per_second': round(total / elapsed, 2) if elapsed else 0.0, 'steps': {}}
+    for step in STEPS:
+        samples = recorder.samples[step]
+        report['steps'][step] = {
+            'count': len(samples),
+            'errors': recorder.errors[step],
+            'p50_ms': round(1000 * percentile(samples, 50), 1),
+            'p95_ms': round(1000 * percentile(samples, 95), 1),
+            'p99_ms': round(1000 * percentile(samples, 99), 1),
+            'rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        }
+    return report
+
+
+def wait_for_health(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/health/", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy in time")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_config(name, command, openai_url, args):
+    """Start the app with one server configuration, load test it and stop it."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            OPENAI_BASE_URL=openai_url,
+            OPENAI_API_KEY=os.getenv('LOADTEST_OPENAI_API_KEY', 'fake-key'),
+            SQLITE_PATH=str(Path(tmp) / 'loadtest.sqlite3'),
+            SECURE_COOKIES='0',
+            ALLOW_LOOPBACK_FETCH='1',
+            DEBUG='0',
+        )
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '--noinput'], cwd=BASE_DIR, env=env,
+                       check=True, stdout=subprocess.DEVNULL)
+        process = subprocess.Popen(shlex.split(command.format(port=port)), cwd=BASE_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            wait_for_health(base_url, process)
+            print(f"Running {name}: {command.format(port=port)}", file=sys.stderr)
+            return run_load(base_url, args.site_url or openai_url.rsplit('/v1', 1)[0] + '/site/',
+                            args.users, args.iterations, args.pages, args.ai_page_views)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def print_report(name, report):
+    print(f"\n== {name}: {report['requests']} requests in {report['elapsed_seconds']}s "
+          f"({report['requests_per_second']} req/s)")
+    print(f"{'step':<26}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>8}")
+    for step, stats in report['steps'].items():
+        print(f"{step:<26}{stats['count']:>7}{stats['errors']:>8}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['rps']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the analyzer flow against a fake OpenAI server")
+    parser.add_argument('--target', help="Test an already running app at this URL instead of starting servers")
+    parser.add_argument('--config', action='append', default=[],
+                        help="NAME=COMMAND server configuration ({port} is substituted); repeatable")
+    parser.add_argument('--openai-url', help="Use this OpenAI-compatible base URL instead of starting the fake server")
+    parser.add_argument('--site-url', help="Website to analyze (default: the fake server's /site/)")
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=2)
+    parser.add_argument('--pages', type=int, default=10, help="pages_count for generate_ai_pages")
+    parser.add_argument('--ai-page-views', type=int, default=5, help="AI pages fetched per iteration")
+    parser.add_argument('--latency', type=float, default=0.2, help="Fake server base latency in seconds")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--json', help="Also write the reports to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = None
+    openai_url = args.openai_url
+    if not openai_url:
+        config = fake_openai.FakeOpenAIConfig(
+            latency=args.latency, tokens_per_second=args.tokens_per_second,
+            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        )
+        server, fake_url = fake_openai.start_in_thread(config=config)
+        openai_url = f"{fake_url}/v1"
+
+    reports = {}
+    try:
+        if args.target:
+            site_url = args.site_url or openai_url.rsplit('/v1', 1)[0] + '/site/'
+            reports['target'] = run_load(args.target.rstrip('/'), site_url, args.users,
+                                         args.iterations, args.pages, args.ai_page_views)
+        else:
+            configs = dict(item.split('=', 1) for item in args.config) if args.config else DEFAULT_CONFIGS
+            for name, command in configs.items():
+                try:
+                    reports[name] = run_config(name, command, openai_url, args)
+                except (RuntimeError, OSError, subprocess.CalledProcessError) as e:
+                    print(f"Skipping {name}: {e}", file=sys.stderr)
+    finally:
+        if server:
+            server.shutdown()
+
+    for name, report in reports.items():
+        print_report(name, report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
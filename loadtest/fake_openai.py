@@ -0,0 +1,423 @@
+"""
+Offline stand-in for the OpenAI chat completions API.
+
+Serves OpenAI-compatible responses with canned JSON content for the analyzer's
+three prompts (feature extraction, AI page generation, findability), with
+configurable latency, token rate, error and 429 injection, so the analyzer flow
+can be exercised and load tested without spending API money.
+
+It also serves a small static website at /site/ for fetch_website_text (with
+an ETag, answering conditional requests with 304), and a
+minimal Files + Batches API (/v1/files, /v1/batches) for the offline batch
+generation command. Batches complete batch_delay seconds after they are created.
+
+Usage:
+    python -m loadtest.fake_openai --port 8765 --latency 0.2 --tokens-per-second 400
+
+Then point the app at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python manage.py runserver
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+# Provider prompt caching applies to prefixes of at least 1024 tokens, in 128-token steps
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+
+DEFAULT_FEATURES = [
+    "Fast full-text search",
+    "Real-time team collaboration",
+    "Export reports to PDF and CSV",
+    "Role-based access control",
+    "REST API and webhooks",
+    "Single sign-on (SSO)",
+    "Automated daily backups",
+    "Mobile apps for iOS and Android",
+]
+
+SITE_HTML = """<!DOCTYPE html>
+<html><head><title>Acme Workspace</title></head>
+<body>
+<nav><a href="/">Home</a><a href="/pricing">Pricing</a></nav>
+<main>
+<h1>Acme Workspace - the fast, secure home for your team's documents</h1>
+<p>Acme Workspace gives teams fast full-text search across every document, with results in under 100 milliseconds.</p>
+<h2>Collaborate in real time</h2>
+<p>Edit documents together, leave comments and see changes from your teammates as they happen.</p>
+<h2>Reports and exports</h2>
+<p>Export any report to PDF or CSV, or schedule exports to run automatically every day.</p>
+<h2>Security</h2>
+<p>Role-based access control, single sign-on with SAML and automated daily backups keep your data safe.</p>
+<h2>Developers</h2>
+<p>Integrate with the REST API and receive webhooks when documents change.</p>
+</main>
+<footer>Copyright Acme Inc.</footer>
+</body></html>
+"""
+
+
+class FakeOpenAIConfig:
+    """Behaviour of the fake server."""
+    def __init__(self, latency=0.1, jitter=0.05, tokens_per_second=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, canned=None, seed=None, batch_delay=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        # Simulated generation speed; 0 returns the whole completion immediately
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.canned = canned or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.seen_prefixes = set()
+        self.requests = 0
+        self.batch_delay = batch_delay
+        self.files = {}
+        self.batches = {}
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def build_content(config, messages):
+    """Return canned completion content for the analyzer prompt in messages."""
+    text = '\n'.join(str(m.get('content', '')) for m in messages)
+    if 'Task: generate AI-oriented web pages' in text:
+        match = re.search(r'Generate exactly (\d+)', messages[-1].get('content', ''))
+        count = int(match.group(1)) if match else 5
+        return json.dumps(config.canned.get('pages') or fake_pages(count, config))
+    if 'Task: write the recommendations part of a findability report' in text:
+        return json.dumps(config.canned.get('findability') or fake_findability())
+    return json.dumps(config.canned.get('features') or DEFAULT_FEATURES)
+
+
+def fake_words(config, count):
+    """Random pronounceable words, so generated pages are not near-duplicates of each other."""
+    syllables = ['ka', 'lo', 'mi', 'ner', 'tas', 'vu', 'zel', 'rio', 'pan', 'dex', 'fol', 'gri']
+    with config.lock:
+        return ' '.join(
+            ''.join(config.random.choice(syllables) for _ in range(3)) for _ in range(count)
+        )
+
+
+def fake_pages(count, config):
+    with config.lock:
+        batch = config.requests
+    pages = []
+    for i in range(count):
+        feature = DEFAULT_FEATURES[i % len(DEFAULT_FEATURES)]
+        title = f"{feature}: guide {batch}-{i + 1}"
+        pages.append({
+            "slug": re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-'),
+            "title": title,
+            "content": (
+                f"<h1>{title}</h1><p>{feature} is a core capability of Acme Workspace. {fake_words(config, 20)}.</p>"
+                f"<h2>How it works</h2><p>{fake_words(config, 40)}.</p>"
+                f"<h2>Use cases</h2><ul><li>{fake_words(config, 8)}</li><li>{fake_words(config, 8)}</li></ul>"
+            ),
+        })
+    return pages
+
+
+def fake_findability():
+    return {
+        "per_feature_notes": [{"feature": f, "note": "Covered on the home page."} for f in DEFAULT_FEATURES[:3]],
+        "content_gaps": ["No dedicated pricing FAQ"],
+        "recommendations": {
+            "pages_to_add": ["Search documentation page"],
+            "faq_suggestions": ["How fast is search?"],
+        },
+        "wording_improvements": ["Use 'real-time collaboration' consistently"],
+    }
+
+
+def cached_tokens_for(config, messages):
+    """Simulate prompt caching: a repeated prefix (all but the last message) is cached."""
+    prefix = json.dumps(messages[:-1], sort_keys=True)
+    prefix_tokens = estimate_tokens(prefix)
+    key = hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+    with config.lock:
+        seen = key in config.seen_prefixes
+        config.seen_prefixes.add(key)
+    if not seen or prefix_tokens < CACHE_MIN_TOKENS:
+        return 0
+    return prefix_tokens - prefix_tokens % CACHE_STEP_TOKENS
+
+
+def complete(config, request, simulate_latency=True):
+    """Return a chat.completion response body for a chat completions request."""
+    messages = request.get('messages') or []
+    content = build_content(config, messages)
+    completion_tokens = estimate_tokens(content)
+    finish_reason = 'stop'
+    max_tokens = request.get('max_tokens')
+    if max_tokens and completion_tokens > max_tokens:
+        content = content[:max_tokens * CHARS_PER_TOKEN]
+        completion_tokens = max_tokens
+        finish_reason = 'length'
+
+    if simulate_latency:
+        delay = max(0.0, config.latency + config.jitter * (2 * config.roll() - 1))
+        if config.tokens_per_second:
+            delay += completion_tokens / config.tokens_per_second
+        time.sleep(delay)
+
+    prompt_tokens = estimate_tokens(json.dumps(messages))
+    return {
+        "id": f"chatcmpl-fake-{config.requests}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get('model', 'gpt-4o'),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason,
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens_for(config, messages)},
+        },
+    }
+
+
+def multipart_fields(content_type, body):
+    """Parse a multipart/form-data body into {name: (filename, bytes)}."""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        fields[name] = (part.get_filename(), part.get_payload(decode=True) or b'')
+    return fields
+
+
+def new_id(config, prefix, store):
+    with config.lock:
+        return f"{prefix}-fake-{len(store) + 1}"
+
+
+def create_file(config, filename, data, purpose):
+    file_id = new_id(config, 'file', config.files)
+    record = {"id": file_id, "object": "file", "bytes": len(data), "created_at": int(time.time()),
+              "filename": filename or 'upload.jsonl', "purpose": purpose}
+    with config.lock:
+        config.files[file_id] = (record, data)
+    return record
+
+
+def create_batch(config, request):
+    """Run every request of a batch input file now; the batch reports completed after batch_delay."""
+    with config.lock:
+        record = config.files.get(request.get('input_file_id'))
+    if not record:
+        return None
+    output = []
+    for line in record[1].decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        body = complete(config, item.get('body') or {}, simulate_latency=False)
+        output.append(json.dumps({
+            "id": f"batch-req-{len(output) + 1}", "custom_id": item.get('custom_id'),
+            "response": {"status_code": 200, "request_id": f"req-{len(output) + 1}", "body": body},
+            "error": None,
+        }))
+    output_file = create_file(config, 'batch_output.jsonl', ('\n'.join(output) + '\n').encode('utf-8'), 'batch_output')
+    batch_id = new_id(config, 'batch', config.batches)
+    batch = {
+        "id": batch_id, "object": "batch", "endpoint": request.get('endpoint'),
+        "input_file_id": request.get('input_file_id'), "completion_window": request.get('completion_window', '24h'),
+        "created_at": int(time.time()), "output_file_id": output_file['id'],
+        "request_counts": {"total": len(output), "completed": len(output), "failed": 0},
+    }
+    with config.lock:
+        config.batches[batch_id] = (batch, time.monotonic() + config.batch_delay)
+    return batch_status(config, batch_id)
+
+
+def batch_status(config, batch_id):
+    with config.lock:
+        entry = config.batches.get(batch_id)
+    if not entry:
+        return None
+    batch, ready_at = entry
+    if time.monotonic() < ready_at:
+        return dict(batch, status='in_progress', output_file_id=None)
+    return dict(batch, status='completed', completed_at=int(time.time()))
+
+
+def make_handler(config):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def not_found(self):
+            self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0].rstrip('/')
+            if path in ('/site', ''):
+                body = SITE_HTML.encode('utf-8')
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+            elif path.startswith('/v1/files/') and path.endswith('/content'):
+                with config.lock:
+                    record = config.files.get(path[len('/v1/files/'):-len('/content')])
+                if not record:
+                    return self.not_found()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(record[1])))
+                self.end_headers()
+                self.wfile.write(record[1])
+            elif path.startswith('/v1/files/'):
+                with config.lock:
+                    record = config.files.get(path[len('/v1/files/'):])
+                self.send_json(200, record[0]) if record else self.not_found()
+            elif path.startswith('/v1/batches/'):
+                batch = batch_status(config, path[len('/v1/batches/'):])
+                self.send_json(200, batch) if batch else self.not_found()
+            else:
+                self.not_found()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            path = self.path.split('?', 1)[0].rstrip('/')
+
+            if path == '/v1/files':
+                fields = multipart_fields(self.headers.get('Content-Type', ''), body)
+                if 'file' not in fields:
+                    self.send_json(400, {"error": {"message": "Missing file", "type": "invalid_request_error"}})
+                    return
+                filename, data = fields['file']
+                purpose = fields.get('purpose', (None, b'batch'))[1].decode('utf-8')
+                self.send_json(200, create_file(config, filename, data, purpose))
+                return
+
+            try:
+                request = json.loads(body or b'{}')
+            except json.JSONDecodeError:
+                self.send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+                return
+
+            if path == '/v1/batches':
+                batch = create_batch(config, request)
+                if not batch:
+                    self.send_json(400, {"error": {"message": "Unknown input_file_id", "type": "invalid_request_error"}})
+                    return
+                self.send_json(200, batch)
+                return
+
+            if path != '/v1/chat/completions':
+                self.not_found()
+                return
+
+            with config.lock:
+                config.requests += 1
+
+            roll = config.roll()
+            if roll < config.rate_limit_rate:
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                               headers={'Retry-After': str(config.retry_after)})
+                return
+            if roll < config.rate_limit_rate + config.error_rate:
+                self.send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                return
+
+            self.send_json(200, complete(config, request))
+
+    return FakeOpenAIHandler
+
+
+def make_server(host='127.0.0.1', port=0, config=None):
+    """Create (but do not start) a fake server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), make_handler(config or FakeOpenAIConfig()))
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a fake server in a background thread. Returns (server, base_url)."""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for offline testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.1, help="Base seconds per completion")
+    parser.add_argument('--jitter', type=float, default=0.05, help="Random +/- seconds added to latency")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help="Simulated output rate (0 = instant)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--canned', help="JSON file with 'features', 'pages' and/or 'findability' outputs")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--batch-delay', type=float, default=0.0, help="Seconds before a batch reports completed")
+    args = parser.parse_args(argv)
+
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding='utf-8') as f:
+            canned = json.load(f)
+
+    config = FakeOpenAIConfig(
+        latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, canned=canned, seed=args.seed, batch_delay=args.batch_delay,
+    )
+    server = make_server(args.host, args.port, config)
+    print(f"Fake OpenAI server on http://{args.host}:{args.port}/v1 (website at /site/)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()